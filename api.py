@@ -0,0 +1,273 @@
+import json
+from datetime import date, datetime
+
+from flask import Blueprint, abort, current_app, request, stream_with_context
+from werkzeug.exceptions import HTTPException
+
+from bookings import venue_is_free
+from database import db
+from datetime_format import parse_datetime
+from db_routing import reads_from_replica
+from export import FORMATS as EXPORT_FORMATS, TABLES as EXPORT_TABLES, export
+from genres import genre_names
+from models.models import Venue, Artist, Show, VenueGenre, ArtistGenre
+from pagination import keyset_page
+
+try:
+    import orjson
+except ImportError:  # optional, only makes serialization faster
+    orjson = None
+
+#----------------------------------------------------------------------------#
+# JSON API, /api/v1.
+#----------------------------------------------------------------------------#
+
+# List endpoints are keyset paginated (?after=<cursor>&limit=<n>) and select
+# plain columns, never ORM objects. ?fields=name,city narrows the SELECT to
+# those columns (id is always returned); ?include=venue,artist on shows loads
+# the related rows with one IN query per relationship, narrowed the same way
+# with ?fields[venue]=name. Genres cost one IN query per page. All endpoints
+# read from a replica when DB_REPLICAS is set.
+#
+#   GET /api/v1/venues               GET /api/v1/venues/<id>
+#   GET /api/v1/venues/available?city=&state=&start=&end=
+#   GET /api/v1/artists              GET /api/v1/artists/<id>
+#   GET /api/v1/shows                GET /api/v1/shows/<id>
+#       ?venue_id=&artist_id=&include=venue,artist
+#   GET /api/v1/export/<venues|artists|shows|archived_shows>?format=csv|ndjson|columnar&since=
+#
+# /shows lists the Show table: upcoming shows and those of the last
+# SHOW_HOT_DAYS. Older ones are in the archived_shows export.
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+class Resource:
+
+    def __init__(self, name, model, fields, order, genre_link=None, includes=None):
+        self.name = name
+        self.model = model
+        self.fields = fields
+        self.order = order              # [(column, type)] for keyset pagination
+        self.genre_link = genre_link    # (junction model, owner id column)
+        self.includes = includes or {}  # include name -> (foreign key, resource name)
+
+    def parse_fields(self, value):
+        if not value:
+            return self.fields
+        fields = tuple(field for field in value.split(',') if field)
+        unknown = [field for field in fields if field not in self.fields]
+        if unknown:
+            abort(400, 'Unknown field(s) for {0}: {1}'.format(self.name, ', '.join(unknown)))
+        return fields
+
+    def parse_includes(self, value):
+        includes = tuple(name for name in (value or '').split(',') if name)
+        unknown = [name for name in includes if name not in self.includes]
+        if unknown:
+            abort(400, 'Unknown include(s) for {0}: {1}'.format(self.name, ', '.join(unknown)))
+        return includes
+
+    def query(self, fields, extra=()):
+        # selects id, the requested columns and any `extra` key columns;
+        # returns the query and the column names in row order
+        names = list(dict.fromkeys(('id',) + tuple(field for field in fields + tuple(extra) if field != 'genres')))
+        return db.session.query(*[getattr(self.model, name) for name in names]), names
+
+    def serialize(self, rows, names, fields):
+        keep = [i for i, name in enumerate(names) if name == 'id' or name in fields]
+        items = [{names[i]: row[i] for i in keep} for row in rows]
+        if 'genres' in fields and self.genre_link is not None:
+            by_owner = self.load_genres([item["id"] for item in items])
+            for item in items:
+                item["genres"] = by_owner.get(item["id"], [])
+        return items
+
+    def load_genres(self, ids):
+        link, owner_column = self.genre_link
+        by_owner = {}
+        if ids:
+            for owner_id, genre_id in db.session.query(owner_column, link.genre_id).filter(owner_column.in_(ids)):
+                by_owner.setdefault(owner_id, []).append(genre_id)
+        return {owner_id: genre_names(sorted(genre_ids)) for owner_id, genre_ids in by_owner.items()}
+
+    def fetch(self, ids, fields, extra=()):
+        # one IN query for a batch of ids; returns (rows, items)
+        if not ids:
+            return [], []
+        query, names = self.query(fields, extra)
+        rows = query.filter(self.model.id.in_(sorted(ids))).order_by(self.model.id).all()
+        return rows, self.serialize(rows, names, fields)
+
+
+OWNER_FIELDS = ('id', 'name', 'city', 'state', 'phone', 'genres', 'image_link', 'facebook_link',
+                'website_link', 'seeking_description', 'upcoming_shows_count', 'past_shows_count')
+
+RESOURCES = {
+    'venues': Resource('venues', Venue, OWNER_FIELDS + ('address', 'seeking_talent'),
+                       [(Venue.id, int)], genre_link=(VenueGenre, VenueGenre.venue_id)),
+    'artists': Resource('artists', Artist, OWNER_FIELDS + ('seeking_venue',),
+                        [(Artist.id, int)], genre_link=(ArtistGenre, ArtistGenre.artist_id)),
+    # same order as /shows, served by ix_Show_start_time_id
+    'shows': Resource('shows', Show, ('id', 'venue_id', 'artist_id', 'start_time', 'end_time'),
+                      [(Show.start_time, datetime), (Show.id, int)],
+                      includes={'venue': ('venue_id', 'venues'), 'artist': ('artist_id', 'artists')}),
+}
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError('Not JSON serializable: {0!r}'.format(value))
+
+
+def json_response(payload, status=200):
+    # compact output without jsonify's key sorting; orjson when installed
+    if orjson is not None:
+        body = orjson.dumps(payload, default=_default)
+    else:
+        body = json.dumps(payload, separators=(',', ':'), default=_default)
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+
+def page_limit():
+    limit = request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int)
+    return max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+
+
+def load_included(resource, rows, includes):
+    # one batched query per relationship, over the ids in `rows`
+    included = {}
+    for name in includes:
+        key, target_name = resource.includes[name]
+        target = RESOURCES[target_name]
+        fields = target.parse_fields(request.args.get('fields[{0}]'.format(name)))
+        included[target_name] = target.fetch({getattr(row, key) for row in rows}, fields)[1]
+    return included
+
+
+def list_resource(name, filters=(), criteria=()):
+    # filters: [(column, value)] equality filters; criteria: other clauses
+    resource = RESOURCES[name]
+    fields = resource.parse_fields(request.args.get('fields'))
+    includes = resource.parse_includes(request.args.get('include'))
+    order_columns = [column for column, _ in resource.order]
+    extra = [column.key for column in order_columns] + [resource.includes[include][0] for include in includes]
+    query, names = resource.query(fields, extra)
+    for column, value in filters:
+        query = query.filter(column == value)
+    if criteria:
+        query = query.filter(*criteria)
+    try:
+        rows, next_cursor = keyset_page(query, order_columns, request.args.get('after'),
+                                        tuple(kind for _, kind in resource.order), page_limit())
+    except (ValueError, OverflowError):
+        abort(400, 'Invalid cursor')
+    payload = {"data": resource.serialize(rows, names, fields), "next": next_cursor}
+    if includes:
+        payload["included"] = load_included(resource, rows, includes)
+    return json_response(payload)
+
+
+def detail_resource(name, item_id):
+    resource = RESOURCES[name]
+    fields = resource.parse_fields(request.args.get('fields'))
+    includes = resource.parse_includes(request.args.get('include'))
+    rows, items = resource.fetch({item_id}, fields, [resource.includes[include][0] for include in includes])
+    if not items:
+        abort(404)
+    payload = {"data": items[0]}
+    if includes:
+        payload["included"] = load_included(resource, rows, includes)
+    return json_response(payload)
+
+
+# the code-specific handlers are needed to take precedence over the app-wide
+# ones in views/pages.py
+@api.errorhandler(404)
+@api.errorhandler(500)
+@api.errorhandler(HTTPException)
+def http_error(error):
+    return json_response({"error": error.description}, error.code)
+
+
+@api.route('/venues')
+@reads_from_replica
+def venues():
+    return list_resource('venues')
+
+
+@api.route('/venues/available')
+@reads_from_replica
+def available_venues():
+    # venues in ?city= (and ?state=) with no show overlapping [start, end).
+    # The city narrows ix_Venue_city_id, which is also the id order pages
+    # follow; each candidate costs one probe of ix_Show_venue_id_start_time.
+    city, state = request.args.get('city'), request.args.get('state')
+    if not city:
+        abort(400, 'city is required')
+    try:
+        start_time, end_time = parse_datetime(request.args['start']), parse_datetime(request.args['end'])
+        if not start_time < end_time:
+            raise ValueError('end before start')
+    except KeyError:
+        abort(400, 'start and end are required')
+    except (TypeError, ValueError, OverflowError):
+        abort(400, 'Invalid start or end')
+    filters = [(Venue.city, city)] + ([(Venue.state, state)] if state else [])
+    return list_resource('venues', filters, [venue_is_free(start_time, end_time)])
+
+
+@api.route('/venues/<int:venue_id>')
+@reads_from_replica
+def venue(venue_id):
+    return detail_resource('venues', venue_id)
+
+
+@api.route('/artists')
+@reads_from_replica
+def artists():
+    return list_resource('artists')
+
+
+@api.route('/artists/<int:artist_id>')
+@reads_from_replica
+def artist(artist_id):
+    return detail_resource('artists', artist_id)
+
+
+@api.route('/shows')
+@reads_from_replica
+def shows():
+    filters = []
+    for column in (Show.venue_id, Show.artist_id):
+        value = request.args.get(column.key)
+        if value:
+            try:
+                filters.append((column, int(value)))
+            except ValueError:
+                abort(400, 'Invalid {0}'.format(column.key))
+    return list_resource('shows', filters)
+
+
+@api.route('/shows/<int:show_id>')
+@reads_from_replica
+def show(show_id):
+    return detail_resource('shows', show_id)
+
+
+@api.route('/export/<table>')
+@reads_from_replica
+def export_table(table):
+    # streamed with chunked transfer, one chunk per batch
+    format = request.args.get('format', 'csv')
+    if table not in EXPORT_TABLES or format not in EXPORT_FORMATS:
+        abort(404)
+    try:
+        chunks = export(table, format, request.args.get('since'), current_app.config['EXPORT_BATCH_SIZE'])
+    except (ValueError, OverflowError):
+        abort(400, 'Invalid since')
+    mimetype, extension, _ = EXPORT_FORMATS[format]
+    response = current_app.response_class(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = 'attachment; filename={0}.{1}'.format(table, extension)
+    return response
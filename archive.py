@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import func, select, text
+
+from database import db
+from models.models import Show, ShowArchive
+
+#----------------------------------------------------------------------------#
+# Show archive.
+#----------------------------------------------------------------------------#
+
+# Show only keeps upcoming shows and those that ended in the last
+# SHOW_HOT_DAYS; `flask archive-shows` (run from cron, like
+# roll-show-counters) moves older ones to Show_archive, oldest first, in
+# transactions of ARCHIVE_BATCH_SIZE shows. So the upcoming listings, the
+# counters and the booking checks work on a table that does not grow with
+# history. Reads that reach back further (past timelines, /shows with old
+# dates, recounts) add the archive, with pagination.keyset_union_page() or
+# archived_counts().
+#
+# Every archived show ended before horizon(), so a show starting after it can
+# only be in Show.
+
+COLUMNS = ('id', 'venue_id', 'artist_id', 'start_time', 'end_time', 'updated_at')
+
+
+def horizon(like=None):
+    # shows that ended before this may be in the archive; aware if `like` is
+    # (PostgreSQL returns aware datetimes, SQLite naive ones)
+    now = datetime.now(timezone.utc) if like is not None and like.tzinfo is not None else datetime.now()
+    return now - timedelta(days=current_app.config['SHOW_HOT_DAYS'])
+
+
+def reaches_archive(start_time):
+    # whether shows at or after `start_time` may include archived ones
+    return start_time is None or start_time < horizon(start_time)
+
+
+def archived_counts(show_column, ids):
+    # {owner id: archived (so past) shows} for venue or artist ids
+    column = getattr(ShowArchive, show_column.key)
+    return dict(db.session.query(column, func.count()).filter(column.in_(ids)).group_by(column))
+
+
+def _ensure_partitions(start_times):
+    # PostgreSQL: yearly partitions of Show_archive for these start times
+    for year in sorted({value.astimezone(timezone.utc).year for value in start_times}):
+        db.session.execute(text(
+            'CREATE TABLE IF NOT EXISTS "Show_archive_{0}" PARTITION OF "Show_archive" '
+            "FOR VALUES FROM ('{0}-01-01 00:00:00+00') TO ('{1}-01-01 00:00:00+00')".format(year, year + 1)))
+    db.session.commit()
+
+
+def archive_shows(batch_size=None, max_batches=None):
+    # moves shows that ended before horizon() to Show_archive, oldest first;
+    # returns how many moved
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    postgresql = db.engine.dialect.name == 'postgresql'
+    moved = batches = 0
+    cutoff = horizon(datetime.now(timezone.utc) if postgresql else None)
+    while max_batches is None or batches < max_batches:
+        # uncounted shows wait for stats.catch_up(), which only reads Show
+        rows = db.session.query(Show.id, Show.start_time).filter(
+            Show.start_time < cutoff, Show.end_time < cutoff, Show.counted) \
+            .order_by(Show.start_time, Show.id).limit(batch_size).all()
+        if not rows:
+            break
+        if postgresql:
+            _ensure_partitions([start_time for _, start_time in rows])
+        ids = [show_id for show_id, _ in rows]
+        columns = [getattr(Show, name) for name in COLUMNS]
+        db.session.execute(ShowArchive.__table__.insert().from_select(
+            COLUMNS, select(*columns).where(Show.id.in_(ids))))
+        db.session.execute(Show.__table__.delete().where(Show.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
+        batches += 1
+    return moved
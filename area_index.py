@@ -0,0 +1,100 @@
+import threading
+import time
+
+from database import db
+from models.models import Venue
+
+#----------------------------------------------------------------------------#
+# Area index.
+#----------------------------------------------------------------------------#
+
+# In-process copy of the /venues browse structure. It is built from one
+# ordered query grouped in a single pass, then patched in place by the venue
+# create, edit and delete handlers. Each worker process keeps its own copy, so
+# it is rebuilt after `ttl` seconds to pick up writes made by other workers.
+
+
+def _area_sort_key(area):
+    return (area["state"] or '', area["city"] or '')
+
+
+def _venue_sort_key(venue):
+    return (venue["name"] or '', venue["id"])
+
+
+def group_areas(rows):
+    # groups (id, name, city, state) rows ordered by state, city, name in a
+    # single pass into [{"city", "state", "venues": [{"id", "name"}]}]
+    areas = []
+    area = None
+    for row in rows:
+        if area is None or (area["city"], area["state"]) != (row.city, row.state):
+            area = {"city": row.city, "state": row.state, "venues": []}
+            areas.append(area)
+        area["venues"].append({"id": row.id, "name": row.name})
+    return areas
+
+
+class AreaIndex:
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._areas = None      # [{"city", "state", "venues": [{"id", "name"}]}]
+        self._by_key = {}       # (city, state) -> area dict in self._areas
+        self._venue_area = {}   # venue id -> (city, state)
+        self._built_at = 0
+        self._lock = threading.Lock()
+
+    def rebuild(self):
+        rows = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state) \
+            .order_by(Venue.state, Venue.city, Venue.name, Venue.id).all()
+        areas = group_areas(rows)
+        by_key = {(area["city"], area["state"]): area for area in areas}
+        venue_area = {venue["id"]: key for key, area in by_key.items() for venue in area["venues"]}
+        with self._lock:
+            self._areas = areas
+            self._by_key = by_key
+            self._venue_area = venue_area
+            self._built_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._areas = None
+
+    def areas(self):
+        if self._areas is None or time.monotonic() - self._built_at > self.ttl:
+            self.rebuild()
+        return self._areas
+
+    def upsert(self, venue_id, name, city, state):
+        with self._lock:
+            if self._areas is None:
+                return  # nothing built yet, the next read loads it fresh
+            self._discard(venue_id)
+            key = (city, state)
+            area = self._by_key.get(key)
+            if area is None:
+                area = self._by_key[key] = {"city": city, "state": state, "venues": []}
+                self._areas = sorted(self._areas + [area], key=_area_sort_key)
+            area["venues"] = sorted(area["venues"] + [{"id": venue_id, "name": name}], key=_venue_sort_key)
+            self._venue_area[venue_id] = key
+
+    def remove(self, venue_id):
+        with self._lock:
+            if self._areas is not None:
+                self._discard(venue_id)
+
+    def _discard(self, venue_id):
+        # lists are replaced rather than mutated so readers iterating an
+        # older snapshot outside the lock are never disturbed
+        key = self._venue_area.pop(venue_id, None)
+        if key is None:
+            return
+        area = self._by_key[key]
+        area["venues"] = [venue for venue in area["venues"] if venue["id"] != venue_id]
+        if not area["venues"]:
+            del self._by_key[key]
+            self._areas = [other for other in self._areas if other is not area]
+
+
+area_index = AreaIndex()
@@ -0,0 +1,244 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import Blueprint, abort, current_app, request, send_file, url_for as flask_url_for
+
+try:
+    import brotli
+except ImportError:  # optional, only adds .br variants
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:  # optional, better JS minification
+    rjsmin = None
+
+#----------------------------------------------------------------------------#
+# Static assets.
+#----------------------------------------------------------------------------#
+
+# `flask build-assets` concatenates and minifies the CSS and JS the layout
+# uses into BUNDLES, copies FILES and anything the CSS points at with url(),
+# and writes each of them to static/dist under a content-hashed name, next to
+# .gz (and, with the brotli package, .br) variants. static/dist/manifest.json
+# maps logical names to hashed ones.
+#
+# Templates keep calling url_for('static', filename=...): for a built asset it
+# returns the hashed URL, served with a one-year immutable Cache-Control and
+# the precompressed variant the client accepts. Without a build, bundles are
+# concatenated on each request (uncached) and other files come from static/
+# as before.
+
+# bundle -> source files in static/, in order
+BUNDLES = {
+    'bundles/site.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    'bundles/head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ],
+    # deferred, so it runs after jQuery
+    'bundles/site.js': [
+        'js/script.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ],
+}
+
+# files templates link to one by one
+FILES = [
+    'js/libs/jquery-1.11.1.min.js',
+    'js/libs/respond-1.4.2.min.js',
+    'img/front-splash.jpg',
+]
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.eot', '.ttf', '.otf')
+
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+bp = Blueprint('assets', __name__)
+
+_manifest = {}      # logical name -> hashed name, from the last build
+_served = set()     # hashed names
+
+
+def minify_css(text):
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    if rjsmin is not None:
+        return rjsmin.jsmin(text)
+    # without rjsmin only whole-line comments and indentation go
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def _css_target(source, url):
+    # (static path, "?query#fragment") for a relative url() in `source`, or
+    # (None, None) for absolute and data: URLs
+    if re.match(r'^([a-z]+:|/|#)', url):
+        return None, None
+    path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source), path)), suffix
+
+
+def _rewrite_urls(css, source, output, renamed):
+    # url()s are relative to the source file; make them relative to `output`
+    # and point them at the hashed copies
+    def rewrite(match):
+        target, suffix = _css_target(source, match.group(2))
+        if target is None:
+            return match.group(0)
+        if target in renamed:
+            target = posixpath.join(DIST, renamed[target])
+        relative = posixpath.relpath(target, posixpath.dirname(posixpath.join(DIST, output)))
+        return 'url("{0}{1}")'.format(relative, suffix)
+    return _CSS_URL.sub(rewrite, css)
+
+
+def css_references(static_folder):
+    # static files the bundled CSS points at
+    references = set()
+    for sources in BUNDLES.values():
+        for source in sources:
+            if not source.endswith('.css'):
+                continue
+            with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+                for _, url in _CSS_URL.findall(f.read()):
+                    target, _ = _css_target(source, url)
+                    if target is not None and os.path.isfile(os.path.join(static_folder, target)):
+                        references.add(target)
+    return sorted(references)
+
+
+def bundle(static_folder, name, renamed=None):
+    # the minified text of a bundle
+    parts = []
+    for source in BUNDLES[name]:
+        with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+            text = f.read()
+        if name.endswith('.css'):
+            parts.append(_rewrite_urls(minify_css(text), source, name, renamed or {}))
+        else:
+            parts.append(minify_js(text).rstrip().rstrip(';') + ';')
+    return '\n'.join(parts).encode('utf-8')
+
+
+def fingerprint(name, data):
+    base, extension = posixpath.splitext(name)
+    return '{0}.{1}{2}'.format(base, hashlib.sha256(data).hexdigest()[:12], extension)
+
+
+def _write(dist, name, data):
+    # writes `data` and its compressed variants; returns their sizes
+    path = os.path.join(dist, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    sizes = {"bytes": len(data), "gzip": None, "br": None}
+    if not name.endswith(COMPRESSIBLE):
+        return sizes
+    variants = [('gzip', '.gz', gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        variants.append(('br', '.br', brotli.compress(data, quality=11)))
+    for encoding, suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            sizes[encoding] = len(compressed)
+    return sizes
+
+
+def build(static_folder):
+    # rebuilds static/dist; returns [(logical name, hashed name, sizes)]
+    dist = os.path.join(static_folder, DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+    renamed, report = {}, []
+    for name in FILES + css_references(static_folder):
+        if name in renamed:
+            continue
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            data = f.read()
+        if name.endswith('.js'):
+            data = minify_js(data.decode('utf-8')).encode('utf-8')
+        renamed[name] = fingerprint(name, data)
+        report.append((name, renamed[name], _write(dist, renamed[name], data)))
+    for name in BUNDLES:
+        data = bundle(static_folder, name, renamed)
+        renamed[name] = fingerprint(name, data)
+        report.append((name, renamed[name], _write(dist, renamed[name], data)))
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump(renamed, f, indent=2, sort_keys=True)
+    load_manifest(static_folder)
+    return report
+
+
+def load_manifest(static_folder):
+    global _manifest, _served
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST)) as f:
+            _manifest = json.load(f)
+    except FileNotFoundError:
+        _manifest = {}
+    _served = set(_manifest.values())
+
+
+def url_for(endpoint, **values):
+    # flask.url_for, with static files mapped to their built versions
+    if endpoint == 'static':
+        filename = values.get('filename')
+        if filename in _manifest:
+            return flask_url_for('assets.asset', **dict(values, filename=_manifest[filename]))
+        if filename in BUNDLES:
+            return flask_url_for('assets.asset', **values)
+    return flask_url_for(endpoint, **values)
+
+
+@bp.route('/static/dist/<path:filename>')
+def asset(filename):
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if filename in BUNDLES and filename not in _manifest:
+        # not built: bundle on the fly, for development
+        response = current_app.response_class(bundle(current_app.static_folder, filename), mimetype=mimetype)
+        response.cache_control.no_cache = True
+        return response
+    if filename not in _served:
+        return abort(404)
+    path = os.path.join(current_app.static_folder, DIST, filename)
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[candidate] and os.path.exists(path + suffix):
+            path, encoding = path + suffix, candidate
+            break
+    max_age = current_app.config['ASSETS_MAX_AGE']
+    response = send_file(path, mimetype=mimetype, conditional=True, max_age=max_age)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    app.config.setdefault('ASSETS_MAX_AGE', 365 * 24 * 3600)
+    load_manifest(app.static_folder)
+    app.register_blueprint(bp)
+    app.jinja_env.globals['url_for'] = url_for
@@ -0,0 +1,73 @@
+"""Micro-benchmark of the `datetime` Jinja filter.
+
+Formats 100k show start times (on the hour or half hour, spread over three
+years) with the old string round trip (str -> dateutil.parser.parse ->
+babel.dates.format_datetime) and with the filter: cold and warm memo cache,
+one 500-tile page viewed repeatedly, and memoization bypassed:
+
+    python benchmarks/datetime_benchmark.py
+    python benchmarks/datetime_benchmark.py --count 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import babel.dates
+import dateutil.parser
+
+import datetime_format
+from datetime_format import FORMATS, format_datetime
+
+
+def old_format_datetime(value, format='medium'):
+    # the filter as it was in app.py
+    date = dateutil.parser.parse(value)
+    return babel.dates.format_datetime(date, FORMATS.get(format, format), locale='en')
+
+
+def timestamps(count, rng_seed=42):
+    rng = random.Random(rng_seed)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    return [now + timedelta(minutes=30 * rng.randint(-2 * 365 * 48, 365 * 48)) for _ in range(count)]
+
+
+def timed(label, function, values, baseline=None):
+    started = time.perf_counter()
+    for value in values:
+        function(value, 'full')
+    elapsed = time.perf_counter() - started
+    print('%-24s %8.3fs %8.2f us/call%s' % (
+        label, elapsed, elapsed * 1e6 / len(values),
+        '   %.1fx' % (baseline / elapsed) if baseline else ''))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args()
+
+    values = timestamps(args.count)
+    strings = [str(value) for value in values]
+    for value, string in zip(values[:1000], strings):
+        assert format_datetime(value, 'full') == old_format_datetime(string, 'full')
+    datetime_format._format.cache_clear()
+
+    print('%d timestamps, %d distinct' % (len(values), len(set(values))))
+    baseline = timed('str + parse + babel', old_format_datetime, strings)
+    timed('filter, cold cache', format_datetime, values, baseline)
+    timed('filter, warm cache', format_datetime, values, baseline)
+    # repeat views of one 500-tile /shows page fit in the memo cache
+    timed('filter, same page x%d' % (len(values) // 500), format_datetime, values[:500] * (len(values) // 500), baseline)
+    datetime_format._format.cache_clear()
+    timed('filter, no memo', lambda value, format: datetime_format._format.__wrapped__(value, format, 'en'),
+          values, baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Throughput benchmark for `flask import` (bulk_import.py).
+
+Writes synthetic venue, artist and show files in CSV and NDJSON, imports
+them into an empty database and reports rows per second, next to the old
+path of one ORM object and one commit per row (create_venue_submission):
+
+    python benchmarks/import_benchmark.py
+    python benchmarks/import_benchmark.py --rows 200000 --database-uri postgresql://user@localhost/fyyur_import
+
+A share of the rows (--invalid) is made invalid to exercise validation.
+Against PostgreSQL point it at an empty scratch database.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from seed import CITIES, VENUE_WORDS, make_words
+
+
+def make_owner(rng, words, kind, invalid):
+    city, state = rng.choice(CITIES)
+    row = {
+        "name": ' '.join(rng.choice(words).title() for _ in range(2)) + (' ' + rng.choice(VENUE_WORDS) if kind == 'venues' else ''),
+        "city": city,
+        "state": state,
+        "phone": '%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+        "image_link": 'https://images.example.com/%d.jpg' % rng.randint(1, 10 ** 6),
+        "genres": rng.sample(['Jazz', 'Blues', 'Rock n Roll', 'Folk', 'Pop', 'Soul'], rng.randint(1, 3)),
+        "facebook_link": 'https://www.facebook.com/%s' % rng.choice(words),
+        "website_link": 'https://%s.example.com' % rng.choice(words),
+        "seeking_description": '',
+    }
+    if kind == 'venues':
+        row["address"] = '%d %s St' % (rng.randint(1, 9999), rng.choice(words).title())
+        row["seeking_talent"] = rng.random() < 0.3
+    else:
+        row["seeking_venue"] = rng.random() < 0.3
+    if rng.random() < invalid:
+        row[rng.choice(["phone", "state", "facebook_link", "name"])] = rng.choice(['', 'not valid'])
+    return row
+
+
+def write_file(path, format, rows):
+    with open(path, 'w', newline='') as f:
+        if format == 'ndjson':
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+            return
+        writer = None
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(f, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(dict(row, genres=';'.join(row["genres"])) if "genres" in row else row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-uri')
+    parser.add_argument('--rows', type=int, default=50000, help='venues and artists per format')
+    parser.add_argument('--shows', type=int, default=200000)
+    parser.add_argument('--invalid', type=float, default=0.02)
+    parser.add_argument('--orm-rows', type=int, default=1000, help='rows for the one-commit-per-row baseline')
+    args = parser.parse_args()
+
+    from app import create_app
+    from database import db
+    from bulk_import import import_rows, read_rows
+    from models.models import Venue
+    app = create_app()
+
+    workdir = tempfile.mkdtemp()
+    path = None
+    if args.database_uri:
+        app.config['SQLALCHEMY_DATABASE_URI'] = args.database_uri
+    else:
+        path = os.path.join(workdir, 'import.db')
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+
+    rng = random.Random(42)
+    words = make_words(rng)
+    print('%-28s %9s %9s %9s %12s' % ('import', 'rows', 'rejected', 'seconds', 'rows/s'))
+
+    def report(label, imported, rejected, elapsed):
+        print('%-28s %9d %9d %9.2f %12.0f' % (label, imported, rejected, elapsed, (imported + rejected) / elapsed))
+
+    try:
+        with app.app_context():
+            db.create_all()
+
+            # baseline: one Venue object and one commit per row
+            started = time.perf_counter()
+            for _ in range(args.orm_rows):
+                row = make_owner(rng, words, 'venues', 0)
+                db.session.add(Venue(**row))
+                db.session.commit()
+            report('venues, ORM + commit per row', args.orm_rows, 0, time.perf_counter() - started)
+
+            for kind in ('venues', 'artists'):
+                for format in ('csv', 'ndjson'):
+                    source = os.path.join(workdir, '%s.%s' % (kind, format))
+                    write_file(source, format, (make_owner(rng, words, kind, args.invalid) for _ in range(args.rows)))
+                    with open(source, newline='') as f:
+                        started = time.perf_counter()
+                        imported, rejected = import_rows(kind, read_rows(f, format))
+                        report('%s, %s' % (kind, format), imported, rejected, time.perf_counter() - started)
+
+            venues, artists = args.orm_rows + 2 * args.rows, 2 * args.rows
+            source = os.path.join(workdir, 'shows.csv')
+            write_file(source, 'csv', ({"venue_id": rng.randint(1, venues), "artist_id": rng.randint(1, artists),
+                                        "start_time": '2026-%02d-%02d %02d:00' % (rng.randint(1, 12), rng.randint(1, 28), rng.randint(12, 23))}
+                                       for _ in range(args.shows)))
+            with open(source, newline='') as f:
+                started = time.perf_counter()
+                imported, rejected = import_rows('shows', read_rows(f, 'csv'))
+                report('shows, csv', imported, rejected, time.perf_counter() - started)
+    finally:
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""Query plan regression check for every read route of the app.
+
+Seeds a database with a large synthetic catalog, calls each route through
+the Flask test client while recording the SQL it runs, then EXPLAINs every
+statement. Exits non-zero when a statement needs a full table scan (SQLite
+`SCAN <table>` without an index, PostgreSQL `Seq Scan`) or when a request
+repeats the same statement N_PLUS_ONE_THRESHOLD or more times:
+
+    python benchmarks/query_plans.py
+    python benchmarks/query_plans.py --database-uri postgresql://user@localhost/fyyur_plans
+
+Against PostgreSQL point it at an empty scratch database; it is seeded and
+left in place.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event, text
+
+from seed import seed
+
+N_PLUS_ONE_THRESHOLD = 3
+
+# (endpoint, table) pairs that are known to read a whole table. Each entry is
+# a bug to fix, not a baseline to keep: remove it with the fix.
+KNOWN_SCANS = set()
+
+# Extra query strings for routes whose behaviour depends on them.
+VARIANTS = [
+    '/shows?upcoming=1',
+    '/shows?from=2020-01-01&to=2030-01-01',
+    '/shows?from=2090-01-01',
+    '/venues?genre=Jazz',
+    '/artists?genre=Jazz',
+    '/artists?letter=M',
+    '/venues/1/shows?section=past',
+    '/artists/1/shows?section=past',
+    '/venues/search.json?q=hall',
+    '/artists/search.json?q=brandon',
+    '/venues/lookup.json?q=br',
+    '/artists/lookup.json?q=ba&limit=50',
+    '/api/v1/shows?include=venue,artist&fields=start_time',
+    '/api/v1/shows?venue_id=1',
+    '/api/v1/shows?artist_id=1',
+    '/api/v1/venues?fields=name,genres',
+    '/api/v1/venues/available?city=New+York&start=2026-06-01T20:00&end=2026-06-01T23:00',
+    '/api/v1/venues/available?city=Austin&state=TX&start=2026-06-01T20:00&end=2026-06-02T02:00',
+]
+POSTS = [
+    ('/venues/search', {'search_term': 'hall'}),
+    ('/artists/search', {'search_term': 'brandon'}),
+]
+
+
+def routes(app):
+    # every GET route with ids filled in, plus VARIANTS
+    urls = []
+    for rule in app.url_map.iter_rules():
+        if 'GET' not in rule.methods or rule.endpoint == 'static':
+            continue
+        url = re.sub(r'<any\(([a-z_]+)[^)]*\):[a-z_]+>', r'\1', rule.rule)
+        urls.append(re.sub(r'<(?:int:)?[a-z_]+>', '1', url))
+    return sorted(set(urls)) + VARIANTS
+
+
+def route_requests(app):
+    # (method, url, form data) for every read route
+    return [('GET', url, None) for url in routes(app)] + [('POST', url, data) for url, data in POSTS]
+
+
+def explain(connection, statement, parameters):
+    # returns the names of tables read by a full scan
+    if connection.dialect.name == 'postgresql':
+        plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+        scans, nodes = [], [plan[0]['Plan']]
+        while nodes:
+            node = nodes.pop()
+            if node['Node Type'] == 'Seq Scan':
+                scans.append(node['Relation Name'])
+            nodes.extend(node.get('Plans', []))
+        return scans
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    details = [row[-1] for row in rows]
+    # an unfiltered rowid walk (first page ordered by id) stops at the LIMIT
+    if re.search(r'\bLIMIT\b', statement) and not re.search(r'\bWHERE\b', statement) \
+            and not any('TEMP B-TREE' in detail for detail in details):
+        return []
+    # SCAN of a subquery (anon_1, ...) reads rows another step produced,
+    # e.g. one limited branch of a keyset_union_page; only tables count
+    tables = set(connection.dialect.get_table_names(connection))
+    scans = []
+    for detail in details:
+        match = re.match(r'SCAN (?:TABLE )?"?(\w+)"?(.*)', detail)
+        if match and 'INDEX' not in match.group(2) and match.group(1) in tables:
+            scans.append(match.group(1))
+    return scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-uri')
+    parser.add_argument('--venues', type=int, default=20000)
+    parser.add_argument('--artists', type=int, default=20000)
+    parser.add_argument('--shows', type=int, default=200000)
+    args = parser.parse_args()
+
+    from app import create_app
+    from archive import archive_shows
+    from database import db
+    from area_index import area_index
+    from letter_index import artist_letters
+    from search import venue_search, artist_search
+    from sql_stats import statement_shape
+    from stats import catch_up
+    app = create_app()
+
+    path = None
+    if args.database_uri:
+        app.config['SQLALCHEMY_DATABASE_URI'] = args.database_uri
+    else:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.extensions['page_cache'].max_bytes = 0  # check the SQL each route runs when it renders
+    app.config['JOB_WORKERS'] = 0  # no job runner polling alongside the routes
+
+    failures = []
+    try:
+        with app.app_context():
+            db.create_all()
+            seed(db, args.venues, args.artists, args.shows)
+            # fill the stats rollups, then archive shows older than
+            # SHOW_HOT_DAYS, so past reads span both tables
+            catch_up()
+            archive_shows()
+            db.session.execute(text('ANALYZE'))
+            db.session.commit()
+            # the in-process indexes read whole tables by design; build them
+            # up front so only per-request SQL is checked
+            area_index.rebuild()
+            artist_letters.rebuild()
+            venue_search.rebuild()
+            artist_search.rebuild()
+            engine = db.get_engine()
+
+            statements = defaultdict(list)
+            current = []
+
+            @event.listens_for(engine, 'before_cursor_execute')
+            def record(conn, cursor, statement, parameters, context, executemany):
+                current.append((statement, parameters))
+
+            client = app.test_client()
+            for method, url, data in route_requests(app):
+                del current[:]
+                response = client.open(url, method=method, data=data)
+                endpoint = app.url_map.bind('localhost').match(url.split('?')[0], method=method)[0]
+                statements[(method, url, endpoint)] = list(current)
+                if response.status_code >= 500:
+                    failures.append('%s %s: HTTP %d' % (method, url, response.status_code))
+            event.remove(engine, 'before_cursor_execute', record)
+
+            with engine.connect() as connection:
+                for (method, url, endpoint), executed in statements.items():
+                    shapes = Counter(statement_shape(statement) for statement, _ in executed)
+                    for statement, count in shapes.items():
+                        if count >= N_PLUS_ONE_THRESHOLD:
+                            failures.append('%s %s: N+1, ran %d times: %s' % (method, url, count, statement[:120]))
+                    for statement, parameters in executed:
+                        if not statement.lstrip().upper().startswith('SELECT'):
+                            continue
+                        for table in explain(connection, statement, parameters):
+                            if (endpoint, table) not in KNOWN_SCANS:
+                                failures.append('%s %s: full scan of %s: %s' % (method, url, table, statement[:120]))
+                    print('%-4s %-48s %3d queries' % (method, url, len(executed)))
+    finally:
+        if path:
+            os.remove(path)
+
+    for failure in failures:
+        print('FAIL ' + failure)
+    print('%d problem(s) found' % len(failures))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
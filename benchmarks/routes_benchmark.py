@@ -0,0 +1,158 @@
+"""Per-route latency, query count and memory benchmark.
+
+Calls every read route of the app (the same list query_plans.py checks)
+through the Flask test client and reports p50/p95/p99 latency, SQL
+statements per request and peak Python memory per request. Results are
+written as JSON so runs from different commits can be compared:
+
+    python benchmarks/routes_benchmark.py
+    python benchmarks/routes_benchmark.py --database-uri sqlite:///fyyur_bench.db --iterations 200
+    python benchmarks/routes_benchmark.py --compare benchmarks/results/1a2b3c4.json
+
+Without --database-uri a temporary SQLite database is seeded with seed.py.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+
+from query_plans import route_requests
+from seed import seed
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(__file__), text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def measure(client, engine, method, url, data, iterations):
+    queries = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count(conn, cursor, statement, parameters, context, executemany):
+        queries[-1] += 1
+
+    samples = []
+    try:
+        queries.append(0)
+        client.open(url, method=method, data=data)  # warm up caches and indexes
+        del queries[:]
+        for _ in range(iterations):
+            queries.append(0)
+            started = time.perf_counter()
+            response = client.open(url, method=method, data=data)
+            samples.append((time.perf_counter() - started) * 1000)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+
+    tracemalloc.start()
+    client.open(url, method=method, data=data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {
+        "status": response.status_code,
+        "p50_ms": round(cuts[49], 3),
+        "p95_ms": round(cuts[94], 3),
+        "p99_ms": round(cuts[98], 3),
+        "queries": round(statistics.mean(queries), 2),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print('\nvs %s (%s)' % (baseline["commit"], baseline_path))
+    print('%-52s %16s %16s %12s' % ('route', 'p50 ms', 'p95 ms', 'queries'))
+    for key, now in results["routes"].items():
+        before = baseline["routes"].get(key)
+        if before is None:
+            continue
+        print('%-52s %7.2f %+7.0f%% %7.2f %+7.0f%% %5.1f %+6.1f' % (
+            key, now["p50_ms"], 100.0 * (now["p50_ms"] - before["p50_ms"]) / before["p50_ms"],
+            now["p95_ms"], 100.0 * (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"],
+            now["queries"], now["queries"] - before["queries"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-uri')
+    parser.add_argument('--venues', type=int, default=10000)
+    parser.add_argument('--artists', type=int, default=10000)
+    parser.add_argument('--shows', type=int, default=200000)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--output')
+    parser.add_argument('--compare')
+    parser.add_argument('--page-cache', action='store_true', help='serve repeat requests from the page cache')
+    args = parser.parse_args()
+
+    from app import create_app
+    from database import db
+    app = create_app()
+
+    path = None
+    if args.database_uri:
+        app.config['SQLALCHEMY_DATABASE_URI'] = args.database_uri
+    else:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    app.config['WTF_CSRF_ENABLED'] = False
+    if not args.page_cache:
+        app.extensions['page_cache'].max_bytes = 0
+
+    commit = current_commit()
+    results = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "database": app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+        "iterations": args.iterations,
+        "page_cache": args.page_cache,
+        "routes": {},
+    }
+    try:
+        with app.app_context():
+            if path:
+                db.create_all()
+                seed(db, args.venues, args.artists, args.shows)
+                results["rows"] = {"venues": args.venues, "artists": args.artists, "shows": args.shows}
+            engine = db.get_engine()
+            client = app.test_client()
+            print('%-52s %6s %9s %9s %9s %8s %9s' % ('route', 'status', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'peak KB'))
+            for method, url, data in route_requests(app):
+                key = '%s %s' % (method, url)
+                row = results["routes"][key] = measure(client, engine, method, url, data, args.iterations)
+                print('%-52s %6d %9.2f %9.2f %9.2f %8.1f %9.1f' % (
+                    key, row["status"], row["p50_ms"], row["p95_ms"], row["p99_ms"], row["queries"], row["peak_kb"]))
+    finally:
+        if path:
+            os.remove(path)
+
+    output = args.output or os.path.join(RESULTS_DIR, '%s.json' % commit)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print('\nwrote %s' % output)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Compare the trigram search index with the old ILIKE search path.
+
+Seeds a throwaway SQLite database with N venues (see seed.py) for each size and times
+both paths over the same set of search terms:
+
+    python benchmarks/search_benchmark.py
+    python benchmarks/search_benchmark.py --sizes 10000 100000 --queries 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from seed import make_words, seed
+
+
+def timed(fn, terms):
+    samples = []
+    for term in terms:
+        start = time.perf_counter()
+        fn(term)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+
+    from app import create_app
+    from database import db
+    from models.models import Venue, VenueGenre
+    from search import SearchIndex
+    app = create_app()
+
+    rng = random.Random(42)
+    print('%10s %12s %14s %14s %14s' % ('rows', 'index build', 'ILIKE p50/max', 'index p50/max', 'speedup'))
+    for size in args.sizes:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+        try:
+            with app.app_context():
+                db.create_all()
+                seed(db, venues=size, artists=0, shows=0)
+                # seed() draws its vocabulary first from Random(42) as well
+                words = make_words(random.Random(42))
+                # mix of whole words and words with a dropped letter
+                terms = [rng.choice(words) for _ in range(args.queries // 2)]
+                terms += [w[:2] + w[3:] for w in rng.sample(words, args.queries - len(terms))]
+
+                def ilike(term):
+                    # the old search_venues query
+                    return Venue.query.filter(Venue.name.ilike(f'%{term}%')).all()
+
+                index = SearchIndex(Venue, VenueGenre.venue_id, VenueGenre.genre_id, ttl=float('inf'))
+                start = time.perf_counter()
+                index.rebuild()
+                build = time.perf_counter() - start
+                ilike_p50, ilike_max = timed(ilike, terms)
+                index_p50, index_max = timed(lambda term: index.search(term, limit=args.limit), terms)
+                db.session.remove()
+                db.get_engine().dispose()
+        finally:
+            os.remove(path)
+        print('%10d %11.2fs %6.1f/%6.1fms %6.1f/%6.1fms %13.1fx' % (
+            size, build, ilike_p50, ilike_max, index_p50, index_max, ilike_p50 / index_p50))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""Generate a synthetic Fyyur catalog with realistic skew.
+
+Venue and artist popularity follow a Zipf-like curve, so a few venues host
+most of the shows, and cities are skewed the same way. Rows go in with bulk
+executemany inserts of BATCH_SIZE rows. The upcoming/past counters are
+computed while generating, so the data is ready to serve. Shows start on the
+hour and last SHOW_HOURS; a drawn show that would double-book its venue or
+artist is dropped, so slightly fewer than --shows rows are written:
+
+    python benchmarks/seed.py --database-uri sqlite:///fyyur_bench.db
+    python benchmarks/seed.py --database-uri postgresql://user@localhost/fyyur_bench \\
+        --venues 100000 --artists 100000 --shows 5000000
+
+The target database must be empty; tables are created if missing.
+"""
+import argparse
+import bisect
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+BATCH_SIZE = 10000
+SHOW_HOURS = 2
+
+ONSETS = ['b', 'br', 'c', 'ch', 'd', 'f', 'g', 'gr', 'h', 'j', 'k', 'l', 'm', 'n', 'p',
+          'pl', 'r', 's', 'st', 't', 'tr', 'v', 'w', 'z']
+VOWELS = ['a', 'e', 'i', 'o', 'u', 'ai', 'ea', 'oo']
+CODAS = ['', 'n', 'r', 'l', 'ck', 'st', 'm', 'x', 'th', 'nd']
+VENUE_WORDS = ['Hall', 'Club', 'Lounge', 'Theatre', 'Bar', 'Room', 'Cellar', 'Garden', 'Stage']
+CITIES = [('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'),
+          ('Phoenix', 'AZ'), ('Philadelphia', 'PA'), ('San Antonio', 'TX'), ('San Diego', 'CA'),
+          ('Dallas', 'TX'), ('Austin', 'TX'), ('San Francisco', 'CA'), ('Seattle', 'WA'),
+          ('Denver', 'CO'), ('Nashville', 'TN'), ('Boston', 'MA'), ('Portland', 'OR'),
+          ('Las Vegas', 'NV'), ('Detroit', 'MI'), ('Memphis', 'TN'), ('New Orleans', 'LA')]
+
+
+def make_words(rng, count=20000):
+    # pronounceable made-up words, so names have a realistic spread of trigrams
+    def syllable():
+        return rng.choice(ONSETS) + rng.choice(VOWELS) + rng.choice(CODAS)
+    return sorted({''.join(syllable() for _ in range(rng.randint(2, 3))) for _ in range(count)})
+
+
+def zipf_cum_weights(size, exponent=1.1):
+    return list(itertools.accumulate(1.0 / rank ** exponent for rank in range(1, size + 1)))
+
+
+def pick(rng, cum_weights):
+    # weighted choice of a 0-based index, like random.choices but cheaper
+    return bisect.bisect(cum_weights, rng.random() * cum_weights[-1])
+
+
+def _show_stream(seed, count, venue_weights, artist_weights, now):
+    rng = random.Random(seed)
+    past, future = 730 * 24, 365 * 24
+    start = now.replace(minute=0, second=0, microsecond=0)
+    booked = set()  # (venue or artist, id, hour offset)
+    for _ in range(count):
+        venue_id, artist_id = pick(rng, venue_weights) + 1, pick(rng, artist_weights) + 1
+        hour = rng.randint(-past, future)
+        slots = [(kind, owner_id, hour + i) for kind, owner_id in (('v', venue_id), ('a', artist_id))
+                 for i in range(SHOW_HOURS)]
+        if booked.isdisjoint(slots):
+            booked.update(slots)
+            yield venue_id, artist_id, start + timedelta(hours=hour)
+
+
+def _tally(shows, now):
+    # ({venue_id: [upcoming, past, next_show_at]}, {artist_id: [...]})
+    tallies = ({}, {})
+    for venue_id, artist_id, start_time in shows:
+        for tally, owner_id in zip(tallies, (venue_id, artist_id)):
+            counts = tally.setdefault(owner_id, [0, 0, None])
+            if start_time > now:
+                counts[0] += 1
+                if counts[2] is None or start_time < counts[2]:
+                    counts[2] = start_time
+            else:
+                counts[1] += 1
+    return tallies
+
+
+def _insert(db, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+
+
+def seed(db, venues=10000, artists=10000, shows=200000, rng_seed=42, log=None):
+    """Fill the database bound to `db` inside the current app context."""
+    from genres import GENRES
+    from models.models import Venue, Artist, Show, VenueGenre, ArtistGenre
+    rng = random.Random(rng_seed)
+    words = make_words(rng)
+    city_weights = zipf_cum_weights(len(CITIES), 1.0)
+    genre_weights = zipf_cum_weights(len(GENRES), 0.8)
+    now = datetime.now()
+    log = log or (lambda message: None)
+
+    # first pass over the show stream only counts, so the owner rows can be
+    # written with their counters before the shows that reference them
+    started = time.perf_counter()
+    venue_weights, artist_weights = zipf_cum_weights(venues), zipf_cum_weights(artists)
+    venue_counts, artist_counts = _tally(_show_stream(rng_seed + 1, shows, venue_weights, artist_weights, now), now)
+    kept = sum(upcoming + past for upcoming, past, _ in venue_counts.values())
+    log('tallied %d of %d shows in %.1fs' % (kept, shows, time.perf_counter() - started))
+
+    def owners(count, tallies, kind):
+        for owner_id in range(1, count + 1):
+            city, state = CITIES[pick(rng, city_weights)]
+            upcoming, past, next_show_at = tallies.get(owner_id, (0, 0, None))
+            name = ' '.join(rng.choice(words).title() for _ in range(rng.randint(1, 2)))
+            row = {
+                "id": owner_id,
+                "name": name + (' ' + rng.choice(VENUE_WORDS) if kind == 'venue' else ''),
+                "city": city,
+                "state": state,
+                "phone": '%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+                "image_link": 'https://images.example.com/%ss/%d.jpg' % (kind, owner_id),
+                "facebook_link": 'https://www.facebook.com/%s%d' % (kind, owner_id),
+                "website_link": 'https://%s%d.example.com' % (kind, owner_id),
+                "seeking_description": rng.choice([None, 'Looking for new %ss' % ('artist' if kind == 'venue' else 'venue')]),
+                "upcoming_shows_count": upcoming,
+                "past_shows_count": past,
+                "next_show_at": next_show_at,
+            }
+            if kind == 'venue':
+                row["address"] = '%d %s St' % (rng.randint(1, 9999), rng.choice(words).title())
+                row["seeking_talent"] = row["seeking_description"] is not None
+            else:
+                row["seeking_venue"] = row["seeking_description"] is not None
+            yield row
+
+    def links(count, key):
+        for owner_id in range(1, count + 1):
+            for genre_id in sorted({pick(rng, genre_weights) + 1 for _ in range(rng.randint(1, 3))}):
+                yield {"genre_id": genre_id, key: owner_id}
+
+    for table, rows in ((Venue.__table__, owners(venues, venue_counts, 'venue')),
+                        (Artist.__table__, owners(artists, artist_counts, 'artist')),
+                        (VenueGenre.__table__, links(venues, 'venue_id')),
+                        (ArtistGenre.__table__, links(artists, 'artist_id'))):
+        started = time.perf_counter()
+        _insert(db, table, rows)
+        db.session.commit()
+        log('inserted %s in %.1fs' % (table.name, time.perf_counter() - started))
+
+    # the owners went in with explicit ids; move the PostgreSQL sequences past
+    # them so venues and artists created later get fresh ids
+    if db.engine.dialect.name == 'postgresql':
+        for table in (Venue.__table__, Artist.__table__):
+            db.session.execute(db.text("SELECT setval(pg_get_serial_sequence('\"{0}\"', 'id'), "
+                                       "coalesce(max(id), 1)) FROM \"{0}\"".format(table.name)))
+        db.session.commit()
+
+    # second pass replays the same stream, now inserting it
+    started = time.perf_counter()
+    _insert(db, Show.__table__, ({"venue_id": venue_id, "artist_id": artist_id, "start_time": start_time,
+                                  "end_time": start_time + timedelta(hours=SHOW_HOURS)}
+                                 for venue_id, artist_id, start_time in
+                                 _show_stream(rng_seed + 1, shows, venue_weights, artist_weights, now)))
+    db.session.commit()
+    log('inserted Show in %.1fs' % (time.perf_counter() - started))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-uri', required=True)
+    parser.add_argument('--venues', type=int, default=10000)
+    parser.add_argument('--artists', type=int, default=10000)
+    parser.add_argument('--shows', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from app import create_app
+    from database import db
+    app = create_app()
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_uri
+    with app.app_context():
+        db.create_all()
+        seed(db, args.venues, args.artists, args.shows, args.seed, log=print)
+
+
+if __name__ == '__main__':
+    main()
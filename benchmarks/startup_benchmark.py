@@ -0,0 +1,95 @@
+"""Cold start benchmark: imports, create_app() and the first request.
+
+Starts fresh interpreters that import app.py, build the app with
+create_app() and serve a first request through the test client, and
+reports the median of each phase. Then breaks the import down with
+`python -X importtime`, listing the modules with the largest cumulative
+import time:
+
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --runs 20 --top 30 --url /venues
+
+The first request runs against an empty temporary SQLite database.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# run in a fresh interpreter; prints the phase timings as JSON
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app({"SQLALCHEMY_DATABASE_URI": sys.argv[1], "SQLALCHEMY_TRACK_MODIFICATIONS": False})
+created = time.perf_counter()
+with app.app_context():
+    from database import db
+    db.create_all()
+ready = time.perf_counter()
+status = app.test_client().get(sys.argv[2]).status_code
+served = time.perf_counter()
+print(json.dumps({"import": imported - started, "create_app": created - imported,
+                  "first_request": served - ready, "status": status, "modules": len(sys.modules)}))
+'''
+
+
+def run_child(database_uri, url):
+    started = time.perf_counter()
+    output = subprocess.check_output([sys.executable, '-c', CHILD, database_uri, url], cwd=ROOT,
+                                     stderr=subprocess.DEVNULL, text=True)
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['process'] = time.perf_counter() - started
+    return timings
+
+
+def import_breakdown(top):
+    # [(cumulative us, self us, module)] for the slowest imports under `from app import create_app`
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'from app import create_app'],
+                            cwd=ROOT, capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), module.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=20, help='modules to list in the import breakdown')
+    parser.add_argument('--url', default='/', help='path of the first request')
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        runs = [run_child('sqlite:///' + path, args.url) for _ in range(args.runs)]
+    finally:
+        os.remove(path)
+    if any(run['status'] >= 500 for run in runs):
+        sys.exit('first request to {0} failed with {1}'.format(args.url, runs[0]['status']))
+
+    print('%-22s %10s %10s' % ('phase (median)', 'ms', 'max ms'))
+    for phase in ('import', 'create_app', 'first_request', 'process'):
+        values = [run[phase] * 1000 for run in runs]
+        print('%-22s %10.1f %10.1f' % (phase, statistics.median(values), max(values)))
+    print('%-22s %10d' % ('modules loaded', runs[0]['modules']))
+
+    print()
+    print('%10s %10s  %s' % ('cumul ms', 'self ms', 'module (python -X importtime)'))
+    for cumulative_us, self_us, module in import_breakdown(args.top):
+        print('%10.1f %10.1f  %s' % (cumulative_us / 1000, self_us / 1000, module))
+
+
+if __name__ == '__main__':
+    main()
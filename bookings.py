@@ -0,0 +1,128 @@
+import bisect
+from datetime import timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import and_, exists
+
+from archive import reaches_archive
+from database import db
+from models.models import Show, ShowArchive, Venue
+
+#----------------------------------------------------------------------------#
+# Double-booking checks.
+#----------------------------------------------------------------------------#
+
+# A show takes its venue and its artist from start_time until end_time, and two
+# shows overlap when each starts before the other ends. On PostgreSQL the
+# Show_venue_no_overlap / Show_artist_no_overlap exclusion constraints enforce
+# this; conflicts() checks it before an insert on every database, so the user
+# gets a message rather than an IntegrityError.
+#
+# Shows last at most SHOW_MAX_MINUTES, so a show overlapping [start, end)
+# starts after start - SHOW_MAX_MINUTES. Every check is therefore a bounded
+# range scan of the (venue_id, start_time) or (artist_id, start_time) index,
+# however many shows the venue or artist has had. Show_archive is checked too
+# when the interval reaches back past archive.horizon().
+
+
+class BookingError(ValueError):
+    pass
+
+
+def max_duration():
+    return timedelta(minutes=current_app.config['SHOW_MAX_MINUTES'])
+
+
+def default_duration():
+    return timedelta(minutes=current_app.config['SHOW_DEFAULT_MINUTES'])
+
+
+def check_duration(start_time, end_time):
+    # raises BookingError unless the show lasts 1..SHOW_MAX_MINUTES minutes
+    if not timedelta(0) < end_time - start_time <= max_duration():
+        raise BookingError('A show lasts between 1 and {0} minutes'.format(current_app.config['SHOW_MAX_MINUTES']))
+
+
+def end_time_for(start_time, minutes=None):
+    # end of a show starting at start_time, SHOW_DEFAULT_MINUTES long by default
+    end_time = start_time + (default_duration() if minutes is None else timedelta(minutes=minutes))
+    check_duration(start_time, end_time)
+    return end_time
+
+
+def overlapping(start_time, end_time, model=Show):
+    # rows of `model` (Show or ShowArchive) overlapping [start_time, end_time)
+    return and_(model.start_time > start_time - max_duration(), model.start_time < end_time,
+                model.end_time > start_time)
+
+
+def _models(start_time):
+    return (Show, ShowArchive) if reaches_archive(start_time - max_duration()) else (Show,)
+
+
+def conflicts(venue_id, artist_id, start_time, end_time):
+    # shows that would double-book the venue or the artist, soonest first
+    queries = []
+    for model in _models(start_time):
+        columns = (model.id, model.venue_id, model.artist_id, model.start_time, model.end_time)
+        for column, owner_id in ((model.venue_id, venue_id), (model.artist_id, artist_id)):
+            queries.append(db.session.query(*columns).filter(column == owner_id,
+                                                             overlapping(start_time, end_time, model)))
+    return sorted(set(queries[0].union_all(*queries[1:]).all()), key=lambda show: (show.start_time, show.id))
+
+
+def venue_is_free(start_time, end_time):
+    # clause for venues with no show overlapping [start_time, end_time)
+    return and_(*[~exists().where(and_(model.venue_id == Venue.id, overlapping(start_time, end_time, model)))
+                  for model in _models(start_time)])
+
+
+def _utc(value):
+    # naive UTC, so SQLite's naive and PostgreSQL's aware datetimes compare
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def batch_conflicts(rows):
+    # for bulk imports: {index in rows: (key, show id or None)} for the rows
+    # that overlap an existing show or an earlier row of the batch at their
+    # venue_id or artist_id. Reads the existing shows of the batch's venues
+    # and artists over the batch's time span, one query per key and table.
+    if not rows:
+        return {}
+    span_start = min(_utc(row['start_time']) for row in rows).replace(tzinfo=timezone.utc) - max_duration()
+    span_end = max(_utc(row['end_time']) for row in rows).replace(tzinfo=timezone.utc)
+    booked = {}     # (key, id) -> ([start], [(start, end, show id)]), sorted by start
+    for model in _models(span_start + max_duration()):
+        for key in ('venue_id', 'artist_id'):
+            column = getattr(model, key)
+            ids = {row[key] for row in rows}
+            query = db.session.query(column, model.start_time, model.end_time, model.id).filter(
+                column.in_(ids), model.start_time > span_start, model.start_time < span_end,
+                model.end_time.isnot(None))
+            for owner_id, start_time, end_time, show_id in query:
+                starts, shows = booked.setdefault((key, owner_id), ([], []))
+                position = bisect.bisect_right(starts, _utc(start_time))
+                starts.insert(position, _utc(start_time))
+                shows.insert(position, (_utc(start_time), _utc(end_time), show_id))
+
+    limit = max_duration()
+    clashes = {}
+    for index, row in enumerate(rows):
+        start_time, end_time = _utc(row['start_time']), _utc(row['end_time'])
+        for key in ('venue_id', 'artist_id'):
+            starts, shows = booked.get((key, row[key]), ([], []))
+            # only shows starting in (start - longest show, end) can overlap
+            first, last = bisect.bisect_right(starts, start_time - limit), bisect.bisect_left(starts, end_time)
+            clash = next((show for show in shows[first:last] if show[1] > start_time), None)
+            if clash is not None:
+                clashes[index] = (key, clash[2])
+                break
+        else:
+            for key in ('venue_id', 'artist_id'):
+                starts, shows = booked.setdefault((key, row[key]), ([], []))
+                position = bisect.bisect_right(starts, start_time)
+                starts.insert(position, start_time)
+                shows.insert(position, (start_time, end_time, None))
+    return clashes
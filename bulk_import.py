@@ -0,0 +1,314 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import func, text
+from wtforms.fields import BooleanField, SelectField, SelectMultipleField
+from wtforms.fields.core import UnboundField
+from wtforms.validators import StopValidation, ValidationError
+
+from bookings import BookingError, batch_conflicts, check_duration, end_time_for
+from database import db
+from datetime_format import parse_datetime
+from forms import VenueForm, ArtistForm
+from genres import GENRE_IDS, parse_genres
+from models.models import Venue, Artist, Show, VenueGenre, ArtistGenre
+from show_counts import OWNERS, refresh_counters
+from stats import add_totals
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+# Loads venues, artists or shows from CSV or NDJSON, BATCH_SIZE rows per
+# transaction. Venue and artist rows are checked against the validators and
+# choices declared on VenueForm / ArtistForm, read once from the form class
+# and run against a bare value holder, so no WTForms object is built per row.
+# Show rows need a start_time and an existing venue_id and artist_id, and
+# take an end_time or a duration in minutes (default SHOW_DEFAULT_MINUTES).
+# Shows that would double-book a venue or an artist are rejected before the
+# batch is written, so one overlap cannot abort a whole COPY.
+#
+# Batches are written with COPY on PostgreSQL and executemany elsewhere.
+# Venue and artist ids are allocated up front so their genre links can be
+# written in the same batch; on SQLite they follow max(id), so do not import
+# while the site is taking new venues or artists. Running web workers pick
+# up the new rows when their area/search indexes and page cache expire.
+# Imported artists are added to the stats totals as they go; imported shows
+# reach the stats rollups at the next `flask update-stats`.
+
+BATCH_SIZE = 5000
+
+# CSV multi-value cells (genres) are separated like export.py writes them
+LIST_SEPARATOR = ';'
+FALSE_VALUES = ('', 'false', '0', 'no', 'off')
+
+
+class _Value:
+    # stands in for a bound WTForms field when calling its validators
+    __slots__ = ('data', 'errors')
+
+    def __init__(self, data):
+        self.data = data
+        self.errors = []
+
+    @staticmethod
+    def gettext(string):
+        return string
+
+    @staticmethod
+    def ngettext(singular, plural, n):
+        return singular if n == 1 else plural
+
+
+def compile_rules(form_class):
+    # [(name, kind, choices, validators)] in form field order
+    fields = sorted(((name, value) for name, value in vars(form_class).items() if isinstance(value, UnboundField)),
+                    key=lambda item: item[1].creation_counter)
+    rules = []
+    for name, unbound in fields:
+        if issubclass(unbound.field_class, BooleanField):
+            kind = 'boolean'
+        elif issubclass(unbound.field_class, SelectMultipleField):
+            kind = 'multiple'
+        elif issubclass(unbound.field_class, SelectField):
+            kind = 'choice'
+        else:
+            kind = 'string'
+        choices = unbound.kwargs.get('choices')
+        choices = frozenset(value for value, _ in choices) if choices else None
+        rules.append((name, kind, choices, tuple(unbound.kwargs.get('validators') or ())))
+    return rules
+
+
+def _coerce(kind, raw):
+    if kind == 'boolean':
+        return raw if isinstance(raw, bool) else str(raw if raw is not None else '').strip().lower() not in FALSE_VALUES
+    if kind == 'multiple':
+        if isinstance(raw, list):
+            return [str(value) for value in raw]
+        raw = (raw or '').strip()
+        if raw.startswith('{'):
+            return parse_genres(raw)
+        return [value.strip() for value in raw.split(LIST_SEPARATOR) if value.strip()]
+    return '' if raw is None else str(raw)
+
+
+def validate(rules, row):
+    # returns (values, errors); errors maps field name -> [messages]
+    values, errors = {}, {}
+    for name, kind, choices, validators in rules:
+        value = values[name] = _coerce(kind, row.get(name))
+        messages = []
+        if choices is not None:
+            if kind == 'multiple':
+                messages.extend("'{0}' is not a valid choice for this field".format(v) for v in value if v not in choices)
+            elif value not in choices:
+                messages.append('Not a valid choice')
+        holder = _Value(value)
+        for validator in validators:
+            try:
+                validator(None, holder)
+            except StopValidation as stop:
+                if stop.args and stop.args[0]:
+                    messages.append(stop.args[0])
+                break
+            except ValidationError as error:
+                messages.append(str(error))
+        if messages:
+            errors[name] = messages
+    return values, errors
+
+
+def _parse_time(value):
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(value)  # fast path for ISO dates
+        except ValueError:
+            value = parse_datetime(value)
+    return value
+
+
+def validate_show(row):
+    values, errors = {}, {}
+    for name in ('venue_id', 'artist_id'):
+        try:
+            values[name] = int(row.get(name))
+        except (TypeError, ValueError):
+            errors[name] = ['Not a valid id']
+    try:
+        values['start_time'] = _parse_time(row.get('start_time'))
+    except (TypeError, ValueError, OverflowError):
+        errors['start_time'] = ['Not a valid date and time']
+        return values, errors
+    try:
+        if row.get('end_time'):
+            values['end_time'] = _parse_time(row['end_time'])
+            check_duration(values['start_time'], values['end_time'])
+        else:
+            duration = row.get('duration')
+            values['end_time'] = end_time_for(values['start_time'], int(duration) if duration else None)
+    except BookingError as error:
+        errors['end_time'] = [str(error)]
+    except (TypeError, ValueError, OverflowError):
+        errors['end_time'] = ['Not a valid end time or duration']
+    return values, errors
+
+
+# kind -> (model, form rules, genre junction model and owner column)
+KINDS = {
+    'venues': (Venue, compile_rules(VenueForm), VenueGenre, 'venue_id'),
+    'artists': (Artist, compile_rules(ArtistForm), ArtistGenre, 'artist_id'),
+    'shows': (Show, None, None, None),
+}
+
+
+def read_rows(stream, format):
+    # yields (line number, row dict)
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif format == 'ndjson':
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield line_number, row if isinstance(row, dict) else {'_error': line.strip()}
+    else:
+        raise ValueError('Unknown format: {0}'.format(format))
+
+
+def _copy_value(value):
+    # PostgreSQL COPY text format
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def insert(table, rows):
+    # rows are dicts with the same keys
+    if not rows:
+        return
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        names = list(rows[0])
+        buffer = io.StringIO(''.join('\t'.join(_copy_value(row[name]) for name in names) + '\n' for row in rows))
+        cursor = connection.connection.cursor()
+        cursor.copy_expert('COPY "{0}" ({1}) FROM STDIN'.format(table.name, ', '.join(names)), buffer)
+        cursor.close()
+    else:
+        connection.execute(table.insert(), rows)
+
+
+def allocate_ids(model, count):
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        return [row[0] for row in connection.execute(
+            text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+            {"table": '"{0}"'.format(model.__tablename__), "count": count})]
+    start = (db.session.query(func.max(model.id)).scalar() or 0) + 1
+    return list(range(start, start + count))
+
+
+def _flush_owners(model, link, owner_key, batch):
+    now = datetime.now(timezone.utc)
+    rows, links = [], []
+    for owner_id, values in zip(allocate_ids(model, len(batch)), batch):
+        genres = values.pop('genres', [])
+        values.update(id=owner_id, updated_at=now)
+        rows.append(values)
+        links.extend({"genre_id": GENRE_IDS[name], owner_key: owner_id} for name in dict.fromkeys(genres))
+    insert(model.__table__, rows)
+    insert(link.__table__, links)
+    if model is Artist:
+        add_totals({'artists': len(rows), 'artists_seeking_venue': sum(1 for values in rows if values.get('seeking_venue'))})
+
+
+def _flush_shows(batch, touched):
+    # skips shows whose venue or artist does not exist, or that overlap
+    # another show of theirs; returns [(index in batch, errors)] for them.
+    # Adds the venue and artist ids of the inserted shows to `touched`.
+    known = {}
+    for model, key in ((Venue, 'venue_id'), (Artist, 'artist_id')):
+        ids = {values[key] for values in batch}
+        known[key] = {owner_id for owner_id, in db.session.query(model.id).filter(model.id.in_(ids))}
+    now = datetime.now(timezone.utc)
+    candidates, missing = [], []
+    for index, values in enumerate(batch):
+        errors = {key: ['No such id'] for key in ('venue_id', 'artist_id') if values[key] not in known[key]}
+        if errors:
+            missing.append((index, errors))
+            continue
+        candidates.append((index, values))
+    clashes = batch_conflicts([values for _, values in candidates])
+    rows = []
+    for position, (index, values) in enumerate(candidates):
+        if position in clashes:
+            key, show_id = clashes[position]
+            other = 'show {0}'.format(show_id) if show_id is not None else 'an earlier row'
+            missing.append((index, {key: ['Overlaps {0}'.format(other)]}))
+            continue
+        values['updated_at'] = now
+        rows.append(values)
+    missing.sort(key=lambda item: item[0])
+    insert(Show.__table__, rows)
+    for key in ('venue_id', 'artist_id'):
+        touched[key].update(values[key] for values in rows)
+    return missing
+
+
+def import_rows(kind, rows, batch_size=BATCH_SIZE, reject=None):
+    # rows: iterable of (line number, dict); reject(line, row, errors) is
+    # called for every row that is not imported. Returns (imported, rejected).
+    model, rules, link, owner_key = KINDS[kind]
+    reject = reject or (lambda line, row, errors: None)
+    imported = rejected = 0
+    batch, pending = [], []
+    touched = {'venue_id': set(), 'artist_id': set()}
+
+    def flush():
+        nonlocal imported, rejected
+        if kind == 'shows':
+            missing = _flush_shows(batch, touched)
+            for index, errors in missing:
+                line, row = pending[index]
+                reject(line, row, errors)
+            rejected += len(missing)
+            imported += len(batch) - len(missing)
+        else:
+            _flush_owners(model, link, owner_key, batch)
+            imported += len(batch)
+        db.session.commit()
+        del batch[:], pending[:]
+
+    for line, row in rows:
+        if '_error' in row:
+            values, errors = None, {"_row": ['Not a JSON object']}
+        elif rules is None:
+            values, errors = validate_show(row)
+        else:
+            values, errors = validate(rules, row)
+        if errors:
+            rejected += 1
+            reject(line, row, errors)
+            continue
+        batch.append(values)
+        pending.append((line, row))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    # recount the venues and artists that got shows once, at the end, rather
+    # than after every batch
+    for (model, show_column), key in zip(OWNERS, ('venue_id', 'artist_id')):
+        ids = sorted(touched[key])
+        for start in range(0, len(ids), batch_size):
+            refresh_counters(model, show_column, ids[start:start + batch_size])
+            db.session.commit()
+    return imported, rejected
@@ -0,0 +1,137 @@
+import json
+import time
+
+import click
+from flask import Blueprint, current_app
+
+import assets
+import jobs
+from archive import archive_shows as archive_old_shows
+from bulk_import import KINDS as IMPORT_KINDS, import_rows, read_rows
+from database import db
+from export import FORMATS as EXPORT_FORMATS, TABLES as EXPORT_TABLES, export
+from models.models import Job
+from show_counts import roll_over as roll_over_counters, rebuild as rebuild_counters
+from stats import catch_up as catch_up_stats, rebuild as rebuild_stats_tables
+
+#----------------------------------------------------------------------------#
+# CLI.
+#----------------------------------------------------------------------------#
+
+# registered as top-level `flask <command>`s
+bp = Blueprint('commands', __name__, cli_group=None)
+
+
+@bp.cli.command('roll-show-counters')
+def roll_show_counters():
+  # run periodically (e.g. from cron) to move started shows to the past counters
+  click.echo('Rolled over counters for {0} venues/artists'.format(roll_over_counters()))
+
+@bp.cli.command('archive-shows')
+@click.option('--batch-size', type=int, help='shows per transaction (default: ARCHIVE_BATCH_SIZE)')
+@click.option('--max-batches', type=int, help='stop after this many batches')
+def archive_shows(batch_size, max_batches):
+  # run periodically (e.g. nightly from cron) to keep Show down to recent and upcoming shows
+  click.echo('Archived {0} shows'.format(archive_old_shows(batch_size, max_batches)))
+
+@bp.cli.command('rebuild-show-counters')
+def rebuild_show_counters():
+  click.echo('Rebuilt counters for {0} venues/artists'.format(rebuild_counters()))
+
+@bp.cli.command('update-stats')
+@click.option('--batch-size', type=int, help='shows per transaction (default: STATS_BATCH_SIZE)')
+def update_stats(batch_size):
+  # run periodically (e.g. every few minutes from cron) to add imported shows to
+  # the /stats rollups; run before archive-shows, which leaves uncounted shows
+  click.echo('Added {0} shows to the stats'.format(catch_up_stats(batch_size)))
+
+@bp.cli.command('rebuild-stats')
+@click.option('--batch-size', type=int, help='shows per transaction (default: STATS_BATCH_SIZE)')
+def rebuild_stats(batch_size):
+  # recomputes the /stats rollups from every show, archived ones included
+  click.echo('Rebuilt stats from {0} shows'.format(rebuild_stats_tables(batch_size)))
+
+@bp.cli.command('export')
+@click.argument('table', type=click.Choice(sorted(EXPORT_TABLES)))
+@click.option('--format', 'format_', type=click.Choice(sorted(EXPORT_FORMATS)), default='csv')
+@click.option('--since', help='only rows updated at or after this ISO timestamp (UTC if no offset)')
+@click.option('--output', type=click.File('w'), default='-')
+def export_table(table, format_, since, output):
+  # e.g. flask export shows --format ndjson --since 2026-10-01T00:00:00 --output shows.ndjson
+  for chunk in export(table, format_, since, current_app.config['EXPORT_BATCH_SIZE']):
+    output.write(chunk)
+
+@bp.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORT_KINDS)))
+@click.argument('source', type=click.File('r'))
+@click.option('--format', 'format_', type=click.Choice(['csv', 'ndjson']), help='defaults to the file extension')
+@click.option('--rejects', type=click.File('w'), default='-', help='rejected rows as NDJSON (default: stdout)')
+def import_file(kind, source, format_, rejects):
+  # e.g. flask import venues new_york.csv --rejects rejected.ndjson
+  format_ = format_ or ('csv' if source.name.endswith('.csv') else 'ndjson')
+  def reject(line, row, errors):
+    rejects.write(json.dumps({"line": line, "errors": errors, "row": row}, default=str) + '\n')
+  started = time.perf_counter()
+  imported, rejected = import_rows(kind, read_rows(source, format_), current_app.config['IMPORT_BATCH_SIZE'], reject)
+  elapsed = time.perf_counter() - started
+  click.echo('Imported {0} {1}, rejected {2}, in {3:.1f}s ({4:.0f} rows/s)'.format(
+    imported, kind, rejected, elapsed, (imported + rejected) / elapsed if elapsed else 0), err=True)
+
+@bp.cli.command('build-assets')
+def build_assets():
+  # run on deploy; writes static/dist
+  for name, built, sizes in assets.build(current_app.static_folder):
+    click.echo('{0:<34} {1:>9,} B  gzip {2:>9}  br {3:>9}  {4}'.format(
+      name, sizes["bytes"], format(sizes["gzip"], ',') if sizes["gzip"] else '-',
+      format(sizes["br"], ',') if sizes["br"] else '-', built))
+
+@bp.cli.group('jobs')
+def jobs_group():
+  """Inspect and run background jobs (see jobs.py)."""
+
+@jobs_group.command('list')
+@click.option('--state', type=click.Choice(['queued', 'running', 'done', 'failed']))
+@click.option('--limit', type=int, default=50)
+def list_jobs(state, limit):
+  # counts per state, then the most recently updated jobs
+  counts = dict(db.session.query(Job.state, db.func.count()).group_by(Job.state))
+  click.echo('  '.join('{0}: {1}'.format(name, counts.get(name, 0)) for name in ('queued', 'running', 'done', 'failed')))
+  query = db.session.query(Job)
+  if state:
+    query = query.filter(Job.state == state)
+  for job in query.order_by(Job.updated_at.desc(), Job.id.desc()).limit(limit):
+    error = job.last_error.strip().splitlines()[-1] if job.last_error else ''
+    # due (or lease end) for pending jobs, when they finished otherwise
+    at = job.run_at if job.state in jobs.PENDING else job.updated_at
+    click.echo('{0:>8} {1:<24} {2:<8} {3}/{4}  {5:%Y-%m-%d %H:%M:%S}  {6}  {7}'.format(
+      job.id, job.name, job.state, job.attempts, job.max_attempts, at, job.key or '-', error[:80]))
+
+@jobs_group.command('work')
+@click.option('--workers', type=int, help='threads (default: JOB_WORKERS, at least 1)')
+def work_jobs(workers):
+  # runs jobs until interrupted, e.g. as a service next to web processes with JOB_WORKERS = 0
+  jobs.job_runner.configure(current_app._get_current_object(), max(workers or current_app.config['JOB_WORKERS'], 1))
+  try:
+    jobs.job_runner.work()
+  except KeyboardInterrupt:
+    jobs.job_runner.stop()
+
+@jobs_group.command('drain')
+@click.option('--workers', type=int, help='threads (default: JOB_WORKERS, at least 1)')
+def drain_jobs(workers):
+  # runs jobs until none is due; retries scheduled for later are left queued
+  jobs.job_runner.configure(current_app._get_current_object(), max(workers or current_app.config['JOB_WORKERS'], 1))
+  succeeded, failed = jobs.job_runner.work(until_idle=True)
+  click.echo('Ran {0} jobs, {1} failed'.format(succeeded + failed, failed))
+
+@jobs_group.command('retry')
+@click.argument('job_ids', type=int, nargs=-1, required=True)
+def retry_jobs(job_ids):
+  click.echo('Requeued {0} failed jobs'.format(jobs.requeue(job_ids)))
+
+@jobs_group.command('purge')
+@click.option('--days', type=int, help='keep jobs updated in the last DAYS days (default: JOB_RETENTION_DAYS)')
+@click.option('--failed', is_flag=True, help='purge failed jobs too')
+def purge_jobs(days, failed):
+  # run periodically (e.g. daily from cron); a purged job's key can be enqueued again
+  click.echo('Purged {0} jobs'.format(jobs.purge(days, ('done', 'failed') if failed else ('done',))))
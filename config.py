@@ -2,7 +2,9 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
-SECRET_KEY = os.urandom(32)
+# Signs session cookies, so every worker needs the same one. Without it each
+# process makes up its own (see create_app), which DB_REPLICAS refuses.
+SECRET_KEY = os.getenv('SECRET_KEY')
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
@@ -14,3 +16,118 @@ DB_HOST = os.getenv('DB_HOST')
 DB_NAME = os.getenv('DB_NAME')
 
 SQLALCHEMY_DATABASE_URI = 'postgresql://{0}@{1}:5432/{2}'.format(DB_USER, DB_HOST, DB_NAME)
+
+# Connection pool per worker and engine: persistent connections, extra ones
+# opened under load, seconds before a connection is replaced, a liveness
+# check on checkout, and seconds to wait for a free connection before failing.
+# Checkout waits are reported at /_debug/pools when debug endpoints are on.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_RECYCLE = 1800
+DB_POOL_PRE_PING = True
+DB_POOL_TIMEOUT = 10
+# PostgreSQL statement_timeout for queries serving web requests (0 for none);
+# migrations, CLI commands and background jobs run without one
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 5000))
+
+# Read replicas, as a comma separated list of hosts serving DB_NAME. Listing,
+# search and detail pages read from one of them; a client that has just
+# written reads from the primary for DB_STICKY_SECONDS, which its session
+# cookie carries: SECRET_KEY must be set.
+DB_REPLICA_HOSTS = [host.strip() for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+SQLALCHEMY_BINDS = {'replica_{0}'.format(number): 'postgresql://{0}@{1}:5432/{2}'.format(DB_USER, host, DB_NAME)
+                    for number, host in enumerate(DB_REPLICA_HOSTS, start=1)}
+DB_REPLICAS = sorted(SQLALCHEMY_BINDS)
+DB_STICKY_SECONDS = 5
+
+# Number of show tiles rendered per page at /shows
+SHOWS_PER_PAGE = 30
+
+# Seconds before a worker rebuilds its /venues area index and its /artists
+# A-Z letter counts from the database
+AREA_INDEX_TTL = 300
+
+# Artists per page at /artists
+ARTISTS_PER_PAGE = 50
+
+# Search: most results returned per query, and seconds before a worker
+# rebuilds its in-process search index from the database
+SEARCH_RESULT_LIMIT = 50
+SEARCH_INDEX_TTL = 300
+
+# Read upcoming/past show counts from the denormalized Venue/Artist counters
+# (kept current by create_show_submission and `flask roll-show-counters`)
+# instead of counting Show rows on every detail page view
+SHOW_COUNTERS = True
+
+# Show length in minutes: the form's default, and the longest accepted. A
+# venue or artist cannot be booked for two shows that overlap.
+SHOW_DEFAULT_MINUTES = 120
+SHOW_MAX_MINUTES = 12 * 60
+
+# Shows that ended more than SHOW_HOT_DAYS ago are moved from Show to
+# Show_archive by `flask archive-shows`, ARCHIVE_BATCH_SIZE per transaction
+SHOW_HOT_DAYS = 90
+ARCHIVE_BATCH_SIZE = 1000
+
+# Shows added to the /stats rollups per transaction by `flask update-stats`
+# and `flask rebuild-stats`, and months of genres shown on /stats
+STATS_BATCH_SIZE = 5000
+STATS_MONTHS = 12
+
+# Shows per page in the upcoming/past timelines on venue and artist pages
+TIMELINE_PAGE_SIZE = 6
+
+# Share of requests (0.0-1.0) whose SQL is timed and checked for N+1
+# statement shapes; results go out as Server-Timing headers and to
+# /_debug/requests. Keep it low in production.
+SQL_STATS_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+SQL_STATS_BUFFER_SIZE = 200
+N_PLUS_ONE_THRESHOLD = 3
+
+# Serve /_debug/requests and /_debug/pools (SQL text, parameters and pool
+# internals) outside DEBUG. They answer loopback clients only, but behind a
+# local reverse proxy every client is loopback: leave off in production.
+DEBUG_ENDPOINTS = os.getenv('DEBUG_ENDPOINTS') == '1'
+
+# Rendered page cache: total bytes of cached responses kept per worker
+# (0 turns the cache off), and seconds before an entry is re-rendered
+PAGE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+PAGE_CACHE_TTL = 60
+
+# /api/v1 list endpoints: default and largest ?limit=
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+# Rows per batch (and per server-side cursor fetch) in bulk exports
+EXPORT_BATCH_SIZE = 1000
+
+# Rows per transaction in `flask import`
+IMPORT_BATCH_SIZE = 5000
+
+# Background jobs (jobs.py): worker threads per web process (0 to leave jobs
+# to `flask jobs work`), seconds between polls for due jobs, seconds a job
+# may run before another worker takes it over, attempts before a job is left
+# failed, the retry backoff (doubling from JOB_RETRY_SECONDS up to
+# JOB_RETRY_MAX_SECONDS), and days `flask jobs purge` keeps finished jobs
+# (and so their idempotency keys)
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_POLL_SECONDS = 2
+JOB_LEASE_SECONDS = 300
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_SECONDS = 30
+JOB_RETRY_MAX_SECONDS = 3600
+JOB_RETENTION_DAYS = 7
+
+# Cache-Control max-age (seconds) for the fingerprinted files built by
+# `flask build-assets`; their URLs change whenever their content does
+ASSETS_MAX_AGE = 365 * 24 * 3600
+
+# Image thumbnails (/thumbs): disk cache directory (default: a temp dir),
+# its size limit, seconds browsers may cache a thumbnail, seconds to wait for
+# the remote image, and seconds before a failed image is fetched again
+THUMBNAIL_CACHE_DIR = os.getenv('THUMBNAIL_CACHE_DIR')
+THUMBNAIL_CACHE_MAX_BYTES = 256 * 1024 * 1024
+THUMBNAIL_MAX_AGE = 30 * 24 * 3600
+THUMBNAIL_FETCH_TIMEOUT = 5
+THUMBNAIL_RETRY_SECONDS = 300
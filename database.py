@@ -1,4 +1,4 @@
-from flask_sqlalchemy import SQLAlchemy
+from db_routing import RoutingSQLAlchemy
 
 # TODO: connect to a local postgresql database
-db = SQLAlchemy()
\ No newline at end of file
+db = RoutingSQLAlchemy()
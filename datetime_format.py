@@ -0,0 +1,48 @@
+import functools
+from datetime import datetime
+
+#----------------------------------------------------------------------------#
+# Date formatting.
+#----------------------------------------------------------------------------#
+
+# Backs the `datetime` Jinja filter. Babel patterns are parsed once per
+# locale and format, and formatted strings are memoized: show start times
+# repeat a lot (most shows start on the hour), so a page of tiles is mostly
+# cache hits. Strings are still accepted and parsed, for older callers.
+#
+# Babel and dateutil are slow to import, so they are imported on first use
+# rather than when a worker starts.
+
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+CACHE_SIZE = 10000
+
+
+def parse_datetime(value):
+    import dateutil.parser
+    return dateutil.parser.parse(value)
+
+
+@functools.lru_cache(maxsize=None)
+def compiled(format, locale):
+    # (DateTimePattern, Locale) for a named format or a raw Babel pattern
+    from babel import Locale
+    from babel.dates import parse_pattern
+    return parse_pattern(FORMATS.get(format, format)), Locale.parse(locale)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _format(value, format, locale):
+    pattern, locale = compiled(format, locale)
+    return pattern.apply(value, locale)
+
+
+def format_datetime(value, format='medium', locale='en'):
+    if value is None:
+        return ''
+    if not isinstance(value, datetime):
+        value = parse_datetime(value)
+    return _format(value, format, locale)
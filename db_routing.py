@@ -0,0 +1,175 @@
+import functools
+import random
+import threading
+import time
+
+from flask import abort, current_app, g, has_request_context, jsonify, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, exc, orm
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.dml import UpdateBase
+
+#----------------------------------------------------------------------------#
+# Connection pool and read replica routing.
+#----------------------------------------------------------------------------#
+
+# Server databases get a QueuePool sized by DB_POOL_SIZE / DB_MAX_OVERFLOW,
+# with DB_POOL_RECYCLE, DB_POOL_PRE_PING and DB_POOL_TIMEOUT, and on
+# PostgreSQL a per-statement timeout of DB_STATEMENT_TIMEOUT_MS for queries
+# made while serving a request (not for migrations or CLI commands). The pool
+# records how long checkouts wait; see /_debug/pools (with DEBUG or
+# DEBUG_ENDPOINTS).
+#
+# Views wrapped in @reads_from_replica run their queries on one of the
+# DB_REPLICAS binds (from SQLALCHEMY_BINDS), picked once per request. Flushes
+# and INSERT/UPDATE/DELETE statements always go to the primary, and a client
+# that has just written reads from the primary for DB_STICKY_SECONDS, so it
+# sees its own writes despite replication lag. That deadline lives in the
+# session cookie, so every worker has to share SECRET_KEY.
+
+
+class TimedQueuePool(QueuePool):
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = (time.perf_counter() - started) * 1000
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_ms_total += waited
+                self.wait_ms_max = max(self.wait_ms_max, waited)
+
+    def wait_stats(self):
+        with self._stats_lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_ms_avg": round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.wait_ms_max, 3),
+                "timeouts": self.timeouts,
+            }
+
+
+class RoutingSession(SignallingSession):
+
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase):
+            if has_request_context():
+                g.db_wrote = True
+        elif has_request_context() and g.get('db_replica'):
+            return self.db.get_engine(self.app, bind=g.db_replica)
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        sa_url, options = super().apply_driver_hacks(app, sa_url, options)
+        if not sa_url.drivername.startswith('sqlite'):
+            config = app.config
+            options.setdefault('poolclass', TimedQueuePool)
+            options.setdefault('pool_size', config.get('DB_POOL_SIZE', 5))
+            options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 10))
+            options.setdefault('pool_recycle', config.get('DB_POOL_RECYCLE', -1))
+            options.setdefault('pool_pre_ping', config.get('DB_POOL_PRE_PING', False))
+            options.setdefault('pool_timeout', config.get('DB_POOL_TIMEOUT', 30))
+        return sa_url, options
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = super().create_engine(sa_url, engine_opts)
+        if engine.dialect.name == 'postgresql':
+            event.listen(engine, 'checkout', set_statement_timeout)
+        return engine
+
+
+def set_statement_timeout(dbapi_connection, connection_record, connection_proxy):
+    # DB_STATEMENT_TIMEOUT_MS only while serving a request: migrations, CLI
+    # commands and background jobs run long statements on purpose. Set when a
+    # checkout needs a different value than the connection last had.
+    timeout = (current_app.config.get('DB_STATEMENT_TIMEOUT_MS') or 0) if has_request_context() else 0
+    if connection_record.info.get('statement_timeout', 0) != timeout:
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute('SET statement_timeout = {0:d}'.format(timeout))
+        finally:
+            cursor.close()
+        # committed, so the pool's rollback on return keeps it
+        dbapi_connection.commit()
+        connection_record.info['statement_timeout'] = timeout
+
+
+def is_sticky():
+    # whether this client wrote in the last DB_STICKY_SECONDS
+    return session.get('db_primary_until', 0) > time.time()
+
+
+def read_from_primary():
+    # keeps the rest of this request off the replicas
+    g.db_primary = True
+
+
+def reads_from_replica(view):
+    # route this view's queries to a replica, unless the client just wrote
+    @functools.wraps(view)
+    def wrapper(**kwargs):
+        replicas = current_app.config.get('DB_REPLICAS')
+        if replicas and not g.get('db_primary') and not is_sticky():
+            g.db_replica = random.choice(replicas)
+        return view(**kwargs)
+    return wrapper
+
+
+def pool_status(app, db):
+    pools = []
+    for bind in [None] + list(app.config.get('DB_REPLICAS') or ()):
+        pool = db.get_engine(app, bind=bind).pool
+        status = {"bind": bind or 'primary', "pool": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            status.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+        if isinstance(pool, TimedQueuePool):
+            status.update(pool.wait_stats())
+        pools.append(status)
+    return pools
+
+
+def init_app(app, db):
+    app.config.setdefault('DB_REPLICAS', [])
+    app.config.setdefault('DB_STICKY_SECONDS', 5)
+    if app.config['DB_REPLICAS'] and not app.config.get('SECRET_KEY'):
+        # a worker cannot read another's session cookie, so a client that
+        # wrote would be sent back to a replica by the next worker
+        raise RuntimeError('DB_REPLICAS needs a SECRET_KEY shared by every worker')
+
+    @app.after_request
+    def stick_to_primary(response):
+        # read-your-writes: this client reads from the primary for a while
+        if g.pop('db_wrote', False) and app.config['DB_REPLICAS']:
+            session['db_primary_until'] = time.time() + app.config['DB_STICKY_SECONDS']
+        return response
+
+    if app.debug or app.config.get('DEBUG_ENDPOINTS'):
+        @app.route('/_debug/pools')
+        def debug_pools():
+            if request.remote_addr not in ('127.0.0.1', '::1'):
+                return abort(404)
+            return jsonify(pool_status(app, db))
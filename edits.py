@@ -0,0 +1,78 @@
+import json
+
+from database import db
+from genres import genre_ids
+
+#----------------------------------------------------------------------------#
+# Optimistic edits.
+#----------------------------------------------------------------------------#
+
+# Venue and Artist rows carry a version, bumped by every edit. The edit forms
+# post back the version they were rendered from, plus a JSON snapshot of the
+# values they showed ("original"), and an edit is a single
+#
+#   UPDATE ... SET <changed columns>, version = version + 1
+#   WHERE id = :id AND version = :version
+#
+# with no SELECT first. No row updated means someone else saved in between
+# (or the row is gone), and the view answers 409 instead of overwriting their
+# changes. Genres live in the junction table, so a genre change adds one
+# DELETE and/or one INSERT there, in the same transaction.
+
+
+class EditConflict(Exception):
+    pass
+
+
+def snapshot(form, fields):
+    # the "original" hidden field of an edit form
+    return json.dumps({name: form[name].data for name in fields})
+
+
+def parse_snapshot(value):
+    # None when missing or unreadable; every field then counts as changed
+    try:
+        original = json.loads(value or '')
+    except ValueError:
+        return None
+    return original if isinstance(original, dict) else None
+
+
+def changes(form, fields, original):
+    # {field: new value} for the fields the editor changed
+    values = {name: form[name].data for name in fields}
+    if original is None:
+        return values
+    return {name: value for name, value in values.items() if name not in original or original[name] != value}
+
+
+def save_edit(model, item_id, version, values, genre_link=None, old_genres=None):
+    # writes `values` (genres included) to row `item_id` if it is still at
+    # `version`; raises EditConflict otherwise. The caller commits.
+    values = dict(values)
+    genres = values.pop('genres', None)
+    if version is None:
+        raise EditConflict(item_id)
+    result = db.session.execute(model.__table__.update()
+                                .where(model.id == item_id, model.version == version)
+                                .values(dict(values, version=model.version + 1)))
+    if result.rowcount != 1:
+        raise EditConflict(item_id)
+    if genres is not None and genre_link is not None:
+        replace_genres(genre_link[0], genre_link[1], item_id, genres, old_genres)
+
+
+def replace_genres(link, owner_column, owner_id, genres, old_genres=None):
+    # one DELETE for the links that went and one INSERT for the new ones.
+    # old_genres, when the snapshot had them, is what the row held at the
+    # version just replaced; otherwise the current links are read first.
+    wanted = genre_ids(genres)
+    table = link.__table__
+    db.session.execute(table.delete().where(owner_column == owner_id, link.genre_id.notin_(wanted)))
+    if old_genres is not None:
+        kept = set(genre_ids(old_genres))
+    else:
+        kept = {genre_id for genre_id, in db.session.query(link.genre_id).filter(owner_column == owner_id)}
+    added = [{"genre_id": genre_id, owner_column.key: owner_id} for genre_id in wanted if genre_id not in kept]
+    if added:
+        db.session.execute(table.insert(), added)
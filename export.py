@@ -0,0 +1,135 @@
+import csv
+import io
+import itertools
+import json
+from datetime import date, timezone
+
+from database import db
+from datetime_format import parse_datetime
+from genres import genre_names
+from models.models import Venue, Artist, Show, ShowArchive, VenueGenre, ArtistGenre
+
+#----------------------------------------------------------------------------#
+# Bulk export.
+#----------------------------------------------------------------------------#
+
+# Streams a whole table as CSV, NDJSON or a columnar NDJSON layout, in batches
+# read through a server-side cursor (yield_per), so memory stays flat however
+# big the table is. `since` limits the export to rows whose updated_at is at
+# or after it, for incremental dumps: pass the largest updated_at of the last
+# export. Deleted rows do not show up in incremental exports.
+#
+# The columnar format is one header line {"table", "columns"} followed by one
+# line per batch {"rows": n, "data": [[column 1 values], [column 2 ...]]},
+# the same row-group layout Parquet uses, without a Parquet dependency.
+
+BATCH_SIZE = 1000
+
+# table -> (model, (genre junction model, owner id column) or None)
+TABLES = {
+    'venues': (Venue, (VenueGenre, VenueGenre.venue_id)),
+    'artists': (Artist, (ArtistGenre, ArtistGenre.artist_id)),
+    'shows': (Show, None),
+    # shows moved out of Show by `flask archive-shows`
+    'archived_shows': (ShowArchive, None),
+}
+
+
+def columns(table):
+    model, genre_link = TABLES[table]
+    names = [column.key for column in model.__table__.columns]
+    return names + ['genres'] if genre_link is not None else names
+
+
+def parse_since(value):
+    # ISO timestamp; naive ones are read as UTC, like func.now() on SQLite
+    since = parse_datetime(value)
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    since = since.astimezone(timezone.utc)
+    if db.engine.dialect.name == 'sqlite':
+        since = since.replace(tzinfo=None)
+    return since
+
+
+def batches(table, since=None, batch_size=BATCH_SIZE):
+    # yields lists of row tuples in columns(table) order
+    model, genre_link = TABLES[table]
+    query = db.session.query(*model.__table__.columns)
+    if since is not None:
+        query = query.filter(model.updated_at >= since).order_by(model.updated_at, model.id)
+    else:
+        query = query.order_by(model.id)
+    rows = iter(query.yield_per(batch_size))
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        if genre_link is not None:
+            # one IN query per batch
+            link, owner_column = genre_link
+            by_owner = {}
+            for owner_id, genre_id in db.session.query(owner_column, link.genre_id) \
+                    .filter(owner_column.in_([row.id for row in batch])):
+                by_owner.setdefault(owner_id, []).append(genre_id)
+            batch = [tuple(row) + (genre_names(sorted(by_owner.get(row.id, ()))),) for row in batch]
+        yield batch
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError('Not JSON serializable: {0!r}'.format(value))
+
+
+def _csv_value(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, list):
+        return ';'.join(value)
+    return value
+
+
+def encode_csv(table, names, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    yield buffer.getvalue()
+    for batch in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(value) for value in row] for row in batch)
+        yield buffer.getvalue()
+
+
+def encode_ndjson(table, names, rows):
+    for batch in rows:
+        yield ''.join(json.dumps(dict(zip(names, row)), separators=(',', ':'), default=_default) + '\n'
+                      for row in batch)
+
+
+def encode_columnar(table, names, rows):
+    yield json.dumps({"table": table, "columns": names}, separators=(',', ':')) + '\n'
+    for batch in rows:
+        data = [list(column) for column in zip(*batch)]
+        yield json.dumps({"rows": len(batch), "data": data}, separators=(',', ':'), default=_default) + '\n'
+
+
+# format -> (mimetype, file extension, encoder)
+FORMATS = {
+    'csv': ('text/csv', 'csv', encode_csv),
+    'ndjson': ('application/x-ndjson', 'ndjson', encode_ndjson),
+    'columnar': ('application/x-ndjson', 'columns.ndjson', encode_columnar),
+}
+
+
+def export(table, format='csv', since=None, batch_size=BATCH_SIZE):
+    # generator of text chunks, one per batch; needs an app context
+    if table not in TABLES:
+        raise ValueError('Unknown table: {0}'.format(table))
+    if format not in FORMATS:
+        raise ValueError('Unknown format: {0}'.format(format))
+    if isinstance(since, str):
+        since = parse_since(since)
+    encoder = FORMATS[format][2]
+    return encoder(table, columns(table), batches(table, since, batch_size))
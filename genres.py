@@ -0,0 +1,54 @@
+#----------------------------------------------------------------------------#
+# Genres.
+#----------------------------------------------------------------------------#
+
+# The fixed list of genres offered by VenueForm and ArtistForm. A genre's id
+# in the Genre lookup table is its 1-based position here, so new genres must
+# be appended (with a migration inserting the matching Genre row).
+
+GENRES = (
+    'Alternative',
+    'Blues',
+    'Classical',
+    'Country',
+    'Electronic',
+    'Folk',
+    'Funk',
+    'Hip-Hop',
+    'Heavy Metal',
+    'Instrumental',
+    'Jazz',
+    'Musical Theatre',
+    'Pop',
+    'Punk',
+    'R&B',
+    'Reggae',
+    'Rock n Roll',
+    'Soul',
+    'Other',
+)
+
+GENRE_IDS = {name: genre_id for genre_id, name in enumerate(GENRES, start=1)}
+
+
+def parse_genres(value):
+    # accepts a list of names or the legacy '{Jazz,"Rock n Roll"}' literal
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = [part.strip().strip('"') for part in value.strip('{}').split(',')]
+    return [name for name in value if name]
+
+
+def genre_ids(value):
+    ids = []
+    for name in parse_genres(value):
+        if name not in GENRE_IDS:
+            raise ValueError('Unknown genre: {0}'.format(name))
+        if GENRE_IDS[name] not in ids:
+            ids.append(GENRE_IDS[name])
+    return ids
+
+
+def genre_names(ids):
+    return [GENRES[genre_id - 1] for genre_id in sorted(ids)]
@@ -0,0 +1,260 @@
+import json
+import random
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from database import db
+from models.models import Job
+
+#----------------------------------------------------------------------------#
+# Background jobs.
+#----------------------------------------------------------------------------#
+
+# Work a request should not wait for (fetching remote images, warming
+# caches, ...) is enqueued as a row in the Job table, in the request's own
+# transaction: the job exists exactly when the write that needs it committed,
+# and survives restarts. Each web process runs JOB_WORKERS threads that claim
+# due jobs, call the handler registered for their name with the JSON payload
+# as keyword arguments, and mark them done. A handler that raises is retried
+# after JOB_RETRY_SECONDS, doubling up to JOB_RETRY_MAX_SECONDS, until it has
+# had JOB_MAX_ATTEMPTS attempts; then the job is left failed for
+# `flask jobs list --state failed` and `flask jobs retry`.
+#
+# Claiming a job leases it for JOB_LEASE_SECONDS (run_at moves to the end of
+# the lease). A job whose process died mid-run is claimed again once its
+# lease runs out, so a handler may run more than once and has to be
+# idempotent. Jobs enqueued with the same key are only enqueued once, until
+# `flask jobs purge` removes the finished job.
+#
+# `flask jobs work` runs the same workers in their own process (set
+# JOB_WORKERS = 0 to keep them out of the web processes); `flask jobs drain`
+# runs until no job is due.
+
+# name -> (handler, max attempts or None for JOB_MAX_ATTEMPTS)
+HANDLERS = {}
+
+PENDING = ('queued', 'running')
+
+
+def job(name, max_attempts=None):
+    # registers a handler:
+    #
+    #   @job('thumbnails.prefetch')
+    #   def prefetch_thumbnail(image_link): ...
+    def register(handler):
+        HANDLERS[name] = (handler, max_attempts)
+        return handler
+    return register
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def enqueue(name, payload=None, key=None, delay=0):
+    # adds a job to the session's transaction; it runs once that commits.
+    # With a key, does nothing if a job with that key exists.
+    max_attempts = (HANDLERS[name][1] if name in HANDLERS else None) or current_app.config['JOB_MAX_ATTEMPTS']
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    insert = dialect.insert(Job.__table__).values(
+        name=name, payload=json.dumps(payload or {}), key=key, state='queued', attempts=0,
+        max_attempts=max_attempts, run_at=_now() + timedelta(seconds=delay))
+    if key is not None:
+        insert = insert.on_conflict_do_nothing(index_elements=['key'])
+    db.session.execute(insert)
+    db.session.info['jobs_enqueued'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_runner(session):
+    if session.info.pop('jobs_enqueued', False):
+        job_runner.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_enqueued(session):
+    session.info.pop('jobs_enqueued', None)
+
+
+def retry_delay(attempts):
+    # seconds before attempt `attempts` + 1, with jitter so jobs that failed
+    # together do not all retry together
+    config = current_app.config
+    delay = min(config['JOB_RETRY_SECONDS'] * 2 ** (attempts - 1), config['JOB_RETRY_MAX_SECONDS'])
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim(limit):
+    # leases up to `limit` due jobs; returns [(id, name, payload, attempts,
+    # max_attempts)] with attempts counting this one
+    now = _now()
+    lease_end = now + timedelta(seconds=current_app.config['JOB_LEASE_SECONDS'])
+    columns = (Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts)
+    due = (Job.state.in_(PENDING), Job.run_at <= now)
+    table = Job.__table__
+    if db.engine.dialect.name == 'postgresql':
+        # one statement; SKIP LOCKED passes over jobs another process is claiming
+        ids = select(Job.id).where(*due).order_by(Job.run_at, Job.id).limit(limit).with_for_update(skip_locked=True)
+        claimed = db.session.execute(
+            table.update().where(Job.id.in_(ids.scalar_subquery()))
+            .values(state='running', attempts=Job.attempts + 1, run_at=lease_end)
+            .returning(*columns)).all()
+    else:
+        # a job is ours if it was still due when we updated it
+        claimed = []
+        for job_id, name, payload, attempts, max_attempts in db.session.execute(
+                select(*columns).where(*due).order_by(Job.run_at, Job.id).limit(limit)).all():
+            result = db.session.execute(table.update().where(Job.id == job_id, *due)
+                                        .values(state='running', attempts=Job.attempts + 1, run_at=lease_end))
+            if result.rowcount == 1:
+                claimed.append((job_id, name, payload, attempts + 1, max_attempts))
+    db.session.commit()
+    return [tuple(row) for row in claimed]
+
+
+def run(claimed):
+    # runs one claimed job and records the outcome. Updates only apply while
+    # attempts still matches, so a run whose lease was taken over by another
+    # worker cannot overwrite that worker's outcome.
+    job_id, name, payload, attempts, max_attempts = claimed
+    table = Job.__table__
+    owned = (Job.id == job_id) & (Job.attempts == attempts)
+    try:
+        handler = HANDLERS[name][0]
+        handler(**json.loads(payload))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc(limit=5)
+        current_app.logger.warning('Job %d %s failed (attempt %d of %d): %s',
+                                   job_id, name, attempts, max_attempts, error.splitlines()[-1])
+        if attempts >= max_attempts:
+            values = {"state": 'failed', "last_error": error}
+        else:
+            values = {"state": 'queued', "last_error": error,
+                      "run_at": _now() + timedelta(seconds=retry_delay(attempts))}
+        db.session.execute(table.update().where(owned).values(values))
+        db.session.commit()
+        return False
+    db.session.execute(table.update().where(owned).values(state='done', last_error=None))
+    db.session.commit()
+    return True
+
+
+def requeue(job_ids):
+    # makes failed jobs due again, with fresh attempts; returns how many
+    count = db.session.query(Job).filter(Job.id.in_(job_ids), Job.state == 'failed').update(
+        {"state": 'queued', "attempts": 0, "run_at": _now()}, synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def purge(days=None, states=('done',)):
+    # deletes jobs in `states` last updated more than `days` (default
+    # JOB_RETENTION_DAYS) ago, freeing their keys; returns how many
+    days = current_app.config['JOB_RETENTION_DAYS'] if days is None else days
+    count = db.session.query(Job).filter(Job.state.in_(states), Job.updated_at < _now() - timedelta(days=days)) \
+        .delete(synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+class JobRunner:
+    # claims due jobs for a bounded pool of worker threads
+
+    def __init__(self):
+        self.workers = 0
+        self.poll_seconds = 2.0
+        self._app = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._thread = None
+        self._stopping = False
+
+    def configure(self, app, workers=None):
+        self._app = app
+        self.workers = app.config['JOB_WORKERS'] if workers is None else workers
+        self.poll_seconds = app.config['JOB_POLL_SECONDS']
+        self._stopping = False
+
+    def start(self, app):
+        # runs work() in a background thread, once per process
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.configure(app)
+            if self.workers <= 0:
+                return
+            self._thread = threading.Thread(target=self.work, name='job-runner', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+    def work(self, until_idle=False):
+        # claims and runs jobs until stop(), or until none is due or running
+        # when until_idle; returns (succeeded, failed)
+        outcomes = {True: 0, False: 0}
+        with ThreadPoolExecutor(self.workers, thread_name_prefix='job') as pool:
+            while not self._stopping:
+                self._wake.clear()
+                with self._lock:
+                    free = self.workers - self._busy
+                claimed = []
+                if free > 0:
+                    try:
+                        with self._app.app_context():
+                            try:
+                                claimed = claim(free)
+                            finally:
+                                db.session.remove()
+                    except Exception:
+                        self._app.logger.exception('Claiming jobs failed')
+                for one in claimed:
+                    with self._lock:
+                        self._busy += 1
+                    pool.submit(self._run, one, outcomes)
+                if until_idle and not claimed:
+                    with self._lock:
+                        if self._busy == 0:
+                            break
+                # until a worker finishes, a job is enqueued or the next poll
+                self._wake.wait(self.poll_seconds)
+        return outcomes[True], outcomes[False]
+
+    def _run(self, claimed, outcomes):
+        try:
+            with self._app.app_context():
+                try:
+                    succeeded = run(claimed)
+                    with self._lock:
+                        outcomes[succeeded] += 1
+                finally:
+                    db.session.remove()
+        except Exception:
+            self._app.logger.exception('Job %d crashed', claimed[0])
+        finally:
+            with self._lock:
+                self._busy -= 1
+            self._wake.set()
+
+
+job_runner = JobRunner()
+
+
+def init_app(app):
+    # the runner starts with the first request, so forked servers start one
+    # per worker process and `flask <command>`s start none
+    app.before_first_request(lambda: job_runner.start(app))
@@ -0,0 +1,77 @@
+import string
+import threading
+import time
+
+from sqlalchemy import func
+
+from database import db
+from models.models import Artist
+
+#----------------------------------------------------------------------------#
+# Letter index.
+#----------------------------------------------------------------------------#
+
+# Number of artists per first letter, for the A-Z jump bar on /artists. It is
+# built with one grouped query and then adjusted by the artist create and edit
+# handlers. Like the area index, each worker keeps its own copy and rebuilds
+# it after `ttl` seconds to pick up writes made elsewhere.
+
+LETTERS = tuple(string.ascii_uppercase) + ('#',)
+
+
+def letter_of(name):
+    # 'A'-'Z', or '#' for names starting with anything else
+    first = (name or '')[:1].upper()
+    return first if 'A' <= first <= 'Z' else '#'
+
+
+class LetterIndex:
+
+    def __init__(self, column, ttl=300):
+        self.column = column
+        self.ttl = ttl
+        self._counts = None
+        self._built_at = 0
+        self._lock = threading.Lock()
+
+    def rebuild(self):
+        first = func.upper(func.substr(self.column, 1, 1))
+        counts = dict.fromkeys(LETTERS, 0)
+        for letter, count in db.session.query(first, func.count()).filter(self.column.isnot(None)).group_by(first):
+            counts[letter_of(letter)] += count
+        with self._lock:
+            self._counts = counts
+            self._built_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._counts = None
+
+    def counts(self):
+        # {letter: number of names}, in LETTERS order
+        if self._counts is None or time.monotonic() - self._built_at > self.ttl:
+            self.rebuild()
+        return self._counts
+
+    def add(self, name):
+        self._adjust(name, 1)
+
+    def remove(self, name):
+        self._adjust(name, -1)
+
+    def rename(self, old_name, new_name):
+        if letter_of(old_name) != letter_of(new_name):
+            self.remove(old_name)
+            self.add(new_name)
+
+    def _adjust(self, name, delta):
+        if name is None:
+            return
+        with self._lock:
+            if self._counts is not None:
+                counts = dict(self._counts)
+                counts[letter_of(name)] = max(0, counts[letter_of(name)] + delta)
+                self._counts = counts
+
+
+artist_letters = LetterIndex(Artist.name)
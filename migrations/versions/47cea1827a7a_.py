@@ -0,0 +1,113 @@
+"""move genres into a lookup table with venue and artist junction tables
+
+Revision ID: 47cea1827a7a
+Revises: ac39a1b84001
+Create Date: 2026-10-16 10:12:41.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '47cea1827a7a'
+down_revision = 'ac39a1b84001'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of genres.GENRES at the time of this migration; a genre's id is
+# its 1-based position in the list.
+GENRES = (
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+    'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop',
+    'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other',
+)
+GENRE_IDS = {name: genre_id for genre_id, name in enumerate(GENRES, start=1)}
+BATCH_SIZE = 1000
+
+
+def parse_genres(value):
+    # legacy '{Jazz,"Rock n Roll"}' literal -> known genre ids
+    names = [part.strip().strip('"') for part in (value or '').strip('{}').split(',')]
+    return sorted({GENRE_IDS[name] for name in names if name in GENRE_IDS})
+
+
+def backfill(owner, junction, owner_column):
+    # walks the owner table in primary key order, BATCH_SIZE rows at a time
+    connection = op.get_bind()
+    owner_table = sa.table(owner, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+    junction_table = sa.table(junction, sa.column('genre_id', sa.Integer), sa.column(owner_column, sa.Integer))
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select([owner_table.c.id, owner_table.c.genres])
+            .where(owner_table.c.id > last_id)
+            .order_by(owner_table.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        links = [{"genre_id": genre_id, owner_column: row.id} for row in rows for genre_id in parse_genres(row.genres)]
+        if links:
+            connection.execute(junction_table.insert(), links)
+        last_id = rows[-1].id
+
+
+def restore(owner, junction, owner_column):
+    connection = op.get_bind()
+    owner_table = sa.table(owner, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+    junction_table = sa.table(junction, sa.column('genre_id', sa.Integer), sa.column(owner_column, sa.Integer))
+    genres = {}
+    for owner_id, genre_id in connection.execute(
+            sa.select([junction_table.c[owner_column], junction_table.c.genre_id])
+            .order_by(junction_table.c[owner_column], junction_table.c.genre_id)):
+        genres.setdefault(owner_id, []).append(GENRES[genre_id - 1])
+    for owner_id, names in genres.items():
+        literal = '{' + ','.join('"{0}"'.format(name) if ' ' in name else name for name in names) + '}'
+        connection.execute(owner_table.update().where(owner_table.c.id == owner_id).values(genres=literal))
+
+
+def upgrade():
+    genre_table = op.create_table('Genre',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.bulk_insert(genre_table, [{"id": genre_id, "name": name} for genre_id, name in enumerate(GENRES, start=1)])
+    op.create_table('Venue_Genre',
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('genre_id', 'venue_id')
+    )
+    op.create_index(op.f('ix_Venue_Genre_venue_id'), 'Venue_Genre', ['venue_id'], unique=False)
+    op.create_table('Artist_Genre',
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+    sa.PrimaryKeyConstraint('genre_id', 'artist_id')
+    )
+    op.create_index(op.f('ix_Artist_Genre_artist_id'), 'Artist_Genre', ['artist_id'], unique=False)
+
+    backfill('Venue', 'Venue_Genre', 'venue_id')
+    backfill('Artist', 'Artist_Genre', 'artist_id')
+
+    op.drop_column('Venue', 'genres')
+    op.drop_column('Artist', 'genres')
+
+
+def downgrade():
+    op.add_column('Artist', sa.Column('genres', sa.String(length=120), nullable=True))
+    op.add_column('Venue', sa.Column('genres', sa.String(length=120), nullable=True))
+
+    restore('Venue', 'Venue_Genre', 'venue_id')
+    restore('Artist', 'Artist_Genre', 'artist_id')
+
+    op.drop_index(op.f('ix_Artist_Genre_artist_id'), table_name='Artist_Genre')
+    op.drop_table('Artist_Genre')
+    op.drop_index(op.f('ix_Venue_Genre_venue_id'), table_name='Venue_Genre')
+    op.drop_table('Venue_Genre')
+    op.drop_table('Genre')
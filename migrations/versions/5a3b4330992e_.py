@@ -0,0 +1,95 @@
+"""add show (owner, start_time) indexes and denormalized show counters
+
+Revision ID: 5a3b4330992e
+Revises: 47cea1827a7a
+Create Date: 2026-10-16 11:02:17.604931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a3b4330992e'
+down_revision = '47cea1827a7a'
+branch_labels = None
+depends_on = None
+
+
+OWNERS = (('Venue', 'venue_id'), ('Artist', 'artist_id'))
+
+SHOW_INDEXES = (
+    ('ix_Show_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_Show_artist_id_start_time', ['artist_id', 'start_time']),
+)
+
+# owner rows per backfill UPDATE (and, on PostgreSQL, per transaction)
+BACKFILL_BATCH = 5000
+
+
+def is_postgresql():
+    return op.get_context().dialect.name == 'postgresql'
+
+
+def create_indexes():
+    indexes = [(name, 'Show', columns) for name, columns in SHOW_INDEXES] + \
+        [(op.f('ix_{0}_next_show_at'.format(owner)), owner, ['next_show_at']) for owner, _ in OWNERS]
+    for name, table, columns in indexes:
+        op.create_index(name, table, columns, unique=False, postgresql_concurrently=is_postgresql())
+
+
+def drop_indexes():
+    for owner, _ in reversed(OWNERS):
+        op.drop_index(op.f('ix_{0}_next_show_at'.format(owner)), table_name=owner,
+                      postgresql_concurrently=is_postgresql())
+    for name, _ in reversed(SHOW_INDEXES):
+        op.drop_index(name, table_name='Show', postgresql_concurrently=is_postgresql())
+
+
+def backfill(owner, owner_column):
+    # correlated counts served by the new Show indexes, one id range per
+    # UPDATE so no statement locks or rewrites the whole table
+    low, high = op.get_bind().execute(sa.text('SELECT min(id), max(id) FROM "{0}"'.format(owner))).first()
+    if low is None:
+        return
+    for start in range(low, high + 1, BACKFILL_BATCH):
+        op.execute(
+            'UPDATE "{0}" SET '
+            'upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{1} = "{0}".id AND "Show".start_time > CURRENT_TIMESTAMP), '
+            'past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{1} = "{0}".id AND "Show".start_time <= CURRENT_TIMESTAMP), '
+            'next_show_at = (SELECT min("Show".start_time) FROM "Show" WHERE "Show".{1} = "{0}".id AND "Show".start_time > CURRENT_TIMESTAMP) '
+            'WHERE id >= {2:d} AND id < {3:d}'
+            .format(owner, owner_column, start, start + BACKFILL_BATCH)
+        )
+
+
+def upgrade():
+    # the new columns have constant defaults, so adding them does not
+    # rewrite the tables on PostgreSQL
+    for owner, _ in OWNERS:
+        op.add_column(owner, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(owner, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(owner, sa.Column('next_show_at', sa.DateTime(timezone=True), nullable=True))
+    if is_postgresql():
+        # CREATE INDEX CONCURRENTLY keeps Show writable while the indexes
+        # build, and each backfill batch commits on its own
+        with op.get_context().autocommit_block():
+            create_indexes()
+            for owner, owner_column in OWNERS:
+                backfill(owner, owner_column)
+    else:
+        create_indexes()
+        for owner, owner_column in OWNERS:
+            backfill(owner, owner_column)
+
+
+def downgrade():
+    if is_postgresql():
+        with op.get_context().autocommit_block():
+            drop_indexes()
+    else:
+        drop_indexes()
+    for owner, _ in reversed(OWNERS):
+        op.drop_column(owner, 'next_show_at')
+        op.drop_column(owner, 'past_shows_count')
+        op.drop_column(owner, 'upcoming_shows_count')
@@ -0,0 +1,72 @@
+"""add updated_at to venues, artists and shows for incremental exports
+
+Revision ID: 8c41e0b2d5f7
+Revises: d1d3861f78f2
+Create Date: 2026-10-16 13:20:44.902117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41e0b2d5f7'
+down_revision = 'd1d3861f78f2'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+# rows per backfill UPDATE (and, on PostgreSQL, per transaction)
+BACKFILL_BATCH = 5000
+
+
+def is_postgresql():
+    return op.get_context().dialect.name == 'postgresql'
+
+
+def backfill(table):
+    # one id range per UPDATE, so no statement locks the whole table
+    low, high = op.get_bind().execute(sa.text('SELECT min(id), max(id) FROM "{0}"'.format(table))).first()
+    if low is None:
+        return
+    for start in range(low, high + 1, BACKFILL_BATCH):
+        op.execute('UPDATE "{0}" SET updated_at = CURRENT_TIMESTAMP WHERE id >= {1:d} AND id < {2:d}'
+                   .format(table, start, start + BACKFILL_BATCH))
+
+
+def backfill_and_index():
+    for table in TABLES:
+        backfill(table)
+        op.create_index(op.f('ix_{0}_updated_at'.format(table)), table, ['updated_at'], unique=False,
+                        postgresql_concurrently=is_postgresql())
+
+
+def upgrade():
+    # existing rows count as modified now, so the first `since=` export after
+    # this migration is a full one
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+    if is_postgresql():
+        # each backfill batch commits on its own, and CREATE INDEX
+        # CONCURRENTLY keeps the tables writable while the indexes build
+        with op.get_context().autocommit_block():
+            backfill_and_index()
+    else:
+        backfill_and_index()
+
+
+def drop_indexes():
+    for table in reversed(TABLES):
+        op.drop_index(op.f('ix_{0}_updated_at'.format(table)), table_name=table,
+                      postgresql_concurrently=is_postgresql())
+
+
+def downgrade():
+    if is_postgresql():
+        with op.get_context().autocommit_block():
+            drop_indexes()
+    else:
+        drop_indexes()
+    for table in reversed(TABLES):
+        op.drop_column(table, 'updated_at')
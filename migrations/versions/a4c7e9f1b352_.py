@@ -0,0 +1,66 @@
+"""add the Stats_* rollup tables and Show.counted for the /stats dashboard
+
+Revision ID: a4c7e9f1b352
+Revises: f9b3d2e7a146
+Create Date: 2026-10-16 20:05:41.318274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c7e9f1b352'
+down_revision = 'f9b3d2e7a146'
+branch_labels = None
+depends_on = None
+
+
+def is_postgresql():
+    return op.get_context().dialect.name == 'postgresql'
+
+
+def upgrade():
+    # existing shows start uncounted: run `flask rebuild-stats` after
+    # upgrading to fill the new tables. A constant default adds the column
+    # without rewriting Show on PostgreSQL.
+    op.add_column('Show', sa.Column('counted', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.create_table('Stats_Genre_Month',
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('show_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('genre_id', 'month')
+    )
+    op.create_index('ix_Stats_Genre_Month_month', 'Stats_Genre_Month', ['month'], unique=False)
+    op.create_table('Stats_Venue_Bookings',
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('show_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('venue_id')
+    )
+    op.create_index('ix_Stats_Venue_Bookings_show_count_venue_id', 'Stats_Venue_Bookings',
+                    ['show_count', 'venue_id'], unique=False)
+    op.create_table('Stats_Total',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    if is_postgresql():
+        with op.get_context().autocommit_block():
+            op.create_index('ix_Show_pending_stats', 'Show', ['id'], unique=False,
+                            postgresql_where=sa.text('NOT counted'), postgresql_concurrently=True)
+    else:
+        op.create_index('ix_Show_pending_stats', 'Show', ['id'], unique=False, sqlite_where=sa.text('NOT counted'))
+
+
+def downgrade():
+    if is_postgresql():
+        with op.get_context().autocommit_block():
+            op.drop_index('ix_Show_pending_stats', table_name='Show', postgresql_concurrently=True)
+    else:
+        op.drop_index('ix_Show_pending_stats', table_name='Show')
+    op.drop_index('ix_Stats_Venue_Bookings_show_count_venue_id', table_name='Stats_Venue_Bookings')
+    op.drop_table('Stats_Total')
+    op.drop_table('Stats_Venue_Bookings')
+    op.drop_index('ix_Stats_Genre_Month_month', table_name='Stats_Genre_Month')
+    op.drop_table('Stats_Genre_Month')
+    op.drop_column('Show', 'counted')
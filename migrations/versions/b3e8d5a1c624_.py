@@ -0,0 +1,50 @@
+"""make SQLite never reuse Show ids
+
+Revision ID: b3e8d5a1c624
+Revises: d6f1a8c3e927
+Create Date: 2026-10-16 23:40:12.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e8d5a1c624'
+down_revision = 'd6f1a8c3e927'
+branch_labels = None
+depends_on = None
+
+NOT_COUNTED = sa.text('NOT counted')
+
+
+def is_sqlite():
+    return op.get_context().dialect.name == 'sqlite'
+
+
+def rebuild_show(autoincrement):
+    # SQLite can only switch AUTOINCREMENT by copying the table. The partial
+    # index is dropped first and recreated after, since the copy would lose
+    # its WHERE clause.
+    op.drop_index('ix_Show_pending_stats', table_name='Show')
+    with op.batch_alter_table('Show', recreate='always', table_kwargs={"sqlite_autoincrement": autoincrement}):
+        pass
+    op.create_index('ix_Show_pending_stats', 'Show', ['id'], unique=False, sqlite_where=NOT_COUNTED)
+
+
+def upgrade():
+    # PostgreSQL sequences never hand an id out twice already
+    if not is_sqlite():
+        return
+    rebuild_show(True)
+    # start after every id in use, archived ones included
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'Show'")
+    op.execute("INSERT INTO sqlite_sequence (name, seq) SELECT 'Show', max(id) FROM "
+               '(SELECT max(id) AS id FROM "Show" UNION ALL SELECT max(id) FROM "Show_archive") '
+               'WHERE id IS NOT NULL HAVING count(*) > 0')
+
+
+def downgrade():
+    if not is_sqlite():
+        return
+    rebuild_show(False)
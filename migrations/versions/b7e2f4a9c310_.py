@@ -0,0 +1,85 @@
+"""add Show.end_time and refuse overlapping bookings
+
+Revision ID: b7e2f4a9c310
+Revises: 8c41e0b2d5f7
+Create Date: 2026-10-16 15:02:37.511804
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2f4a9c310'
+down_revision = '8c41e0b2d5f7'
+branch_labels = None
+depends_on = None
+
+# existing shows get config.SHOW_DEFAULT_MINUTES
+DEFAULT_MINUTES = 120
+
+# shows per backfill UPDATE (and, on PostgreSQL, per transaction)
+BACKFILL_BATCH = 5000
+
+# a venue or an artist that is booked twice at once, with the first offending pair
+OVERLAPS = '''
+SELECT a.{0}, a.id, b.id FROM "Show" a JOIN "Show" b
+    ON a.{0} = b.{0} AND a.id < b.id
+    AND tstzrange(a.start_time, a.end_time) && tstzrange(b.start_time, b.end_time)
+LIMIT 1
+'''
+
+CONSTRAINTS = (('Show_venue_no_overlap', 'venue_id'), ('Show_artist_no_overlap', 'artist_id'))
+
+
+def is_postgresql():
+    return op.get_context().dialect.name == 'postgresql'
+
+
+def backfill(end_time):
+    # one id range per UPDATE, so no statement locks the whole of Show
+    low, high = op.get_bind().execute(sa.text('SELECT min(id), max(id) FROM "Show"')).first()
+    if low is None:
+        return
+    for start in range(low, high + 1, BACKFILL_BATCH):
+        op.execute('UPDATE "Show" SET end_time = {0} WHERE id >= {1:d} AND id < {2:d}'
+                   .format(end_time, start, start + BACKFILL_BATCH))
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(timezone=True), nullable=True))
+    if is_postgresql():
+        # each backfill batch commits on its own, and CREATE INDEX
+        # CONCURRENTLY keeps Venue writable
+        with op.get_context().autocommit_block():
+            backfill("start_time + interval '{0} minutes'".format(DEFAULT_MINUTES))
+            op.create_index('ix_Venue_city_id', 'Venue', ['city', 'id'], unique=False, postgresql_concurrently=True)
+    else:
+        # in the text format SQLAlchemy writes, so comparisons stay textual
+        backfill("strftime('%Y-%m-%d %H:%M:%S.000000', start_time, '+{0} minutes')".format(DEFAULT_MINUTES))
+        op.create_index('ix_Venue_city_id', 'Venue', ['city', 'id'], unique=False)
+
+    if is_postgresql():
+        # the constraints cannot be added over existing double bookings; name
+        # one so it can be moved or deleted before running the upgrade again
+        connection = op.get_bind()
+        for _, column in CONSTRAINTS:
+            overlap = connection.exec_driver_sql(OVERLAPS.format(column)).first()
+            if overlap is not None:
+                raise RuntimeError('Shows {1} and {2} overlap at {0} {3}; resolve them before upgrading'.format(
+                    column, overlap[1], overlap[2], overlap[0]))
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for name, column in CONSTRAINTS:
+            op.execute('ALTER TABLE "Show" ADD CONSTRAINT "{0}" '
+                       'EXCLUDE USING gist ({1} WITH =, tstzrange(start_time, end_time) WITH &&)'.format(name, column))
+
+
+def downgrade():
+    if is_postgresql():
+        for name, _ in reversed(CONSTRAINTS):
+            op.execute('ALTER TABLE "Show" DROP CONSTRAINT "{0}"'.format(name))
+        with op.get_context().autocommit_block():
+            op.drop_index('ix_Venue_city_id', table_name='Venue', postgresql_concurrently=True)
+    else:
+        op.drop_index('ix_Venue_city_id', table_name='Venue')
+    op.drop_column('Show', 'end_time')
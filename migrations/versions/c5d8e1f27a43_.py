@@ -0,0 +1,47 @@
+"""add name prefix indexes for the new-show form pickers
+
+Revision ID: c5d8e1f27a43
+Revises: b7e2f4a9c310
+Create Date: 2026-10-16 16:10:52.640281
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d8e1f27a43'
+down_revision = 'b7e2f4a9c310'
+branch_labels = None
+depends_on = None
+
+# models.name_key(name), compiled for each database
+INDEXES = (
+    ('ix_Venue_name_key_id', 'Venue'),
+    ('ix_Artist_name_key_id', 'Artist'),
+)
+
+
+def is_postgresql():
+    return op.get_context().dialect.name == 'postgresql'
+
+
+def upgrade():
+    if is_postgresql():
+        with op.get_context().autocommit_block():
+            for name, table in INDEXES:
+                op.create_index(name, table, [sa.text('(lower(name) COLLATE "C")'), 'id'], unique=False,
+                                postgresql_concurrently=True)
+    else:
+        for name, table in INDEXES:
+            op.create_index(name, table, [sa.text('lower(name)'), 'id'], unique=False)
+
+
+def downgrade():
+    if is_postgresql():
+        with op.get_context().autocommit_block():
+            for name, table in reversed(INDEXES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    else:
+        for name, table in reversed(INDEXES):
+            op.drop_index(name, table_name=table)
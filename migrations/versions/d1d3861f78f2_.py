@@ -0,0 +1,53 @@
+"""add indexes for show listing, venue areas and name ordering
+
+Revision ID: d1d3861f78f2
+Revises: 5a3b4330992e
+Create Date: 2026-10-16 11:47:05.218563
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1d3861f78f2'
+down_revision = '5a3b4330992e'
+branch_labels = None
+depends_on = None
+
+# Show.venue_id and Show.artist_id are already the leading columns of the
+# (venue_id, start_time) / (artist_id, start_time) indexes from 5a3b4330992e.
+INDEXES = (
+    ('ix_Show_start_time_id', 'Show', ['start_time', 'id']),
+    ('ix_Venue_state_city_name', 'Venue', ['state', 'city', 'name']),
+    ('ix_Venue_name', 'Venue', ['name']),
+    ('ix_Artist_name_id', 'Artist', ['name', 'id']),
+)
+
+
+def is_postgresql():
+    return op.get_context().dialect.name == 'postgresql'
+
+
+def upgrade():
+    if is_postgresql():
+        # CREATE INDEX CONCURRENTLY only takes a SHARE UPDATE EXCLUSIVE lock,
+        # so reads and writes carry on while the index builds. It cannot run
+        # inside a transaction. If a build fails it leaves an INVALID index
+        # behind: drop it and run the upgrade again.
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    if is_postgresql():
+        with op.get_context().autocommit_block():
+            for name, table, _ in reversed(INDEXES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    else:
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table)
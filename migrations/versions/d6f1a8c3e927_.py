@@ -0,0 +1,46 @@
+"""add the Job table for background jobs
+
+Revision ID: d6f1a8c3e927
+Revises: a4c7e9f1b352
+Create Date: 2026-10-16 21:12:30.508417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6f1a8c3e927'
+down_revision = 'a4c7e9f1b352'
+branch_labels = None
+depends_on = None
+
+PENDING = sa.text("state IN ('queued', 'running')")
+
+
+def upgrade():
+    op.create_table('Job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('key', sa.String(length=200), nullable=True),
+        sa.Column('state', sa.String(length=10), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_Job_pending', 'Job', ['run_at', 'id'], unique=False,
+                    postgresql_where=PENDING, sqlite_where=PENDING)
+    op.create_index('ix_Job_state_updated_at', 'Job', ['state', 'updated_at'], unique=False)
+    op.create_index('ix_Job_key', 'Job', ['key'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_Job_key', table_name='Job')
+    op.drop_index('ix_Job_state_updated_at', table_name='Job')
+    op.drop_index('ix_Job_pending', table_name='Job')
+    op.drop_table('Job')
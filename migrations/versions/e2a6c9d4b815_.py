@@ -0,0 +1,30 @@
+"""add version to venues and artists for optimistic edits
+
+Revision ID: e2a6c9d4b815
+Revises: c5d8e1f27a43
+Create Date: 2026-10-16 17:04:18.305526
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a6c9d4b815'
+down_revision = 'c5d8e1f27a43'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist')
+
+
+def upgrade():
+    # a constant server default fills existing rows without rewriting the
+    # table on PostgreSQL 11+
+    for table in TABLES:
+        op.add_column(table, sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_column(table, 'version')
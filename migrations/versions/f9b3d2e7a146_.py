@@ -0,0 +1,52 @@
+"""add Show_archive for shows moved out of Show by `flask archive-shows`
+
+Revision ID: f9b3d2e7a146
+Revises: e2a6c9d4b815
+Create Date: 2026-10-16 18:22:09.174630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f9b3d2e7a146'
+down_revision = 'e2a6c9d4b815'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_Show_archive_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_Show_archive_artist_id_start_time', ['artist_id', 'start_time']),
+    ('ix_Show_archive_start_time_id', ['start_time', 'id']),
+    ('ix_Show_archive_updated_at', ['updated_at']),
+)
+
+
+def upgrade():
+    # range partitioned on PostgreSQL; archive.archive_shows() adds a
+    # partition per year as it moves shows in. The table starts empty, so
+    # the indexes are built directly.
+    op.create_table('Show_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('artist_id', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('end_time', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ),
+        sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ),
+        sa.PrimaryKeyConstraint('id', 'start_time'),
+        postgresql_partition_by='RANGE (start_time)'
+    )
+    for name, columns in INDEXES:
+        op.create_index(name, 'Show_archive', columns, unique=False)
+
+
+def downgrade():
+    # archived shows go back to Show first
+    op.execute('INSERT INTO "Show" (id, venue_id, artist_id, start_time, end_time, updated_at) '
+               'SELECT id, venue_id, artist_id, start_time, end_time, updated_at FROM "Show_archive"')
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name='Show_archive')
+    op.drop_table('Show_archive')
@@ -1,11 +1,56 @@
+from sqlalchemy import DDL, event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 from database import db
+from genres import GENRES, genre_ids, genre_names
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
+class name_key(FunctionElement):
+    # lower(name) in byte order, so names starting with a prefix are one range
+    # of an index on it: SQLite compares bytes already, PostgreSQL needs the
+    # "C" collation (a locale collation does not keep prefixes together)
+    type = db.String()
+    name = 'name_key'
+    inherit_cache = True
+
+
+@compiles(name_key)
+def _compile_name_key(element, compiler, **kw):
+    return 'lower(%s)' % compiler.process(element.clauses, **kw)
+
+
+@compiles(name_key, 'postgresql')
+def _compile_name_key_postgresql(element, compiler, **kw):
+    return '(lower(%s) COLLATE "C")' % compiler.process(element.clauses, **kw)
+
+
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    # ids are fixed: the position of the name in genres.GENRES
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f'<Genre {self.id} {self.name}>'
+
+
+@event.listens_for(Genre.__table__, 'after_create')
+def seed_genres(target, connection, **kw):
+    # fills the lookup table when it is built by db.create_all()
+    connection.execute(target.insert(), [{"id": genre_id, "name": name} for genre_id, name in enumerate(GENRES, start=1)])
+
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_Venue_state_city_name', 'state', 'city', 'name'),
+        db.Index('ix_Venue_name', 'name'),
+        db.Index('ix_Venue_city_id', 'city', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -13,13 +58,38 @@ class Venue(db.Model):
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String(500))
+    # denormalized show counters, maintained by show_counts
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime(timezone=True), index=True)
+    # set on insert and on every change, for incremental exports
+    updated_at = db.Column(db.DateTime(timezone=True), default=db.func.now(), onupdate=db.func.now(), index=True)
+    # bumped by every edit, see edits.py
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
    # shows = db.relationship('Show', backref='Venue', lazy=True)
+    genre_links = db.relationship('VenueGenre', cascade='all, delete-orphan')
+
+    @property
+    def genres(self):
+        return genre_names(link.genre_id for link in self.genre_links)
+
+    @genres.setter
+    def genres(self, value):
+        # keeps unchanged links so an edit only writes the genres that moved
+        wanted = genre_ids(value)
+        kept = [link for link in self.genre_links if link.genre_id in wanted]
+        kept_ids = [link.genre_id for link in kept]
+        added = [VenueGenre(genre_id=genre_id) for genre_id in wanted if genre_id not in kept_ids]
+        if added or len(kept) != len(self.genre_links):
+            self.genre_links = kept + added
+            # links live in another table, so touch the row for exports
+            if self.id is not None:
+                self.updated_at = db.func.now()
 
     def __repr__(self):
         return f'<Venue {self.id} {self.name}>'
@@ -28,36 +98,197 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_name_id', 'name', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String(500))
+    # denormalized show counters, maintained by show_counts
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime(timezone=True), index=True)
+    # set on insert and on every change, for incremental exports
+    updated_at = db.Column(db.DateTime(timezone=True), default=db.func.now(), onupdate=db.func.now(), index=True)
+    # bumped by every edit, see edits.py
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
    # shows = db.relationship('Show', backref='Artist', lazy=True)
+    genre_links = db.relationship('ArtistGenre', cascade='all, delete-orphan')
+
+    @property
+    def genres(self):
+        return genre_names(link.genre_id for link in self.genre_links)
+
+    @genres.setter
+    def genres(self, value):
+        # keeps unchanged links so an edit only writes the genres that moved
+        wanted = genre_ids(value)
+        kept = [link for link in self.genre_links if link.genre_id in wanted]
+        kept_ids = [link.genre_id for link in kept]
+        added = [ArtistGenre(genre_id=genre_id) for genre_id in wanted if genre_id not in kept_ids]
+        if added or len(kept) != len(self.genre_links):
+            self.genre_links = kept + added
+            # links live in another table, so touch the row for exports
+            if self.id is not None:
+                self.updated_at = db.func.now()
 
     def __repr__(self):
         return f'<Artist {self.id} {self.name}>'
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
+# prefix lookups for the new-show form pickers
+db.Index('ix_Venue_name_key_id', name_key(Venue.name), Venue.id)
+db.Index('ix_Artist_name_key_id', name_key(Artist.name), Artist.id)
+
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
     
     
 class Show(db.Model):
 
     __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+        # the few shows stats.catch_up() has still to count
+        db.Index('ix_Show_pending_stats', 'id', postgresql_where=db.text('NOT counted'),
+                 sqlite_where=db.text('NOT counted')),
+        # archived shows keep their ids, so SQLite must never hand one out
+        # again (without AUTOINCREMENT it reuses max(id) + 1)
+        {'sqlite_autoincrement': True},
+    )
     id = db.Column(db.Integer,primary_key=True)
     venue_id = db.Column(db.Integer, db.ForeignKey(Venue.id), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey(Artist.id), nullable=False)
     start_time = db.Column(db.DateTime(timezone=True))
+    # the venue and the artist are booked from start_time until end_time
+    end_time = db.Column(db.DateTime(timezone=True))
+    # whether the show is in the stats rollups yet
+    counted = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    updated_at = db.Column(db.DateTime(timezone=True), default=db.func.now(), onupdate=db.func.now(), index=True)
+
+    def __repr__(self):
+        return f'<Show {self.id}'
+
+
+class ShowArchive(db.Model):
+    # shows that ended more than SHOW_HOT_DAYS ago, moved out of Show by
+    # archive.archive_shows() with their ids. On PostgreSQL the table is range
+    # partitioned on start_time, one partition per year, so the primary key
+    # has to include start_time.
+    __tablename__ = 'Show_archive'
+    __table_args__ = (
+        db.Index('ix_Show_archive_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_archive_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_archive_start_time_id', 'start_time', 'id'),
+        {'postgresql_partition_by': 'RANGE (start_time)'},
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey(Venue.id), nullable=False)
+    artist_id = db.Column(db.Integer, db.ForeignKey(Artist.id), nullable=False)
+    start_time = db.Column(db.DateTime(timezone=True), primary_key=True)
+    end_time = db.Column(db.DateTime(timezone=True))
+    updated_at = db.Column(db.DateTime(timezone=True), index=True)
+
+    def __repr__(self):
+        return f'<ShowArchive {self.id}>'
+
+
+# PostgreSQL refuses overlapping bookings itself; bookings.conflicts() runs
+# the same check as an indexed range query on every database
+SHOW_EXCLUSION_DDL = '''
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+ALTER TABLE "Show" ADD CONSTRAINT "Show_venue_no_overlap"
+    EXCLUDE USING gist (venue_id WITH =, tstzrange(start_time, end_time) WITH &&);
+ALTER TABLE "Show" ADD CONSTRAINT "Show_artist_no_overlap"
+    EXCLUDE USING gist (artist_id WITH =, tstzrange(start_time, end_time) WITH &&);
+'''
+
+event.listen(Show.__table__, 'after_create', DDL(SHOW_EXCLUSION_DDL).execute_if(dialect='postgresql'))
+
+
+# Junction tables. The primary keys lead with genre_id, so a genre filter is
+# a range scan of the primary key index; the owner id has its own index for
+# loading one venue's or artist's genres.
+
+class VenueGenre(db.Model):
+    __tablename__ = 'Venue_Genre'
+    genre_id = db.Column(db.Integer, db.ForeignKey(Genre.id), primary_key=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey(Venue.id, ondelete='CASCADE'), primary_key=True, index=True)
+
+
+class ArtistGenre(db.Model):
+    __tablename__ = 'Artist_Genre'
+    genre_id = db.Column(db.Integer, db.ForeignKey(Genre.id), primary_key=True)
+    artist_id = db.Column(db.Integer, db.ForeignKey(Artist.id, ondelete='CASCADE'), primary_key=True, index=True)
+
+
+# Stats rollups, maintained by stats.py for the /stats dashboard. They are
+# derived data: `flask rebuild-stats` recomputes them from scratch.
+
+class StatsGenreMonth(db.Model):
+    # shows per artist genre per calendar month of start_time
+    __tablename__ = 'Stats_Genre_Month'
+    __table_args__ = (
+        db.Index('ix_Stats_Genre_Month_month', 'month'),
+    )
+    genre_id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+    show_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class StatsVenueBookings(db.Model):
+    # all-time shows per venue, archived ones included
+    __tablename__ = 'Stats_Venue_Bookings'
+    __table_args__ = (
+        db.Index('ix_Stats_Venue_Bookings_show_count_venue_id', 'show_count', 'venue_id'),
+    )
+    venue_id = db.Column(db.Integer, primary_key=True)
+    show_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class StatsTotal(db.Model):
+    # named counters, e.g. 'artists' and 'artists_seeking_venue'
+    __tablename__ = 'Stats_Total'
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Job(db.Model):
+    # background jobs, run by jobs.py
+    __tablename__ = 'Job'
+    __table_args__ = (
+        # the queued and running jobs, by when they are next due
+        db.Index('ix_Job_pending', 'run_at', 'id', postgresql_where=db.text("state IN ('queued', 'running')"),
+                 sqlite_where=db.text("state IN ('queued', 'running')")),
+        db.Index('ix_Job_state_updated_at', 'state', 'updated_at'),
+        db.Index('ix_Job_key', 'key', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    # JSON keyword arguments for the handler
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    # idempotency key: a second job with the same key is not enqueued
+    key = db.Column(db.String(200))
+    # queued -> running -> done, or back to queued to retry, or failed
+    state = db.Column(db.String(10), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    # queued: when it may run; running: when its lease runs out
+    run_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime(timezone=True), default=db.func.now())
+    updated_at = db.Column(db.DateTime(timezone=True), default=db.func.now(), onupdate=db.func.now())
 
     def __repr__(self):
-        return f'<Show {self.id}'
\ No newline at end of file
+        return f'<Job {self.id} {self.name} {self.state}>'
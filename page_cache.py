@@ -0,0 +1,181 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import current_app, g, request, session
+
+from db_routing import is_sticky, read_from_primary
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+# In-process cache of rendered GET responses, keyed by path and query string.
+# Entries are evicted least recently used first once their bodies add up to
+# more than `max_bytes`, and expire after `ttl` seconds. Every entry carries
+# tags such as 'shows' or 'venue:3'; the write handlers call invalidate() with
+# the tags they affect. Each worker process keeps its own cache, so writes made
+# by other workers (and by `flask roll-show-counters`) show up within `ttl`.
+#
+# Responses carry an ETag and Last-Modified, and conditional GETs that match
+# get a 304 straight from the cache. Requests with pending flash messages
+# always render, since the messages are part of the page.
+#
+# With read replicas, a client that just wrote reads its pages from the
+# primary (see db_routing.py) and bypasses the cache both ways. Pages
+# rendered within DB_STICKY_SECONDS of an invalidation read from the primary
+# too, so a lagging replica cannot put the page from before the write back
+# into the cache for everyone.
+#
+# The cache itself lives in app.extensions['page_cache'], set up by
+# page_cache.init_app(), so apps built in one process (tests, benchmarks) do
+# not see each other's pages.
+
+
+class _Entry:
+
+    __slots__ = ('body', 'content_type', 'etag', 'last_modified', 'tags', 'expires')
+
+    def __init__(self, body, content_type, tags, ttl):
+        self.body = body
+        self.content_type = content_type
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        self.tags = tags
+        self.expires = time.monotonic() + ttl
+
+
+class PageStore:
+    # the cached pages of one app
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=60):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> _Entry, least recently used first
+        self._by_tag = {}               # tag -> set of keys
+        self._size = 0
+        self._generation = 0            # bumped by every invalidation
+        self._invalidated_at = None     # monotonic time of the last one
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry, generation):
+        with self._lock:
+            # a write that landed while this page was rendering may not be in it
+            if generation != self._generation or len(entry.body) > self.max_bytes:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._size += len(entry.body)
+            for tag in entry.tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while self._size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, *tags):
+        with self._lock:
+            self._generation += 1
+            self._invalidated_at = time.monotonic()
+            for tag in tags:
+                for key in list(self._by_tag.get(tag, ())):
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._invalidated_at = time.monotonic()
+            self._entries.clear()
+            self._by_tag.clear()
+            self._size = 0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def invalidated_within(self, seconds):
+        # whether invalidate() or clear() ran in the last `seconds`
+        invalidated_at = self._invalidated_at
+        return invalidated_at is not None and time.monotonic() - invalidated_at < seconds
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._size -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+
+class PageCache:
+    # the views' handle on the current app's PageStore
+
+    def init_app(self, app):
+        app.extensions['page_cache'] = PageStore(app.config['PAGE_CACHE_MAX_BYTES'], app.config['PAGE_CACHE_TTL'])
+
+    @property
+    def store(self):
+        return current_app.extensions['page_cache']
+
+    def invalidate(self, *tags):
+        self.store.invalidate(*tags)
+
+    def clear(self):
+        self.store.clear()
+
+    def tag(self, *tags):
+        # adds tags to the page being rendered, e.g. the artists it lists
+        if 'page_cache_tags' in g:
+            g.page_cache_tags.update(tags)
+
+    def cached(self, *tags):
+        # caches a view; tags are formatted with the view arguments, so
+        # 'venue:{venue_id}' tags /venues/3 as 'venue:3'
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                store = self.store
+                if not store.max_bytes or '_flashes' in session or is_sticky():
+                    return view(**kwargs)
+                key = (request.path, tuple(sorted(request.args.items(multi=True))))
+                entry = store.get(key)
+                if entry is None:
+                    generation = store.generation
+                    # replicas may not have the write behind an invalidation yet
+                    if store.invalidated_within(current_app.config.get('DB_STICKY_SECONDS', 5)):
+                        read_from_primary()
+                    g.page_cache_tags = {tag.format(**kwargs) for tag in tags}
+                    response = current_app.make_response(view(**kwargs))
+                    if response.status_code != 200:
+                        return response
+                    entry = _Entry(response.get_data(), response.content_type, frozenset(g.page_cache_tags), store.ttl)
+                    store.put(key, entry, generation)
+                return self._respond(entry)
+            return wrapper
+        return decorator
+
+    def _respond(self, entry):
+        response = current_app.response_class(entry.body, content_type=entry.content_type)
+        response.set_etag(entry.etag)
+        response.last_modified = entry.last_modified
+        # browsers may keep the page but must check back, which costs a 304
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+
+page_cache = PageCache()
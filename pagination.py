@@ -0,0 +1,81 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import select, tuple_, union_all
+
+from database import db
+
+#----------------------------------------------------------------------------#
+# Keyset pagination helpers.
+#----------------------------------------------------------------------------#
+
+# Cursors are opaque to the client: a urlsafe base64 wrapper around the sort
+# key of the last row on the page, e.g. [start_time, id] for shows.
+
+
+def encode_cursor(*values):
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, *types):
+    # types describe each key column so the values come back comparable,
+    # e.g. decode_cursor(token, datetime, int). Raises ValueError when bad.
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError('Invalid cursor')
+    decoded = []
+    for value, kind in zip(values, types):
+        if kind is datetime:
+            decoded.append(datetime.fromisoformat(value))
+        else:
+            decoded.append(kind(value))
+    return decoded
+
+
+def keyset_page(query, columns, cursor, types, limit, descending=False):
+    # Returns (rows, next_cursor). The query must not be ordered or limited
+    # yet: rows are sorted by `columns` and fetched strictly after `cursor`,
+    # so every page is a bounded range scan on a matching index.
+    if cursor:
+        key, after = tuple_(*columns), tuple_(*decode_cursor(cursor, *types))
+        query = query.filter(key < after if descending else key > after)
+    order = [column.desc() for column in columns] if descending else columns
+    rows = query.order_by(*order).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(*[getattr(last, c.key) for c in columns])
+    return rows, next_cursor
+
+
+def keyset_union_page(branches, cursor, types, limit, descending=False):
+    # keyset_page over the UNION ALL of `branches`, [(query, columns)] with
+    # matching column names. Each branch is filtered, ordered and limited on
+    # its own index before the union, so the merge sorts at most
+    # len(branches) * (limit + 1) rows.
+    after = tuple_(*decode_cursor(cursor, *types)) if cursor else None
+    subqueries = []
+    for query, columns in branches:
+        if after is not None:
+            key = tuple_(*columns)
+            query = query.filter(key < after if descending else key > after)
+        order = [column.desc() for column in columns] if descending else columns
+        subqueries.append(query.order_by(*order).limit(limit + 1).subquery())
+    merged = union_all(*[select(subquery) for subquery in subqueries]).subquery()
+    columns = [merged.c[column.key] for column in branches[0][1]]
+    order = [column.desc() for column in columns] if descending else columns
+    rows = db.session.query(merged).order_by(*order).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(*[getattr(last, c.key) for c in columns])
+    return rows, next_cursor
@@ -0,0 +1,174 @@
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from itertools import chain
+
+from database import db
+from genres import genre_names
+from models.models import Venue, Artist, VenueGenre, ArtistGenre, name_key
+
+#----------------------------------------------------------------------------#
+# Search index.
+#----------------------------------------------------------------------------#
+
+# In-process trigram index used by /venues/search and /artists/search in
+# place of `name ILIKE '%term%'`, which cannot use a B-tree index. Each
+# document is indexed on its name plus city, state and genres; a match on the
+# name counts fully and a match on the other fields counts half. Documents
+# sharing at least MIN_SIMILARITY of the query's trigrams are returned, which
+# keeps results tolerant of typos. The create/edit/delete views keep the index
+# in sync and each worker rebuilds it after `ttl` seconds.
+
+MIN_SIMILARITY = 0.5
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text):
+    return _NON_WORD.sub(' ', (text or '').lower()).strip()
+
+
+def trigrams(text):
+    # same padding as PostgreSQL's pg_trgm: two spaces before each word and
+    # one after, so short terms still match the start of a word
+    grams = set()
+    for word in normalize(text).split():
+        padded = '  ' + word + ' '
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class SearchIndex:
+
+    def __init__(self, model, link_owner, link_genre, ttl=300):
+        self.model = model
+        self.link_owner = link_owner    # e.g. VenueGenre.venue_id
+        self.link_genre = link_genre    # e.g. VenueGenre.genre_id
+        self.ttl = ttl
+        self._docs = None
+        self._name_postings = defaultdict(set)
+        self._field_postings = defaultdict(set)
+        self._built_at = 0
+        self._lock = threading.RLock()
+
+    def rebuild(self):
+        model = self.model
+        rows = db.session.query(model.id, model.name, model.city, model.state).all()
+        genres = defaultdict(list)
+        for owner_id, genre_id in db.session.query(self.link_owner, self.link_genre):
+            genres[owner_id].append(genre_id)
+        with self._lock:
+            self._docs = {}
+            self._name_postings = defaultdict(set)
+            self._field_postings = defaultdict(set)
+            for row in rows:
+                self._add(row.id, row.name, row.city, row.state, genre_names(genres[row.id]))
+            self._built_at = time.monotonic()
+
+    def upsert(self, doc_id, name, city, state, genres):
+        with self._lock:
+            if self._docs is None:
+                return  # nothing built yet, the next search loads it fresh
+            self._discard(doc_id)
+            self._add(doc_id, name, city, state, genres)
+
+    def remove(self, doc_id):
+        with self._lock:
+            if self._docs is not None:
+                self._discard(doc_id)
+
+    def search(self, term, limit=None):
+        # returns up to `limit` dicts of id/name/city/state, best match first
+        if self._docs is None or time.monotonic() - self._built_at > self.ttl:
+            self.rebuild()
+        query = normalize(term)
+        grams = trigrams(query)
+        with self._lock:
+            if not grams:
+                # an empty search lists everything, as ILIKE '%%' did
+                ranked = sorted(self._docs.items(), key=lambda item: (item[1]["name"] or '', item[0]))
+                return [self._public(doc) for _, doc in ranked[:limit]]
+            # a match has to contain at least `needed` of the query's grams.
+            # Counting hits over the rarest grams only, a document that can
+            # no longer reach `needed` with the remaining grams is skipped
+            # before it is scored.
+            needed = max(1, math.ceil(MIN_SIMILARITY * len(grams)))
+            probe = sorted(grams, key=self._posting_size)[:len(grams) - needed + 2]
+            min_hits = needed - (len(grams) - len(probe))
+            hits = Counter(chain.from_iterable(
+                postings.get(gram, ()) for gram in probe
+                for postings in (self._name_postings, self._field_postings)))
+            candidates = [doc_id for doc_id, count in hits.items() if count >= min_hits]
+            ranked = []
+            for doc_id in candidates:
+                doc = self._docs[doc_id]
+                name_grams, field_grams = doc["_grams"]
+                similarity = (len(grams & name_grams) + 0.5 * len(grams & field_grams)) / len(grams)
+                if similarity < MIN_SIMILARITY:
+                    continue
+                # exact substring and prefix matches on the name rank first
+                if query in doc["_name"]:
+                    similarity += 1
+                    if doc["_name"].startswith(query):
+                        similarity += 0.5
+                ranked.append((similarity, -len(doc["_name"]), -doc_id))
+            best = heapq.nlargest(limit or len(ranked), ranked)
+            return [self._public(self._docs[-negated_id]) for _, _, negated_id in best]
+
+    def _posting_size(self, gram):
+        return len(self._name_postings.get(gram, ())) + len(self._field_postings.get(gram, ()))
+
+    def _add(self, doc_id, name, city, state, genres):
+        if isinstance(genres, (list, tuple)):
+            genres = ' '.join(genres)
+        name_grams = trigrams(name)
+        field_grams = trigrams(' '.join(filter(None, (city, state, genres)))) - name_grams
+        self._docs[doc_id] = {
+            "id": doc_id, "name": name, "city": city, "state": state,
+            "_name": normalize(name), "_grams": (name_grams, field_grams)
+        }
+        for gram in name_grams:
+            self._name_postings[gram].add(doc_id)
+        for gram in field_grams:
+            self._field_postings[gram].add(doc_id)
+
+    def _discard(self, doc_id):
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        name_grams, field_grams = doc["_grams"]
+        for gram in name_grams:
+            self._name_postings[gram].discard(doc_id)
+        for gram in field_grams:
+            self._field_postings[gram].discard(doc_id)
+
+    @staticmethod
+    def _public(doc):
+        return {key: doc[key] for key in ("id", "name", "city", "state")}
+
+
+venue_search = SearchIndex(Venue, VenueGenre.venue_id, VenueGenre.genre_id)
+artist_search = SearchIndex(Artist, ArtistGenre.artist_id, ArtistGenre.genre_id)
+
+
+#----------------------------------------------------------------------------#
+# Prefix lookup.
+#----------------------------------------------------------------------------#
+
+# Typeahead for pickers such as the new-show form's: the first `limit` names
+# starting with what has been typed, case-insensitively, in name order. Each
+# lookup is one range scan of ix_Venue_name_key_id / ix_Artist_name_key_id
+# that stops after `limit` rows, whatever the size of the catalog.
+
+def prefix_lookup(model, columns, prefix, limit):
+    key = name_key(model.name)
+    query = db.session.query(*columns)
+    prefix = (prefix or '').strip().lower()
+    if prefix:
+        # every string starting with `prefix` sorts below `prefix` with its
+        # last character bumped by one
+        query = query.filter(key >= prefix, key < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+    return query.order_by(key, model.id).limit(limit).all()
@@ -0,0 +1,116 @@
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import case, func, or_
+
+from archive import archived_counts
+from database import db
+from models.models import Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Upcoming / past show counts.
+#----------------------------------------------------------------------------#
+
+# Venue and Artist carry denormalized upcoming_shows_count / past_shows_count
+# counters plus next_show_at, the start of their soonest upcoming show. The
+# counters are exact until next_show_at passes: create_show_submission bumps
+# them in the same transaction as the insert, and roll_over() recounts every
+# venue and artist whose next_show_at is behind the clock. When the counters
+# are stale (or SHOW_COUNTERS is off) counts come from one conditional
+# aggregate over the (venue_id, start_time) / (artist_id, start_time) index,
+# plus a count of the same index on Show_archive for past shows.
+
+OWNERS = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+
+def now_for(value):
+    # PostgreSQL returns timezone-aware datetimes, SQLite naive ones
+    if value is not None and value.tzinfo is not None:
+        return datetime.now(timezone.utc)
+    return datetime.now()
+
+
+def _aggregates(now):
+    upcoming = func.count(case((Show.start_time > now, 1)))
+    past = func.count(case((Show.start_time <= now, 1)))
+    next_show_at = func.min(case((Show.start_time > now, Show.start_time)))
+    return upcoming, past, next_show_at
+
+
+def count_shows(show_column, owner_id):
+    # returns (upcoming, past) for one venue or artist in a single query
+    upcoming, past, _ = _aggregates(datetime.now())
+    upcoming_count, past_count = db.session.query(upcoming, past).filter(show_column == owner_id).one()
+    return upcoming_count, past_count + archived_counts(show_column, [owner_id]).get(owner_id, 0)
+
+
+def current_counts(owner, show_column):
+    if current_app.config['SHOW_COUNTERS'] and \
+            (owner.next_show_at is None or owner.next_show_at > now_for(owner.next_show_at)):
+        return owner.upcoming_shows_count, owner.past_shows_count
+    return count_shows(show_column, owner.id)
+
+
+def record_new_show(show):
+    # bumps the counters of the show's venue and artist; call before commit
+    # so the counters and the show are written in one transaction
+    start_time = show.start_time
+    for model, owner_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+        if start_time > now_for(start_time):
+            values = {
+                model.upcoming_shows_count: model.upcoming_shows_count + 1,
+                model.next_show_at: case(
+                    (or_(model.next_show_at.is_(None), model.next_show_at > start_time), start_time),
+                    else_=model.next_show_at),
+            }
+        else:
+            values = {model.past_shows_count: model.past_shows_count + 1}
+        db.session.query(model).filter(model.id == owner_id).update(values, synchronize_session=False)
+
+
+def refresh_counters(model, show_column, ids):
+    # recounts the given venues or artists with one grouped query
+    upcoming, past, next_show_at = _aggregates(datetime.now())
+    counts = {row[0]: row[1:] for row in db.session.query(show_column, upcoming, past, next_show_at)
+              .filter(show_column.in_(ids)).group_by(show_column)}
+    archived = archived_counts(show_column, ids)
+    mappings = []
+    for owner_id in ids:
+        upcoming_count, past_count, next_at = counts.get(owner_id, (0, 0, None))
+        mappings.append({"id": owner_id, "upcoming_shows_count": upcoming_count,
+                         "past_shows_count": past_count + archived.get(owner_id, 0), "next_show_at": next_at})
+    db.session.bulk_update_mappings(model, mappings)
+
+
+def roll_over(batch_size=500):
+    # moves shows that have started from the upcoming to the past counters,
+    # batch_size venues or artists per transaction; returns how many changed
+    rolled = 0
+    for model, show_column in OWNERS:
+        while True:
+            ids = [owner_id for owner_id, in db.session.query(model.id)
+                   .filter(model.next_show_at <= datetime.now())
+                   .order_by(model.id).limit(batch_size)]
+            if not ids:
+                break
+            refresh_counters(model, show_column, ids)
+            db.session.commit()
+            rolled += len(ids)
+    return rolled
+
+
+def rebuild(batch_size=500):
+    # recounts every venue and artist, e.g. after importing shows directly
+    rebuilt = 0
+    for model, show_column in OWNERS:
+        last_id = 0
+        while True:
+            ids = [owner_id for owner_id, in db.session.query(model.id)
+                   .filter(model.id > last_id).order_by(model.id).limit(batch_size)]
+            if not ids:
+                break
+            refresh_counters(model, show_column, ids)
+            db.session.commit()
+            rebuilt += len(ids)
+            last_id = ids[-1]
+    return rebuilt
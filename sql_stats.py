@@ -0,0 +1,134 @@
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from flask import abort, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Per-request SQL statistics.
+#----------------------------------------------------------------------------#
+
+# For a sampled share of requests (SQL_STATS_SAMPLE_RATE) this records the
+# number of statements, total SQL time and the slowest statement, and flags
+# statement shapes repeated N_PLUS_ONE_THRESHOLD or more times in one request
+# (the N+1 pattern). The numbers go out as a Server-Timing header and into a
+# ring buffer of the last SQL_STATS_BUFFER_SIZE requests served at
+# /_debug/requests to local clients when DEBUG or DEBUG_ENDPOINTS is set.
+# Unsampled requests cost one random().
+#
+# The listeners are registered on the Engine class, so they cover the shared
+# `db` engine and any other bind it gets.
+
+_IN_LIST = re.compile(r'\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*\)')
+
+_buffer = deque(maxlen=200)
+_buffer_lock = threading.Lock()
+
+
+def statement_shape(statement):
+    # IN lists of different lengths are the same shape
+    return _IN_LIST.sub('(?)', ' '.join(statement.split()))
+
+
+class RequestStats:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest = None
+        self.shapes = Counter()
+
+    def add(self, statement, elapsed_ms):
+        self.queries += 1
+        self.sql_ms += elapsed_ms
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms, self.slowest = elapsed_ms, statement
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        return [{"statement": shape, "count": count}
+                for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+def _current():
+    return g.get('sql_stats') if has_request_context() else None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current() is not None:
+        conn.info.setdefault('sql_stats_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current()
+    if stats is not None and conn.info.get('sql_stats_started'):
+        stats.add(statement, (time.perf_counter() - conn.info['sql_stats_started'].pop()) * 1000)
+
+
+def recent_requests():
+    with _buffer_lock:
+        return list(_buffer)
+
+
+def init_app(app):
+    global _buffer
+    app.config.setdefault('SQL_STATS_SAMPLE_RATE', 0.0)
+    app.config.setdefault('SQL_STATS_BUFFER_SIZE', 200)
+    app.config.setdefault('N_PLUS_ONE_THRESHOLD', 3)
+    _buffer = deque(maxlen=app.config['SQL_STATS_BUFFER_SIZE'])
+
+    @app.before_request
+    def start_sql_stats():
+        rate = app.config['SQL_STATS_SAMPLE_RATE']
+        if rate and (rate >= 1 or random.random() < rate):
+            g.sql_stats = RequestStats()
+
+    @app.after_request
+    def report_sql_stats(response):
+        stats = g.pop('sql_stats', None)
+        if stats is None or request.endpoint == 'debug_requests':
+            return response
+        repeated = stats.repeated(app.config['N_PLUS_ONE_THRESHOLD'])
+        timings = [
+            'app;dur=%.2f' % ((time.perf_counter() - stats.started) * 1000),
+            'sql;dur=%.2f;desc="%d queries"' % (stats.sql_ms, stats.queries),
+        ]
+        if stats.slowest is not None:
+            timings.append('sql-slowest;dur=%.2f' % stats.slowest_ms)
+        if repeated:
+            timings.append('n-plus-one;desc="%d repeated"' % repeated[0]["count"])
+            app.logger.warning('Possible N+1 on %s %s: %d x %s', request.method, request.path,
+                               repeated[0]["count"], repeated[0]["statement"][:200])
+        response.headers.add('Server-Timing', ', '.join(timings))
+        with _buffer_lock:
+            _buffer.append({
+                "at": datetime.now().isoformat(timespec='seconds'),
+                "method": request.method,
+                "path": request.full_path.rstrip('?'),
+                "status": response.status_code,
+                "queries": stats.queries,
+                "sql_ms": round(stats.sql_ms, 3),
+                "slowest_ms": round(stats.slowest_ms, 3),
+                "slowest": stats.slowest,
+                "repeated": repeated,
+            })
+        return response
+
+    # SQL text and parameters: only in debug mode or with DEBUG_ENDPOINTS,
+    # since behind a local proxy every client looks like this machine
+    if app.debug or app.config.get('DEBUG_ENDPOINTS'):
+        @app.route('/_debug/requests')
+        def debug_requests():
+            # most recent first; only answered for clients on this machine
+            if request.remote_addr not in ('127.0.0.1', '::1'):
+                return abort(404)
+            return jsonify(list(reversed(recent_requests())))
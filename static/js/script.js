@@ -2,3 +2,89 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// "Load more" buttons on venue and artist pages: fetch the next page of a
+// show timeline and append its tiles. data-kind is the other side of the
+// show ("artist" on a venue page, "venue" on an artist page).
+window.showTile = function showTile(show, kind) {
+  var col = document.createElement('div');
+  col.className = 'col-sm-4';
+  var tile = document.createElement('div');
+  tile.className = 'tile tile-show';
+  var img = document.createElement('img');
+  img.src = show[kind + '_thumbnail'] || show[kind + '_image_link'] || '';
+  img.alt = 'Show ' + (kind === 'artist' ? 'Artist' : 'Venue') + ' Image';
+  var name = document.createElement('h5');
+  var link = document.createElement('a');
+  link.href = '/' + kind + 's/' + show[kind + '_id'];
+  link.textContent = show[kind + '_name'];
+  name.appendChild(link);
+  var when = document.createElement('h6');
+  when.textContent = show.start_time_display;
+  tile.appendChild(img);
+  tile.appendChild(name);
+  tile.appendChild(when);
+  col.appendChild(tile);
+  return col;
+};
+
+document.querySelectorAll('.load-more').forEach(function (button) {
+  button.addEventListener('click', function () {
+    button.disabled = true;
+    fetch(button.dataset.url + '&after=' + encodeURIComponent(button.dataset.cursor))
+      .then(function (response) { return response.json(); })
+      .then(function (page) {
+        var target = document.querySelector(button.dataset.target);
+        page.shows.forEach(function (show) {
+          target.appendChild(window.showTile(show, button.dataset.kind));
+        });
+        if (page.next) {
+          button.dataset.cursor = page.next;
+          button.disabled = false;
+        } else {
+          button.remove();
+        }
+      })
+      .catch(function () { button.disabled = false; });
+  });
+});
+
+// Artist and venue pickers on the new-show form: suggest names starting
+// with what has been typed, and copy the picked one's id into data-target.
+window.pickerLabel = function pickerLabel(item) {
+  return item.city ? item.name + ' (' + item.city + ', ' + item.state + ')' : item.name;
+};
+
+document.querySelectorAll('.picker').forEach(function (input) {
+  var options = document.getElementById(input.getAttribute('list'));
+  var target = document.querySelector(input.dataset.target);
+  var ids = {};
+  var timer = null;
+  var pending = null;
+  input.addEventListener('input', function () {
+    if (ids.hasOwnProperty(input.value)) {
+      target.value = ids[input.value];
+      return;
+    }
+    clearTimeout(timer);
+    timer = setTimeout(function () {
+      var term = input.value;
+      pending = term;
+      fetch(input.dataset.lookup + '?q=' + encodeURIComponent(term))
+        .then(function (response) { return response.json(); })
+        .then(function (items) {
+          if (pending !== term) {
+            return;  // a later lookup is on its way
+          }
+          ids = {};
+          options.innerHTML = '';
+          items.forEach(function (item) {
+            var option = document.createElement('option');
+            option.value = window.pickerLabel(item);
+            ids[option.value] = item.id;
+            options.appendChild(option);
+          });
+        });
+    }, 150);
+  });
+});
@@ -0,0 +1,154 @@
+from collections import Counter
+from datetime import date
+
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import db
+from models.models import (Artist, ArtistGenre, Show, ShowArchive, StatsGenreMonth, StatsTotal,
+                           StatsVenueBookings)
+
+#----------------------------------------------------------------------------#
+# Stats rollups.
+#----------------------------------------------------------------------------#
+
+# The /stats dashboard reads only the Stats_* tables:
+#
+#   Stats_Genre_Month      shows per artist genre per month
+#   Stats_Venue_Bookings   all-time shows per venue
+#   Stats_Total            'artists' and 'artists_seeking_venue'
+#
+# create_show_submission adds each show in its own transaction and marks it
+# counted. Shows written any other way (`flask import`, the seed script) are
+# picked up by catch_up(), which `flask update-stats` runs from cron: it adds
+# the uncounted shows in batches, found through the partial index
+# ix_Show_pending_stats, and recounts the artist totals. The artist create and
+# edit handlers keep the totals and, when an artist's genres change, the genre
+# months of their shows current in between. rebuild() starts over.
+#
+# Every change is an INSERT ... ON CONFLICT DO UPDATE adding a delta, so
+# concurrent writers never overwrite each other's counts.
+
+
+def month_of(start_time):
+    return date(start_time.year, start_time.month, 1)
+
+
+def _add(model, keys, column, deltas):
+    # adds {key tuple: delta} to `column` of `model`, creating missing rows
+    rows = [dict(zip(keys, key), **{column: delta}) for key, delta in deltas.items() if delta]
+    if not rows:
+        return
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    insert = dialect.insert(model.__table__)
+    db.session.execute(insert.on_conflict_do_update(
+        index_elements=list(keys), set_={column: model.__table__.c[column] + insert.excluded[column]}), rows)
+
+
+def add_totals(deltas):
+    # e.g. add_totals({'artists': 1, 'artists_seeking_venue': 1})
+    _add(StatsTotal, ('name',), 'value', {(name,): delta for name, delta in deltas.items()})
+
+
+def add_shows(shows, sign=1):
+    # shows: [(venue_id, artist_id, start_time)]; one query for the artists'
+    # genres, then one upsert per rollup
+    artist_ids = {artist_id for _, artist_id, _ in shows}
+    genres = {}
+    if artist_ids:
+        for artist_id, genre_id in db.session.query(ArtistGenre.artist_id, ArtistGenre.genre_id) \
+                .filter(ArtistGenre.artist_id.in_(artist_ids)):
+            genres.setdefault(artist_id, []).append(genre_id)
+    venues, months = Counter(), Counter()
+    for venue_id, artist_id, start_time in shows:
+        venues[(venue_id,)] += sign
+        if start_time is not None:
+            for genre_id in genres.get(artist_id, ()):
+                months[(genre_id, month_of(start_time))] += sign
+    _add(StatsVenueBookings, ('venue_id',), 'show_count', venues)
+    _add(StatsGenreMonth, ('genre_id', 'month'), 'show_count', months)
+
+
+def record_show(show):
+    # for create_show_submission, before the commit
+    show.counted = True
+    add_shows([(show.venue_id, show.artist_id, show.start_time)])
+
+
+def record_artist(seeking_venue):
+    add_totals({'artists': 1, 'artists_seeking_venue': 1 if seeking_venue else 0})
+
+
+def artist_changed(artist_id, old_seeking, new_seeking, old_genres, new_genres):
+    # after an edit; genres are genre ids. A genre change moves the artist's
+    # counted shows, grouped by month, from the old genres to the new ones.
+    if bool(old_seeking) != bool(new_seeking):
+        add_totals({'artists_seeking_venue': 1 if new_seeking else -1})
+    removed, added = set(old_genres) - set(new_genres), set(new_genres) - set(old_genres)
+    if not removed and not added:
+        return
+    months = Counter()
+    for model, counted in ((Show, Show.counted), (ShowArchive, None)):
+        query = db.session.query(model.start_time).filter(model.artist_id == artist_id, model.start_time.isnot(None))
+        if counted is not None:
+            query = query.filter(counted)
+        months.update(month_of(start_time) for start_time, in query)
+    deltas = Counter()
+    for month, count in months.items():
+        for genre_id in removed:
+            deltas[(genre_id, month)] -= count
+        for genre_id in added:
+            deltas[(genre_id, month)] += count
+    _add(StatsGenreMonth, ('genre_id', 'month'), 'show_count', deltas)
+
+
+def recount_totals():
+    artists, seeking = db.session.query(func.count(Artist.id), func.count(Artist.id).filter(Artist.seeking_venue)).one()
+    for name, value in (('artists', artists), ('artists_seeking_venue', seeking)):
+        if db.session.query(StatsTotal).filter(StatsTotal.name == name).update({"value": value}) == 0:
+            db.session.add(StatsTotal(name=name, value=value))
+
+
+def catch_up(batch_size=None):
+    # adds uncounted shows, batch_size per transaction, then recounts the
+    # totals; returns how many shows were added
+    batch_size = batch_size or current_app.config['STATS_BATCH_SIZE']
+    added = 0
+    while True:
+        rows = db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time) \
+            .filter(Show.counted.is_(False)).order_by(Show.id).limit(batch_size).all()
+        if not rows:
+            break
+        add_shows([(venue_id, artist_id, start_time) for _, venue_id, artist_id, start_time in rows])
+        db.session.query(Show).filter(Show.id.in_([row.id for row in rows])) \
+            .update({"counted": True}, synchronize_session=False)
+        db.session.commit()
+        added += len(rows)
+    recount_totals()
+    db.session.commit()
+    return added
+
+
+def rebuild(batch_size=None):
+    # recomputes every rollup: empties them and marks all shows uncounted in
+    # one transaction, adds the archive, then catches up with Show
+    batch_size = batch_size or current_app.config['STATS_BATCH_SIZE']
+    for model in (StatsGenreMonth, StatsVenueBookings, StatsTotal):
+        db.session.query(model).delete(synchronize_session=False)
+    db.session.query(Show).filter(Show.counted.is_(True)).update({"counted": False}, synchronize_session=False)
+    db.session.commit()
+    archived = 0
+    last = None
+    while True:
+        query = db.session.query(ShowArchive.start_time, ShowArchive.id, ShowArchive.venue_id, ShowArchive.artist_id)
+        if last is not None:
+            query = query.filter(db.tuple_(ShowArchive.start_time, ShowArchive.id) > db.tuple_(*last))
+        rows = query.order_by(ShowArchive.start_time, ShowArchive.id).limit(batch_size).all()
+        if not rows:
+            break
+        add_shows([(venue_id, artist_id, start_time) for start_time, _, venue_id, artist_id in rows])
+        db.session.commit()
+        archived += len(rows)
+        last = (rows[-1].start_time, rows[-1].id)
+    return archived + catch_up(batch_size)
@@ -0,0 +1,28 @@
+import pytest
+
+from app import create_app
+from database import db
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": 'sqlite:///' + str(tmp_path / 'fyyur.db'),
+        "JOB_WORKERS": 0,
+        "TESTING": True,
+    })
+    with app.app_context():
+        db.create_all()
+    return app.test_client()
+
+
+@pytest.mark.parametrize('key', ['venue_id', 'artist_id'])
+def test_shows_rejects_invalid_id(client, key):
+    response = client.get('/api/v1/shows', query_string={key: 'abc'})
+    assert response.status_code == 400
+    assert 'Invalid {0}'.format(key) in response.get_data(as_text=True)
+
+
+def test_shows_filters_by_id(client):
+    response = client.get('/api/v1/shows', query_string={"venue_id": '1', "artist_id": '2'})
+    assert response.status_code == 200
@@ -0,0 +1,18 @@
+from logging import FileHandler
+
+from app import create_app
+
+
+def test_error_log_handler_added_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config = {"SQLALCHEMY_DATABASE_URI": 'sqlite://', "DEBUG": False, "JOB_WORKERS": 0}
+    apps = [create_app(config) for _ in range(3)]
+    handlers = [handler for handler in apps[-1].logger.handlers if isinstance(handler, FileHandler)]
+    try:
+        assert [handler.baseFilename for handler in handlers] == [str(tmp_path / 'error.log')]
+        # nothing is logged just for starting up
+        assert not (tmp_path / 'error.log').exists()
+    finally:
+        for handler in handlers:
+            apps[-1].logger.removeHandler(handler)
+            handler.close()
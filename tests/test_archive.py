@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+from archive import archive_shows
+from database import db
+from models.models import Artist, Show, ShowArchive, Venue
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": 'sqlite:///' + str(tmp_path / 'fyyur.db'),
+        "JOB_WORKERS": 0,
+        "TESTING": True,
+    })
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Venue(id=1, name='Hall', city='Austin', state='TX'),
+                            Artist(id=1, name='Band', city='Austin', state='TX')])
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def add_show(start_time, **kw):
+    show = Show(venue_id=1, artist_id=1, start_time=start_time, end_time=start_time + timedelta(hours=2), **kw)
+    db.session.add(show)
+    db.session.commit()
+    return show.id
+
+
+def test_archived_ids_are_not_reused(app):
+    old = datetime.now() - timedelta(days=400)
+    ids = [add_show(old + timedelta(days=day), counted=True) for day in range(3)]
+    # the newest show is archived too
+    assert archive_shows() == 3
+    assert sorted(show_id for show_id, in db.session.query(ShowArchive.id)) == ids
+    assert add_show(datetime.now() + timedelta(days=1)) > max(ids)
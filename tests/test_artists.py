@@ -0,0 +1,52 @@
+import re
+
+import pytest
+
+from app import create_app
+from database import db
+from letter_index import letter_of
+from models.models import Artist
+
+NAMES = ['apple', 'Bob', 'bart', 'Zed', '9 Lives', 'Émile', '~tilde', 'mika', 'Moby', '1a', '2b', '3c']
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": 'sqlite:///' + str(tmp_path / 'fyyur.db'),
+        "ARTISTS_PER_PAGE": 100,
+        "JOB_WORKERS": 0,
+        "TESTING": True,
+    })
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(Artist(id=i, name=name, city='Austin', state='TX') for i, name in enumerate(NAMES, 1))
+        db.session.commit()
+    return app.test_client()
+
+
+def listed(client, letter):
+    html = client.get('/artists', query_string={"letter": letter}).get_data(as_text=True)
+    return [NAMES[int(artist_id) - 1] for artist_id in re.findall(r'href="/artists/(\d+)"', html)]
+
+
+@pytest.mark.parametrize('letter', ['B', 'M', 'Z'])
+def test_letter_jumps_to_first_name_with_that_letter(client, letter):
+    filed = {name for name in NAMES if letter_of(name) == letter}
+    # names compare ignoring case, so all of the letter's names come first
+    assert set(listed(client, letter)[:len(filed)]) == filed
+
+
+def test_hash_lists_names_outside_a_to_z(client):
+    assert sorted(listed(client, '#')) == sorted(name for name in NAMES if letter_of(name) == '#')
+
+
+def test_hash_pages_stay_outside_a_to_z(client):
+    client.application.config['ARTISTS_PER_PAGE'] = 2
+    names, url = [], '/artists?letter=%23'
+    while url:
+        html = client.get(url).get_data(as_text=True)
+        names += [NAMES[int(artist_id) - 1] for artist_id in re.findall(r'href="/artists/(\d+)"', html)]
+        next_page = re.search(r'href="(/artists\?[^"]*after=[^"]*)"', html)
+        url = next_page.group(1).replace('&amp;', '&') if next_page else None
+    assert sorted(names) == sorted(name for name in NAMES if letter_of(name) == '#')
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+from bookings import batch_conflicts, conflicts
+from database import db
+from models.models import Artist, Show, Venue
+
+# an evening well after archive.horizon(), so only Show is checked
+EVENING = datetime.now().replace(hour=20, minute=0, second=0, microsecond=0) + timedelta(days=30)
+
+
+def at(hours):
+    return EVENING + timedelta(hours=hours)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": 'sqlite:///' + str(tmp_path / 'fyyur.db'),
+        "WTF_CSRF_ENABLED": False,
+        "JOB_WORKERS": 0,
+        "TESTING": True,
+    })
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Venue(id=venue_id, name='Hall %d' % venue_id, city='Austin', state='TX')
+                            for venue_id in (1, 2)] +
+                           [Artist(id=artist_id, name='Band %d' % artist_id, city='Austin', state='TX')
+                            for artist_id in (1, 2, 3)])
+        # venue 1 and artist 1 are booked from 20:00 until 22:00
+        db.session.add(Show(id=1, venue_id=1, artist_id=1, start_time=at(0), end_time=at(2), counted=True))
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def test_overlapping_venue_slot(app):
+    assert [(show.id, show.venue_id) for show in conflicts(1, 2, at(1), at(3))] == [(1, 1)]
+
+
+def test_overlapping_artist_slot(app):
+    assert [(show.id, show.artist_id) for show in conflicts(2, 1, at(-1), at(0.5))] == [(1, 1)]
+
+
+def test_back_to_back_shows_do_not_overlap(app):
+    assert conflicts(1, 1, at(2), at(4)) == []
+    assert conflicts(1, 1, at(-2), at(0)) == []
+
+
+def test_batch_overlapping_itself(app):
+    rows = [
+        {"venue_id": 2, "artist_id": 2, "start_time": at(0), "end_time": at(2)},
+        # same venue, an hour into the first row
+        {"venue_id": 2, "artist_id": 3, "start_time": at(1), "end_time": at(3)},
+        # right after the first row, and the second was refused
+        {"venue_id": 2, "artist_id": 3, "start_time": at(2), "end_time": at(4)},
+        # the artist of the existing show
+        {"venue_id": 2, "artist_id": 1, "start_time": at(5), "end_time": at(6)},
+        {"venue_id": 2, "artist_id": 1, "start_time": at(1.5), "end_time": at(1.75)},
+    ]
+    assert batch_conflicts(rows) == {1: ('venue_id', None), 4: ('venue_id', None)}
+    rows[4]['venue_id'] = 1
+    assert batch_conflicts(rows) == {1: ('venue_id', None), 4: ('venue_id', 1)}
+
+
+def test_create_show_refuses_double_booking(app):
+    client = app.test_client()
+    form = {"venue_id": '1', "artist_id": '2', "start_time": at(1).isoformat(), "duration": '60'}
+    response = client.post('/shows/create', data=form)
+    assert b'The venue is already booked' in response.data
+    form.update(venue_id='2', start_time=at(2).isoformat())
+    response = client.post('/shows/create', data=form)
+    assert b'Show was successfully listed!' in response.data
+    assert sorted(show_id for show_id, in db.session.query(Show.venue_id)) == [1, 2]
@@ -0,0 +1,128 @@
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import bulk_import
+from app import create_app
+from bulk_import import import_rows, read_rows
+from database import db
+from genres import GENRE_IDS
+from models.models import Artist, ArtistGenre, Show, StatsTotal, Venue, VenueGenre
+
+VENUES_CSV = '''name,city,state,address,phone,genres,facebook_link,website_link,seeking_talent
+The Loft,Austin,TX,1 Main St,512-555-0100,Jazz;Blues,https://facebook.com/loft,https://loft.example,yes
+,Austin,TX,2 Main St,512-555-0101,Jazz,https://facebook.com/x,https://x.example,no
+The Cellar,Austin,XX,3 Main St,512-555-0102,Polka,https://facebook.com/c,https://c.example,no
+The Barn,Dallas,TX,4 Main St,214-555-0103,Folk,https://facebook.com/barn,https://barn.example,
+'''
+
+ARTISTS_NDJSON = [
+    {"name": 'Ana', "city": 'Austin', "state": 'TX', "phone": '512-555-0200', "genres": ['Jazz'],
+     "facebook_link": 'https://facebook.com/ana', "website_link": 'https://ana.example',
+     "image_link": 'https://ana.example/photo.jpg', "seeking_venue": True},
+    {"name": 'Ben', "city": 'Austin', "state": 'TX', "phone": 'call me', "genres": ['Jazz'],
+     "facebook_link": 'https://facebook.com/ben', "website_link": 'https://ben.example',
+     "image_link": 'https://ben.example/photo.jpg'},
+    {"name": 'Cy', "city": 'Dallas', "state": 'TX', "phone": '214-555-0201', "genres": 'Folk;Rock n Roll',
+     "facebook_link": 'https://facebook.com/cy', "website_link": 'https://cy.example',
+     "image_link": 'https://cy.example/photo.jpg', "seeking_venue": 'no'},
+]
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": 'sqlite:///' + str(tmp_path / 'fyyur.db'),
+        "JOB_WORKERS": 0,
+        "TESTING": True,
+    })
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def inserts(monkeypatch):
+    # (table name, row count) for every bulk insert
+    calls = []
+    insert = bulk_import.insert
+
+    def recording(table, rows):
+        calls.append((table.name, len(rows)))
+        insert(table, rows)
+    monkeypatch.setattr(bulk_import, 'insert', recording)
+    return calls
+
+
+def run(kind, text, format, batch_size=100):
+    rejects = []
+    imported, rejected = import_rows(kind, read_rows(io.StringIO(text), format), batch_size,
+                                     lambda line, row, errors: rejects.append((line, sorted(errors))))
+    return imported, rejected, rejects
+
+
+def genres_of(link, owner_column):
+    pairs = {}
+    for owner_id, genre_id in db.session.query(owner_column, link.genre_id):
+        pairs.setdefault(owner_id, set()).add(genre_id)
+    return pairs
+
+
+def test_import_venues(app, inserts):
+    imported, rejected, rejects = run('venues', VENUES_CSV, 'csv')
+    assert (imported, rejected) == (2, 2)
+    # CSV line numbers, header included
+    assert rejects == [(3, ['name']), (4, ['genres', 'state'])]
+    assert inserts == [('Venue', 2), ('Venue_Genre', 3)]
+    venues = {venue.name: venue for venue in Venue.query}
+    assert sorted(venues) == ['The Barn', 'The Loft']
+    assert venues['The Loft'].seeking_talent and not venues['The Barn'].seeking_talent
+    assert genres_of(VenueGenre, VenueGenre.venue_id) == {
+        venues['The Loft'].id: {GENRE_IDS['Jazz'], GENRE_IDS['Blues']},
+        venues['The Barn'].id: {GENRE_IDS['Folk']},
+    }
+
+
+def test_import_artists_in_batches(app, inserts):
+    text = ''.join(json.dumps(row) + '\n' for row in ARTISTS_NDJSON) + 'not json\n'
+    imported, rejected, rejects = run('artists', text, 'ndjson', batch_size=1)
+    assert (imported, rejected) == (2, 2)
+    assert rejects == [(2, ['phone']), (4, ['_row'])]
+    assert inserts == [('Artist', 1), ('Artist_Genre', 1), ('Artist', 1), ('Artist_Genre', 2)]
+    artists = {artist.name: artist.id for artist in Artist.query}
+    assert genres_of(ArtistGenre, ArtistGenre.artist_id) == {
+        artists['Ana']: {GENRE_IDS['Jazz']}, artists['Cy']: {GENRE_IDS['Folk'], GENRE_IDS['Rock n Roll']}}
+    assert dict(db.session.query(StatsTotal.name, StatsTotal.value)) == {"artists": 2, "artists_seeking_venue": 1}
+
+
+def test_import_shows_updates_counters(app, inserts):
+    db.session.add_all([Venue(id=1, name='Hall', city='Austin', state='TX'),
+                        Artist(id=1, name='Ana', city='Austin', state='TX'),
+                        Artist(id=2, name='Ben', city='Austin', state='TX')])
+    db.session.commit()
+    soon = datetime.now().replace(microsecond=0) + timedelta(days=7)
+    ago = datetime.now().replace(microsecond=0) - timedelta(days=7)
+    rows = [
+        {"venue_id": 1, "artist_id": 1, "start_time": soon.isoformat()},
+        {"venue_id": 1, "artist_id": 2, "start_time": ago.isoformat(), "duration": 90},
+        # the venue is taken by the first row
+        {"venue_id": 1, "artist_id": 2, "start_time": (soon + timedelta(minutes=30)).isoformat()},
+        {"venue_id": 9, "artist_id": 1, "start_time": (soon + timedelta(days=1)).isoformat()},
+        {"venue_id": 1, "artist_id": 1, "start_time": 'someday'},
+        {"venue_id": 1, "artist_id": 1, "start_time": (soon + timedelta(days=2)).isoformat()},
+    ]
+    text = ''.join(json.dumps(row) + '\n' for row in rows)
+    imported, rejected, rejects = run('shows', text, 'ndjson')
+    assert (imported, rejected) == (3, 3)
+    # rows failing validation are rejected at once, the others at their batch
+    assert sorted(rejects) == [(3, ['venue_id']), (4, ['venue_id']), (5, ['start_time'])]
+    assert inserts == [('Show', 3)]
+    assert db.session.query(Show).count() == 3
+    venue, ana, ben = Venue.query.get(1), Artist.query.get(1), Artist.query.get(2)
+    assert (venue.upcoming_shows_count, venue.past_shows_count) == (2, 1)
+    assert (ana.upcoming_shows_count, ana.past_shows_count) == (2, 0)
+    assert (ben.upcoming_shows_count, ben.past_shows_count) == (0, 1)
+    assert venue.next_show_at.replace(tzinfo=None) == soon
@@ -0,0 +1,175 @@
+import json
+
+import pytest
+from flask import request
+
+from app import create_app
+from db_routing import set_statement_timeout
+
+
+class FakeConnection:
+    # records the statements a pool checkout hook runs
+
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def execute(self, statement):
+                connection.statements.append(statement)
+
+            def close(self):
+                pass
+        return Cursor()
+
+    def commit(self):
+        self.commits += 1
+
+
+class FakeRecord:
+    def __init__(self):
+        self.info = {}
+
+
+@pytest.fixture
+def timeout_app(tmp_path):
+    return create_app({"SQLALCHEMY_DATABASE_URI": 'sqlite:///' + str(tmp_path / 'fyyur.db'),
+                       "DB_STATEMENT_TIMEOUT_MS": 5000, "JOB_WORKERS": 0, "TESTING": True})
+
+
+def test_statement_timeout_only_in_requests(timeout_app):
+    connection, record = FakeConnection(), FakeRecord()
+    with timeout_app.app_context():
+        set_statement_timeout(connection, record, None)
+    assert connection.statements == []
+    with timeout_app.test_request_context('/'):
+        set_statement_timeout(connection, record, None)
+        set_statement_timeout(connection, record, None)
+    assert connection.statements == ['SET statement_timeout = 5000']
+    with timeout_app.app_context():
+        set_statement_timeout(connection, record, None)
+    assert connection.statements[-1] == 'SET statement_timeout = 0'
+    assert connection.commits == 2
+
+
+@pytest.fixture
+def routed_app(tmp_path):
+    # a primary and a replica that never catches up, so every read shows
+    # which database answered it
+    from database import db
+    from models.models import Venue
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": 'sqlite:///' + str(tmp_path / 'primary.db'),
+        "SQLALCHEMY_BINDS": {"replica_1": 'sqlite:///' + str(tmp_path / 'replica.db')},
+        "DB_REPLICAS": ['replica_1'],
+        "SECRET_KEY": 'shared by every worker',
+        "WTF_CSRF_ENABLED": False,
+        "JOB_WORKERS": 0,
+        "TESTING": True,
+    })
+    with app.app_context():
+        for bind in (None, 'replica_1'):
+            engine = db.get_engine(app, bind=bind)
+            db.Model.metadata.create_all(engine)
+            with engine.begin() as connection:
+                connection.execute(Venue.__table__.insert(), {"id": 1, "name": 'Old Hall', "city": 'Austin', "state": 'TX'})
+    return app
+
+
+def rename_venue(app, client, name, old_name):
+    # posts an edit that changes only the venue's name
+    from edits import snapshot
+    from forms import VenueForm
+    from views.venues import EDIT_FIELDS
+    with app.test_request_context('/', method='POST', data={"name": name}):
+        original = json.loads(snapshot(VenueForm(request.form), EDIT_FIELDS))
+    original['name'] = old_name
+    return client.post('/venues/1/edit', data={"name": name, "version": 1, "original": json.dumps(original)})
+
+
+def test_page_rendered_after_invalidation_reads_primary(routed_app):
+    reader, writer = routed_app.test_client(), routed_app.test_client()
+    assert b'Old Hall' in reader.get('/venues/1').data
+    assert rename_venue(routed_app, writer, 'New Hall', 'Old Hall').status_code == 302
+    # the replica still says Old Hall; the refill must not cache that
+    assert b'New Hall' in reader.get('/venues/1').data
+    assert b'New Hall' in writer.get('/venues/1').data
+    assert b'New Hall' in reader.get('/venues/1').data
+
+
+def test_sticky_client_bypasses_page_cache(routed_app):
+    reader, writer = routed_app.test_client(), routed_app.test_client()
+    rename_venue(routed_app, writer, 'New Hall', 'Old Hall')
+    routed_app.extensions['page_cache']._invalidated_at = None  # as if the invalidation were long ago
+    # a reader caches the replica's page; the writer still sees their edit
+    assert b'Old Hall' in reader.get('/venues/1').data
+    assert b'New Hall' in writer.get('/venues/1').data
+
+
+def venue_names(app):
+    # the venue's name on (primary, replica)
+    from database import db
+    from models.models import Venue
+    names = []
+    with app.app_context():
+        for bind in (None, 'replica_1'):
+            with db.get_engine(app, bind=bind).connect() as connection:
+                names.append(connection.execute(Venue.__table__.select().with_only_columns(Venue.name)).scalar())
+    return tuple(names)
+
+
+def test_reads_go_to_replica(routed_app):
+    from database import db
+    from models.models import Venue
+    with routed_app.app_context():
+        with db.get_engine(routed_app).begin() as connection:
+            connection.execute(Venue.__table__.update().values(name='Primary Hall'))
+    lookup = routed_app.test_client().get('/venues/lookup.json?q=')
+    assert [venue['name'] for venue in lookup.get_json()] == ['Old Hall']
+
+
+def test_writes_and_flushes_go_to_primary(routed_app):
+    from flask import g
+    from database import db
+    from db_routing import reads_from_replica
+    from models.models import Venue
+
+    @reads_from_replica
+    def write():
+        assert g.db_replica == 'replica_1'
+        Venue.query.get(1).name = 'Flushed Hall'
+        db.session.flush()
+        assert g.db_wrote
+        db.session.commit()
+        db.session.query(Venue).filter(Venue.id == 1).update({"city": 'Dallas'}, synchronize_session=False)
+        db.session.commit()
+
+    with routed_app.test_request_context('/'):
+        write()
+        db.session.remove()
+    assert venue_names(routed_app) == ('Flushed Hall', 'Old Hall')
+    with routed_app.app_context(), db.get_engine(routed_app).connect() as connection:
+        assert connection.execute(Venue.__table__.select()).first().city == 'Dallas'
+
+
+def test_post_makes_client_stick_to_primary(routed_app):
+    import time
+    reader, writer = routed_app.test_client(), routed_app.test_client()
+    assert rename_venue(routed_app, writer, 'New Hall', 'Old Hall').status_code == 302
+    with writer.session_transaction() as session:
+        assert session['db_primary_until'] > time.time()
+    with reader.session_transaction() as session:
+        assert 'db_primary_until' not in session
+    assert venue_names(routed_app) == ('New Hall', 'Old Hall')
+    assert writer.get('/venues/lookup.json?q=').get_json()[0]['name'] == 'New Hall'
+    assert reader.get('/venues/lookup.json?q=').get_json()[0]['name'] == 'Old Hall'
+
+
+def test_replicas_need_a_shared_secret_key(tmp_path):
+    with pytest.raises(RuntimeError, match='SECRET_KEY'):
+        create_app({"SQLALCHEMY_DATABASE_URI": 'sqlite:///' + str(tmp_path / 'primary.db'),
+                    "SQLALCHEMY_BINDS": {"replica_1": 'sqlite:///' + str(tmp_path / 'replica.db')},
+                    "DB_REPLICAS": ['replica_1'], "SECRET_KEY": None, "JOB_WORKERS": 0, "TESTING": True})
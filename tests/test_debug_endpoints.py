@@ -0,0 +1,22 @@
+import pytest
+
+from app import create_app
+
+
+def make_app(tmp_path, **config):
+    return create_app(dict({"SQLALCHEMY_DATABASE_URI": 'sqlite:///' + str(tmp_path / 'fyyur.db'),
+                            "JOB_WORKERS": 0, "TESTING": True}, **config))
+
+
+@pytest.mark.parametrize('path', ['/_debug/requests', '/_debug/pools'])
+def test_debug_endpoints_are_off_in_production(tmp_path, path):
+    app = make_app(tmp_path, DEBUG=False)
+    assert app.test_client().get(path, environ_base={"REMOTE_ADDR": '127.0.0.1'}).status_code == 404
+
+
+@pytest.mark.parametrize('path', ['/_debug/requests', '/_debug/pools'])
+def test_debug_endpoints_can_be_turned_on(tmp_path, path):
+    app = make_app(tmp_path, DEBUG=False, DEBUG_ENDPOINTS=True)
+    client = app.test_client()
+    assert client.get(path, environ_base={"REMOTE_ADDR": '127.0.0.1'}).status_code == 200
+    assert client.get(path, environ_base={"REMOTE_ADDR": '203.0.113.9'}).status_code == 404
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+from flask import request
+
+from app import create_app
+from database import db
+from edits import EditConflict, save_edit, snapshot
+from forms import VenueForm
+from models.models import Venue
+from views.venues import EDIT_FIELDS
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": 'sqlite:///' + str(tmp_path / 'fyyur.db'),
+        "WTF_CSRF_ENABLED": False,
+        "JOB_WORKERS": 0,
+        "TESTING": True,
+    })
+    with app.app_context():
+        db.create_all()
+        db.session.add(Venue(id=1, name='Old Hall', city='Austin', state='TX'))
+        db.session.commit()
+    return app
+
+
+def venue(app):
+    with app.app_context():
+        row = Venue.query.get(1)
+        return row.name, row.version
+
+
+def test_save_edit_bumps_version(app):
+    with app.app_context():
+        save_edit(Venue, 1, 1, {"name": 'New Hall'})
+        db.session.commit()
+    assert venue(app) == ('New Hall', 2)
+
+
+@pytest.mark.parametrize('version', [None, 0, 2])
+def test_save_edit_refuses_stale_version(app, version):
+    with app.app_context():
+        with pytest.raises(EditConflict):
+            save_edit(Venue, 1, version, {"name": 'New Hall'})
+        db.session.rollback()
+    assert venue(app) == ('Old Hall', 1)
+
+
+def test_save_edit_refuses_missing_row(app):
+    with app.app_context():
+        with pytest.raises(EditConflict):
+            save_edit(Venue, 2, 1, {"name": 'New Hall'})
+
+
+def edit_venue(app, client, name, version):
+    # posts an edit, rendered from 'Old Hall', that changes only the name
+    with app.test_request_context('/', method='POST', data={"name": name}):
+        original = json.loads(snapshot(VenueForm(request.form), EDIT_FIELDS))
+    original['name'] = 'Old Hall'
+    return client.post('/venues/1/edit', data={"name": name, "version": version, "original": json.dumps(original)})
+
+
+def test_stale_edit_answers_409(app):
+    client = app.test_client()
+    assert edit_venue(app, client, 'First Hall', 1).status_code == 302
+    # a second editor, still on version 1, does not overwrite the first
+    response = edit_venue(app, client, 'Second Hall', 1)
+    assert response.status_code == 409
+    assert b'Someone else changed this venue' in response.data
+    assert venue(app) == ('First Hall', 2)
+    # resubmitting against the version now saved replaces it knowingly
+    assert edit_venue(app, client, 'Second Hall', 2).status_code == 302
+    assert venue(app) == ('Second Hall', 3)
@@ -0,0 +1,114 @@
+import pytest
+
+import jobs
+from app import create_app
+from database import db
+from models.models import Job
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": 'sqlite:///' + str(tmp_path / 'fyyur.db'),
+        "JOB_WORKERS": 0,
+        "JOB_MAX_ATTEMPTS": 3,
+        "JOB_RETRY_SECONDS": 10,
+        "JOB_RETRY_MAX_SECONDS": 30,
+        "TESTING": True,
+    })
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    # a registered job that fails while `failures` is non-empty
+    calls, failures = [], []
+
+    def record(**payload):
+        calls.append(payload)
+        if failures:
+            raise RuntimeError(failures.pop())
+    monkeypatch.setitem(jobs.HANDLERS, 'test.record', (record, None))
+    return calls, failures
+
+
+def states():
+    return [(job.key, job.state, job.attempts) for job in Job.query.order_by(Job.id)]
+
+
+def test_enqueue_with_key_is_idempotent(app):
+    jobs.enqueue('test.record', {"n": 1}, key='once')
+    jobs.enqueue('test.record', {"n": 2}, key='once')
+    jobs.enqueue('test.record', {"n": 3})
+    jobs.enqueue('test.record', {"n": 4})
+    db.session.commit()
+    assert states() == [('once', 'queued', 0), (None, 'queued', 0), (None, 'queued', 0)]
+
+
+def test_claim_leases_due_jobs_once(app):
+    jobs.enqueue('test.record', {"n": 1})
+    jobs.enqueue('test.record', {"n": 2})
+    jobs.enqueue('test.record', {"n": 3}, delay=60)
+    db.session.commit()
+    claimed = jobs.claim(5)
+    assert [(name, payload, attempts) for _, name, payload, attempts, _ in claimed] == \
+        [('test.record', '{"n": 1}', 1), ('test.record', '{"n": 2}', 1)]
+    # leased until JOB_LEASE_SECONDS from now, so not claimed again
+    assert jobs.claim(5) == []
+    assert states() == [(None, 'running', 1), (None, 'running', 1), (None, 'queued', 0)]
+
+
+def test_claim_respects_limit(app):
+    for n in range(3):
+        jobs.enqueue('test.record', {"n": n})
+    db.session.commit()
+    assert len(jobs.claim(2)) == 2
+    assert len(jobs.claim(2)) == 1
+
+
+def test_failed_job_is_retried_with_backoff(app, handler, monkeypatch):
+    calls, failures = handler
+    failures.extend(['again', 'boom'])
+    monkeypatch.setattr(jobs.random, 'uniform', lambda low, high: high)
+    jobs.enqueue('test.record', {"n": 1})
+    db.session.commit()
+
+    assert jobs.run(jobs.claim(1)[0]) is False
+    job = Job.query.one()
+    assert (job.state, job.attempts, 'RuntimeError: boom' in job.last_error) == ('queued', 1, True)
+    # not due again until the retry delay has passed
+    assert jobs.claim(1) == []
+
+    Job.query.update({"run_at": jobs._now()})
+    db.session.commit()
+    assert jobs.run(jobs.claim(1)[0]) is False
+    Job.query.update({"run_at": jobs._now()})
+    db.session.commit()
+    assert jobs.run(jobs.claim(1)[0]) is True
+    assert calls == [{"n": 1}] * 3
+    assert states() == [(None, 'done', 3)]
+
+
+def test_job_fails_after_max_attempts(app, handler):
+    calls, failures = handler
+    failures.extend(['boom'] * 3)
+    jobs.enqueue('test.record', {"n": 1})
+    db.session.commit()
+    for _ in range(3):
+        Job.query.update({"run_at": jobs._now()})
+        db.session.commit()
+        assert jobs.run(jobs.claim(1)[0]) is False
+    assert states() == [(None, 'failed', 3)]
+    assert jobs.claim(1) == []
+    assert jobs.requeue([Job.query.one().id]) == 1
+    assert states() == [(None, 'queued', 0)]
+
+
+def test_retry_delay_doubles_up_to_max(app, monkeypatch):
+    monkeypatch.setattr(jobs.random, 'uniform', lambda low, high: high)
+    assert [jobs.retry_delay(attempts) for attempts in (1, 2, 3, 4)] == [10, 20, 30, 30]
+    monkeypatch.setattr(jobs.random, 'uniform', lambda low, high: low)
+    assert jobs.retry_delay(1) == 5
@@ -0,0 +1,114 @@
+import json
+
+import pytest
+from flask import request
+
+from app import create_app
+from database import db
+from edits import snapshot
+from forms import VenueForm
+from models.models import Venue
+from page_cache import PageStore, _Entry
+from views.venues import EDIT_FIELDS
+
+
+def make_app(tmp_path, name='fyyur.db'):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": 'sqlite:///' + str(tmp_path / name),
+        "WTF_CSRF_ENABLED": False,
+        "JOB_WORKERS": 0,
+        "TESTING": True,
+    })
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Venue(id=venue_id, name='Hall %d' % venue_id, city='Austin', state='TX')
+                            for venue_id in (1, 2)])
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def app(tmp_path):
+    return make_app(tmp_path)
+
+
+def rename_behind_the_cache(app, venue_id, name):
+    with app.app_context(), db.engine.begin() as connection:
+        connection.execute(Venue.__table__.update().where(Venue.id == venue_id).values(name=name))
+
+
+def entry(body, tags=(), ttl=60):
+    return _Entry(body, 'text/html', frozenset(tags), ttl)
+
+
+def test_write_evicts_tagged_pages(app):
+    client = app.test_client()
+    assert b'Hall 1' in client.get('/venues/1').data
+    assert b'Hall 2' in client.get('/venues/2').data
+    rename_behind_the_cache(app, 1, 'Quiet Hall')
+    rename_behind_the_cache(app, 2, 'Other Hall')
+    # served from the cache until a write invalidates them
+    assert b'Hall 1' in client.get('/venues/1').data
+    with app.test_request_context('/', method='POST', data={"name": 'Loud Hall'}):
+        original = json.loads(snapshot(VenueForm(request.form), EDIT_FIELDS))
+    original['name'] = 'Quiet Hall'
+    client.post('/venues/1/edit', data={"name": 'Loud Hall', "version": 1, "original": json.dumps(original)})
+    assert b'Loud Hall' in client.get('/venues/1').data
+    # venue:2 was not touched by the edit
+    assert b'Hall 2' in client.get('/venues/2').data
+
+
+def test_if_none_match_gets_304(app):
+    client = app.test_client()
+    first = client.get('/venues/1')
+    assert first.status_code == 200 and first.headers['ETag']
+    again = client.get('/venues/1', headers={"If-None-Match": first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.data == b''
+
+
+def test_apps_do_not_share_pages(tmp_path):
+    one, other = make_app(tmp_path, 'one.db'), make_app(tmp_path, 'other.db')
+    assert b'Hall 1' in one.test_client().get('/venues/1').data
+    rename_behind_the_cache(other, 1, 'Other Hall')
+    assert b'Other Hall' in other.test_client().get('/venues/1').data
+    assert one.extensions['page_cache'] is not other.extensions['page_cache']
+
+
+def test_expired_entry_is_dropped():
+    store = PageStore(max_bytes=100, ttl=60)
+    store.put('fresh', entry(b'fresh'), store.generation)
+    store.put('old', entry(b'old', ttl=-1), store.generation)
+    assert store.get('fresh').body == b'fresh'
+    assert store.get('old') is None
+
+
+def test_byte_limit_evicts_least_recently_used():
+    store = PageStore(max_bytes=10, ttl=60)
+    for key in ('a', 'b'):
+        store.put(key, entry(b'1234'), store.generation)
+    store.get('a')
+    store.put('c', entry(b'1234'), store.generation)
+    assert [key for key in 'abc' if store.get(key) is not None] == ['a', 'c']
+    # a page larger than the whole cache is not kept
+    store.put('d', entry(b'x' * 11), store.generation)
+    assert store.get('d') is None
+
+
+def test_page_rendered_before_an_invalidation_is_not_stored():
+    store = PageStore(max_bytes=100, ttl=60)
+    generation = store.generation
+    store.invalidate('venue:1')
+    store.put('/venues/1', entry(b'old', tags={'venue:1'}), generation)
+    assert store.get('/venues/1') is None
+    store.put('/venues/1', entry(b'new', tags={'venue:1'}), store.generation)
+    assert store.get('/venues/1').body == b'new'
+
+
+def test_invalidate_drops_only_tagged_entries():
+    store = PageStore(max_bytes=100, ttl=60)
+    store.put('/venues/1', entry(b'one', tags={'venue:1', 'venues'}), store.generation)
+    store.put('/venues/2', entry(b'two', tags={'venue:2'}), store.generation)
+    store.invalidate('venue:1')
+    assert store.get('/venues/1') is None
+    assert store.get('/venues/2').body == b'two'
@@ -0,0 +1,126 @@
+import io
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+from flask import request
+from sqlalchemy import func
+
+import stats
+from app import create_app
+from archive import archive_shows
+from bulk_import import import_rows, read_rows
+from database import db
+from edits import snapshot
+from forms import ArtistForm
+from genres import GENRE_IDS
+from models.models import (Artist, ArtistGenre, Show, ShowArchive, StatsGenreMonth, StatsTotal,
+                           StatsVenueBookings, Venue)
+from views.artists import EDIT_FIELDS
+
+NOW = datetime.now().replace(hour=20, minute=0, second=0, microsecond=0)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": 'sqlite:///' + str(tmp_path / 'fyyur.db'),
+        "WTF_CSRF_ENABLED": False,
+        "JOB_WORKERS": 0,
+        "TESTING": True,
+    })
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Venue(id=venue_id, name='Hall %d' % venue_id, city='Austin', state='TX')
+                            for venue_id in (1, 2)])
+        for artist_id, genre in ((1, 'Jazz'), (2, 'Rock n Roll')):
+            db.session.add(Artist(id=artist_id, name='Band %d' % artist_id, city='Austin', state='TX'))
+            db.session.add(ArtistGenre(artist_id=artist_id, genre_id=GENRE_IDS[genre]))
+        db.session.commit()
+        stats.rebuild()
+        yield app
+        db.session.remove()
+
+
+def recount():
+    # the rollups computed from scratch: GROUP BY over Show and Show_archive
+    venues, months = {}, {}
+    for model in (Show, ShowArchive):
+        for venue_id, count in db.session.query(model.venue_id, func.count()).group_by(model.venue_id):
+            venues[venue_id] = venues.get(venue_id, 0) + count
+        month = func.strftime('%Y-%m-01', model.start_time)
+        for genre_id, start, count in db.session.query(ArtistGenre.genre_id, month, func.count()) \
+                .join(model, model.artist_id == ArtistGenre.artist_id).group_by(ArtistGenre.genre_id, month):
+            key = (genre_id, date.fromisoformat(start))
+            months[key] = months.get(key, 0) + count
+    totals = {"artists": Artist.query.count(),
+              "artists_seeking_venue": Artist.query.filter(Artist.seeking_venue.is_(True)).count()}
+    return venues, months, totals
+
+
+def rollups():
+    venues = {venue_id: count for venue_id, count in db.session.query(
+        StatsVenueBookings.venue_id, StatsVenueBookings.show_count) if count}
+    months = {(genre_id, month): count for genre_id, month, count in db.session.query(
+        StatsGenreMonth.genre_id, StatsGenreMonth.month, StatsGenreMonth.show_count) if count}
+    totals = dict(db.session.query(StatsTotal.name, StatsTotal.value))
+    return venues, months, totals
+
+
+def create_show(client, venue_id, artist_id, start_time):
+    response = client.post('/shows/create', data={
+        "venue_id": str(venue_id), "artist_id": str(artist_id), "start_time": start_time.isoformat(), "duration": '60'})
+    assert b'Show was successfully listed!' in response.data
+
+
+def edit_artist(app, client, artist_id, old, new):
+    # posts an artist edit changing only the fields in `new`
+    with app.test_request_context('/', method='POST', data=new):
+        original = json.loads(snapshot(ArtistForm(request.form), EDIT_FIELDS))
+    original.update(old)
+    version = db.session.query(Artist.version).filter(Artist.id == artist_id).scalar()
+    response = client.post('/artists/%d/edit' % artist_id,
+                           data=dict(new, version=version, original=json.dumps(original)))
+    assert response.status_code == 302
+
+
+def test_rollups_match_a_recount_after_writes(app):
+    client = app.test_client()
+    # shows from the form, in several months, past and upcoming
+    for days, venue_id, artist_id in ((-400, 1, 1), (-370, 2, 1), (-365, 1, 2), (-3, 2, 2), (10, 1, 1), (40, 2, 2)):
+        create_show(client, venue_id, artist_id, NOW + timedelta(days=days))
+    # imported shows reach the rollups at the next catch-up
+    rows = [{"venue_id": 2, "artist_id": 1, "start_time": (NOW + timedelta(days=days, hours=2)).isoformat()}
+            for days in (-200, -30, 70)]
+    import_rows('shows', read_rows(io.StringIO(''.join(json.dumps(row) + '\n' for row in rows)), 'ndjson'))
+    assert stats.catch_up() == 3
+
+    # a genre change moves the artist's shows, archived or not, between genres
+    archive_shows()
+    assert db.session.query(ShowArchive).count() > 0
+    edit_artist(app, client, 1, {"genres": ['Jazz']}, {"genres": ['Blues', 'Folk']})
+    edit_artist(app, client, 2, {"genres": ['Rock n Roll'], "seeking_venue": False},
+                {"genres": ['Rock n Roll', 'Jazz'], "seeking_venue": 'y'})
+    # and back again, for one of the genres
+    edit_artist(app, client, 1, {"genres": ['Blues', 'Folk']}, {"genres": ['Folk']})
+    create_show(client, 1, 2, NOW + timedelta(days=12))
+
+    db.session.expire_all()
+    assert rollups() == recount()
+    venues, months, totals = recount()
+    assert sum(venues.values()) == 10
+    assert totals == {"artists": 2, "artists_seeking_venue": 1}
+
+
+def test_rebuild_matches_a_recount(app):
+    client = app.test_client()
+    for days in (-400, -50, 5):
+        create_show(client, 1, 1, NOW + timedelta(days=days))
+    archive_shows()
+    # drift the rollups, then start over
+    stats.add_totals({'artists': 5})
+    stats.add_shows([(2, 2, NOW)])
+    db.session.commit()
+    assert rollups() != recount()
+    stats.rebuild()
+    assert rollups() == recount()
@@ -0,0 +1,160 @@
+import http.server
+import socket
+import threading
+
+import pytest
+
+import thumbnails
+from thumbnails import FetchError, download
+
+
+class Server:
+    # a local HTTP server answering every GET with `respond(path)`
+
+    def __init__(self, host, respond):
+        self.hits = []
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(handler):
+                self.hits.append(handler.path)
+                status, headers, body = respond(handler.path)
+                handler.send_response(status)
+                for name, value in headers.items():
+                    handler.send_header(name, value)
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer((host, 0), Handler)
+        self.host, self.port = self.httpd.server_address[:2]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def url(self, path='/'):
+        return 'http://{0}:{1}{2}'.format(self.host, self.port, path)
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def image(path):
+    return 200, {}, b'image bytes'
+
+
+@pytest.fixture
+def internal():
+    # stands in for an internal service; 127.0.0.2 is refused in these tests
+    server = Server('127.0.0.2', image)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def refuse_internal(monkeypatch):
+    # 127.0.0.1 plays the public image host, 127.0.0.2 the private network
+    monkeypatch.setattr(thumbnails, '_refused', lambda address: str(address) == '127.0.0.2')
+
+
+def test_private_address_is_refused(internal):
+    with pytest.raises(FetchError):
+        download(internal.url('/secret'), 5, 1024)
+    assert internal.hits == []
+
+
+def test_redirect_to_refused_address_is_not_followed(refuse_internal, internal):
+    public = Server('127.0.0.1', lambda path: (302, {"Location": internal.url('/secret')}, b''))
+    try:
+        with pytest.raises(FetchError, match='refusing'):
+            download(public.url('/image.jpg'), 5, 1024)
+    finally:
+        public.close()
+    assert public.hits == ['/image.jpg']
+    assert internal.hits == []
+
+
+def test_redirect_to_allowed_address_is_followed(refuse_internal):
+    public = Server('127.0.0.1', lambda path: (302, {"Location": '/moved.jpg'}, b'') if path == '/image.jpg'
+                    else image(path))
+    try:
+        assert download(public.url('/image.jpg'), 5, 1024) == b'image bytes'
+    finally:
+        public.close()
+    assert public.hits == ['/image.jpg', '/moved.jpg']
+
+
+def test_host_is_resolved_once(refuse_internal, internal, monkeypatch):
+    # a name that resolves to a public address when checked and to an
+    # internal one afterwards (DNS rebinding) is fetched from the first
+    public = Server('127.0.0.1', image)
+    lookups = []
+
+    def getaddrinfo(host, port, *args, **kw):
+        lookups.append(host)
+        target = public if len(lookups) == 1 else internal
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (target.host, target.port))]
+
+    monkeypatch.setattr(thumbnails.socket, 'getaddrinfo', getaddrinfo)
+    try:
+        assert download('http://images.example.test/image.jpg', 5, 1024) == b'image bytes'
+    finally:
+        public.close()
+    assert lookups == ['images.example.test']
+    assert internal.hits == []
+
+
+def test_oversized_image_is_refused(monkeypatch):
+    server = Server('127.0.0.1', lambda path: (200, {}, b'x' * 2048))
+    try:
+        with pytest.raises(FetchError, match='larger'):
+            download(server.url('/big.jpg'), 5, 1024, allow_private=True)
+    finally:
+        server.close()
+
+
+def test_waiter_keeps_a_newer_fetch_single_flight(tmp_path, monkeypatch):
+    # every fetch fails, and retry=True makes each request that gets the lock
+    # download again, so the order of downloads shows who held which lock
+    cache = thumbnails.ThumbnailCache(str(tmp_path))
+    key = 'ab' * 20
+    released = [threading.Event() for _ in range(4)]
+    downloads = []
+
+    def download(image_link, *args):
+        downloads.append(image_link)
+        released[len(downloads) - 1].wait(5)
+        raise FetchError('offline')
+    monkeypatch.setattr(thumbnails, 'download', download)
+
+    def wait_for(count):
+        for _ in range(500):
+            if len(downloads) >= count:
+                return
+            threading.Event().wait(0.01)
+        raise AssertionError('no download {0}'.format(count))
+
+    def fetch():
+        thread = threading.Thread(target=lambda: pytest.raises(FetchError, cache.fetch, key, 'http://x', 'sm', 'jpeg', True))
+        thread.start()
+        return thread
+
+    first = fetch()
+    wait_for(1)
+    waiter = fetch()
+    threading.Event().wait(0.1)     # queued on the first request's lock
+    released[0].set()
+    wait_for(2)                     # the waiter's turn
+    newer = fetch()                 # arrives after the first finished
+    wait_for(3)
+    lock = cache._fetching.get(key)
+    assert lock is not None
+    released[1].set()
+    waiter.join(5)
+    # the waiter leaving must not drop the newer fetch's lock
+    assert cache._fetching.get(key) is lock
+    released[2].set()
+    released[3].set()
+    for thread in (first, newer):
+        thread.join(5)
+    assert cache._fetching == {}
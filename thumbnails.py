@@ -0,0 +1,369 @@
+import functools
+import hashlib
+import http.client
+import io
+import ipaddress
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+from flask import Blueprint, abort, current_app, redirect, request, send_file, url_for
+
+from database import db
+from db_routing import reads_from_replica
+from jobs import enqueue, job
+from models.models import Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Image thumbnails.
+#----------------------------------------------------------------------------#
+
+# /thumbs/<kind>/<id>/<size>?v=<key> serves a venue's or artist's image_link
+# from a local disk cache, resized to fit SIZES and encoded as WebP (for
+# clients that accept it) or JPEG. The first request for an image fetches it
+# once and writes every size and format; concurrent requests for the same image
+# wait for that fetch rather than starting their own. `v` is a hash of the
+# image_link, so cache hits need no query, and a new link gets a new URL.
+#
+# The cache is bounded by THUMBNAIL_CACHE_MAX_BYTES; least recently served
+# files go first. Images that cannot be fetched redirect to image_link, and
+# are retried after THUMBNAIL_RETRY_SECONDS. Links to private and loopback
+# addresses are refused, on every redirect too, unless THUMBNAIL_ALLOW_PRIVATE
+# is set (for tests against a local server).
+#
+# The venue and artist create and edit handlers call prefetch() for new
+# image_links, so a background job usually fetches an image before anyone
+# asks for it.
+
+# name -> longest side in pixels; 'tile' fits show tiles (200px high) at 2x
+SIZES = {
+    'tile': 400,
+    'detail': 1000,
+}
+
+# format -> (file extension, mimetype, Pillow save options)
+FORMATS = {
+    'webp': ('webp', 'image/webp', {"quality": 80, "method": 4}),
+    'jpeg': ('jpg', 'image/jpeg', {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+MODELS = {'artist': Artist, 'venue': Venue}
+
+bp = Blueprint('thumbnails', __name__)
+
+
+class FetchError(Exception):
+    pass
+
+
+@functools.lru_cache(maxsize=None)
+def pillow():
+    # PIL.Image, imported on first use (it is slow to import); None when
+    # Pillow is not installed, in which case images are cached but not resized
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+def image_key(image_link):
+    return hashlib.sha256(image_link.encode('utf-8')).hexdigest()[:24]
+
+
+def thumbnail_url(kind, item_id, image_link, size='tile'):
+    # for templates: {{ thumbnail_url('artist', show.artist_id, show.artist_image_link) }}
+    if not image_link:
+        return ''
+    return url_for('thumbnails.thumbnail', kind=kind, item_id=item_id, size=size, v=image_key(image_link))
+
+
+class ThumbnailCache:
+
+    def __init__(self, directory=None, max_bytes=256 * 1024 * 1024):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), 'fyyur-thumbnails')
+        self.max_bytes = max_bytes
+        self.fetch_timeout = 5
+        self.max_source_bytes = 10 * 1024 * 1024
+        self.retry_seconds = 300
+        self.allow_private = False
+        self._lock = threading.Lock()
+        self._fetching = {}     # key -> Lock held while that image is fetched
+        self._failed = {}       # key -> monotonic time of the last failed fetch
+        self._size = None       # bytes on disk, counted on first write
+
+    def path(self, key, size, format):
+        return os.path.join(self.directory, key[:2], '{0}-{1}.{2}'.format(key, size, FORMATS[format][0]))
+
+    def get(self, key, size, format):
+        path = self.path(key, size, format)
+        try:
+            os.utime(path)  # mark as recently served for eviction
+        except FileNotFoundError:
+            return None
+        return path
+
+    def fetch(self, key, image_link, size, format, retry=False):
+        # path of the thumbnail, fetching the image if needed; raises FetchError.
+        # An image that failed recently is only fetched again with retry.
+        with self._lock:
+            fetching = self._fetching.get(key)
+            created = fetching is None
+            if created:
+                fetching = self._fetching[key] = threading.Lock()
+        try:
+            with fetching:
+                # another request may have fetched it while this one waited
+                path = self.get(key, size, format)
+                if path is not None:
+                    return path
+                with self._lock:
+                    failed_at = self._failed.get(key)
+                if not retry and failed_at is not None and time.monotonic() - failed_at < self.retry_seconds:
+                    raise FetchError('failed recently')
+                try:
+                    self._store(key, download(image_link, self.fetch_timeout, self.max_source_bytes,
+                                              self.allow_private))
+                except FetchError:
+                    with self._lock:
+                        self._failed[key] = time.monotonic()
+                    raise
+        finally:
+            # only by the request that added the lock: a waiter still draining
+            # must not drop the lock of a newer fetch of the same image
+            if created:
+                with self._lock:
+                    if self._fetching.get(key) is fetching:
+                        del self._fetching[key]
+        return self.path(key, size, format)
+
+    def _store(self, key, data):
+        written = 0
+        for size, pixels in SIZES.items():
+            for format in (FORMATS if pillow() is not None else ('jpeg',)):
+                body = render(data, pixels, format)
+                path = self.path(key, size, format)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                partial = '{0}.{1}.tmp'.format(path, threading.get_ident())
+                with open(partial, 'wb') as f:
+                    f.write(body)
+                os.replace(partial, path)
+                written += len(body)
+        with self._lock:
+            if self._size is None:
+                self._size = self._disk_usage()
+            else:
+                self._size += written
+            if self._size > self.max_bytes:
+                self._size = self._evict(int(self.max_bytes * 0.9), keep=key)
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def _disk_usage(self):
+        return sum(size for _, size, _ in self._files())
+
+    def _evict(self, target, keep):
+        # deletes least recently served files until the cache fits in `target`,
+        # sparing the image `keep` that is about to be served
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= target:
+                break
+            if os.path.basename(path).startswith(keep):
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        return total
+
+
+def _refused(address):
+    # addresses images are never fetched from unless allow_private
+    return address.is_private or address.is_loopback or address.is_link_local or address.is_reserved
+
+
+def _check_host(url, allow_private):
+    # resolves the host of an http(s) URL once and returns its addresses as
+    # (family, sockaddr), all checked unless allow_private. The fetch
+    # connects to these, so the name cannot resolve somewhere else in between.
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise FetchError('not an http(s) URL')
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        infos = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError, ValueError) as error:
+        raise FetchError(str(error))
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%')[0])
+        if not allow_private and _refused(address):
+            raise FetchError('refusing to fetch from {0}'.format(address))
+    return [(info[0], info[4]) for info in infos]
+
+
+def _connect(addresses, timeout):
+    error = None
+    for family, address in addresses:
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(timeout)
+            sock.connect(address)
+            return sock
+        except OSError as failure:
+            sock.close()
+            error = failure
+    raise error or OSError('no address')
+
+
+class _PinnedHTTPConnection(http.client.HTTPConnection):
+    # connects to addresses checked by _check_host instead of resolving again
+
+    def __init__(self, *args, addresses, **kw):
+        super().__init__(*args, **kw)
+        self.addresses = addresses
+
+    def connect(self):
+        self.sock = _connect(self.addresses, self.timeout)
+
+
+class _PinnedHTTPSConnection(http.client.HTTPSConnection):
+
+    def __init__(self, *args, addresses, **kw):
+        super().__init__(*args, **kw)
+        self.addresses = addresses
+
+    def connect(self):
+        # the certificate is still checked against the host name
+        self.sock = self._context.wrap_socket(_connect(self.addresses, self.timeout), server_hostname=self.host)
+
+
+class _PinnedHTTPHandler(urllib.request.HTTPHandler):
+
+    def http_open(self, req):
+        return self.do_open(_PinnedHTTPConnection, req, addresses=req.addresses)
+
+
+class _PinnedHTTPSHandler(urllib.request.HTTPSHandler):
+
+    def https_open(self, req):
+        return self.do_open(_PinnedHTTPSConnection, req, context=self._context, addresses=req.addresses)
+
+
+class _CheckedRedirectHandler(urllib.request.HTTPRedirectHandler):
+    # every redirect target is checked (and resolved) like the first URL
+    max_redirections = 5
+
+    def __init__(self, allow_private):
+        super().__init__()
+        self.allow_private = allow_private
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        addresses = _check_host(newurl, self.allow_private)
+        redirected = super().redirect_request(req, fp, code, msg, headers, newurl)
+        if redirected is not None:
+            redirected.addresses = addresses
+        return redirected
+
+
+def download(url, timeout, max_bytes, allow_private=False):
+    fetch = urllib.request.Request(url, headers={"User-Agent": 'Fyyur thumbnailer'})
+    fetch.addresses = _check_host(url, allow_private)
+    # no proxies from the environment: the checked addresses are the ones used
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}), _PinnedHTTPHandler(),
+                                         _PinnedHTTPSHandler(), _CheckedRedirectHandler(allow_private))
+    try:
+        with opener.open(fetch, timeout=timeout) as response:
+            data = response.read(max_bytes + 1)
+    except (OSError, ValueError, http.client.HTTPException) as error:
+        raise FetchError(str(error))
+    if len(data) > max_bytes:
+        raise FetchError('image larger than {0} bytes'.format(max_bytes))
+    return data
+
+
+def render(data, pixels, format):
+    # `data` resized to fit pixels x pixels and encoded as `format`
+    Image = pillow()
+    if Image is None:
+        return data
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.draft('RGB', (pixels, pixels))  # JPEG: decode at a reduced scale
+        image = image.convert('RGB')
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        raise FetchError('not an image: {0}'.format(error))
+    image.thumbnail((pixels, pixels), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format.upper(), **FORMATS[format][2])
+    return buffer.getvalue()
+
+
+thumbnail_cache = ThumbnailCache()
+
+
+def prefetch(image_link):
+    # enqueues the fetch of a new image_link; the caller commits. Keyed on the
+    # image, so a link shared by many venues or artists is fetched once.
+    if image_link:
+        enqueue('thumbnails.prefetch', {"image_link": image_link}, key='thumbnail:' + image_key(image_link))
+
+
+@job('thumbnails.prefetch')
+def prefetch_thumbnail(image_link):
+    # raises FetchError, so unreachable images are retried with the job's backoff
+    key = image_key(image_link)
+    if thumbnail_cache.get(key, 'tile', 'jpeg') is None:
+        thumbnail_cache.fetch(key, image_link, 'tile', 'jpeg', retry=True)
+
+
+@bp.route('/thumbs/<any(artist, venue):kind>/<int:item_id>/<size>')
+@reads_from_replica
+def thumbnail(kind, item_id, size):
+    if size not in SIZES:
+        return abort(404)
+    format = 'webp' if pillow() is not None and request.accept_mimetypes['image/webp'] else 'jpeg'
+    key = request.args.get('v', '')
+    path = thumbnail_cache.get(key, size, format) if re.fullmatch('[0-9a-f]{24}', key) else None
+    if path is None:
+        model = MODELS[kind]
+        image_link = db.session.query(model.image_link).filter(model.id == item_id).scalar()
+        if not image_link:
+            return abort(404)
+        key = image_key(image_link)
+        try:
+            path = thumbnail_cache.get(key, size, format) or thumbnail_cache.fetch(key, image_link, size, format)
+        except FetchError as error:
+            current_app.logger.info('Thumbnail for %s %d failed: %s', kind, item_id, error)
+            return redirect(image_link)
+    response = send_file(path, mimetype=FORMATS[format][1], conditional=True,
+                         max_age=current_app.config['THUMBNAIL_MAX_AGE'])
+    response.cache_control.public = True
+    response.vary.add('Accept')
+    return response
+
+
+def init_app(app):
+    app.config.setdefault('THUMBNAIL_MAX_AGE', 30 * 24 * 3600)
+    thumbnail_cache.directory = app.config.get('THUMBNAIL_CACHE_DIR') or thumbnail_cache.directory
+    thumbnail_cache.max_bytes = app.config.get('THUMBNAIL_CACHE_MAX_BYTES', thumbnail_cache.max_bytes)
+    thumbnail_cache.fetch_timeout = app.config.get('THUMBNAIL_FETCH_TIMEOUT', thumbnail_cache.fetch_timeout)
+    thumbnail_cache.retry_seconds = app.config.get('THUMBNAIL_RETRY_SECONDS', thumbnail_cache.retry_seconds)
+    thumbnail_cache.allow_private = app.config.get('THUMBNAIL_ALLOW_PRIVATE', False)
+    app.register_blueprint(bp)
+    app.jinja_env.globals['thumbnail_url'] = thumbnail_url
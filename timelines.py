@@ -0,0 +1,77 @@
+from datetime import datetime
+
+from flask import current_app, request
+
+from database import db
+from datetime_format import format_datetime
+from thumbnails import thumbnail_url
+from models.models import Venue, Artist, Show, ShowArchive
+from pagination import keyset_page, keyset_union_page
+
+#----------------------------------------------------------------------------#
+# Show timelines.
+#----------------------------------------------------------------------------#
+
+# Upcoming and past shows for a venue or artist page. Each section is one
+# keyset-paged query joined to the other side of the show (the artist on a
+# venue page, the venue on an artist page), so a venue with thousands of past
+# shows renders the same first page as one with five. Past sections also read
+# Show_archive, merged by keyset_union_page.
+
+SECTIONS = ('upcoming', 'past')
+
+
+def _timeline(owner_key, other, other_key, prefix, owner_id, section, cursor, limit):
+    if section not in SECTIONS:
+        raise ValueError('Unknown section: {0}'.format(section))
+
+    def query(model):
+        other_column = getattr(model, other_key)
+        return db.session.query(
+            model.id,
+            model.start_time,
+            other_column.label(prefix + '_id'),
+            other.name.label(prefix + '_name'),
+            other.image_link.label(prefix + '_image_link')
+        ).join(other, other.id == other_column).filter(getattr(model, owner_key) == owner_id)
+
+    now = datetime.now()
+    if section == 'upcoming':
+        # soonest first; upcoming shows are never archived
+        return keyset_page(query(Show).filter(Show.start_time > now), [Show.start_time, Show.id],
+                           cursor, (datetime, int), limit)
+    # most recent first, continuing into the archive
+    branches = [(query(model).filter(model.start_time <= now), [model.start_time, model.id])
+                for model in (Show, ShowArchive)]
+    return keyset_union_page(branches, cursor, (datetime, int), limit, descending=True)
+
+
+def venue_timeline(venue_id, section, cursor=None, limit=6):
+    # rows carry id, start_time, artist_id, artist_name, artist_image_link
+    return _timeline('venue_id', Artist, 'artist_id', 'artist', venue_id, section, cursor, limit)
+
+
+def artist_timeline(artist_id, section, cursor=None, limit=6):
+    # rows carry id, start_time, venue_id, venue_name, venue_image_link
+    return _timeline('artist_id', Venue, 'venue_id', 'venue', artist_id, section, cursor, limit)
+
+
+def show_tiles(rows, display=False):
+    # timeline rows -> template/JSON dicts; `display` adds the formatted date
+    # and thumbnail URL so "load more" tiles match the server-rendered ones
+    tiles = []
+    for row in rows:
+        tile = row._asdict()
+        if display:
+            tile["start_time"] = str(row.start_time)
+            tile["start_time_display"] = format_datetime(row.start_time, 'full')
+            kind = 'artist' if 'artist_id' in tile else 'venue'
+            tile[kind + "_thumbnail"] = thumbnail_url(kind, tile[kind + '_id'], tile[kind + '_image_link'])
+        tiles.append(tile)
+    return tiles
+
+
+def timeline_limit():
+    # ?limit= on the "load more" endpoints
+    limit = request.args.get('limit', current_app.config['TIMELINE_PAGE_SIZE'], type=int)
+    return max(1, min(limit, 50))
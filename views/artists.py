@@ -0,0 +1,220 @@
+import errno
+
+from flask import Blueprint, abort, current_app, flash, jsonify, redirect, render_template, request, url_for
+from sqlalchemy import or_
+
+from database import db
+from db_routing import reads_from_replica
+from edits import EditConflict, changes, parse_snapshot, save_edit, snapshot
+from forms import ArtistForm
+from genres import GENRES, GENRE_IDS, genre_ids
+from letter_index import LETTERS, artist_letters
+from models.models import Artist, Show, ArtistGenre, name_key
+from page_cache import page_cache
+from pagination import keyset_page
+from search import artist_search, prefix_lookup
+from show_counts import current_counts
+from stats import artist_changed, record_artist
+from thumbnails import prefetch
+from timelines import artist_timeline, show_tiles, timeline_limit
+
+bp = Blueprint('artists', __name__)
+
+# ArtistForm fields the edit form writes back
+EDIT_FIELDS = ('name', 'city', 'state', 'phone', 'genres', 'facebook_link', 'image_link', 'website_link',
+               'seeking_venue', 'seeking_description')
+
+#  Artists
+#  ----------------------------------------------------------------
+@bp.route('/artists')
+@page_cache.cached('artists')
+@reads_from_replica
+def artists():
+  # Sorted alphabetically, ignoring case, and paged by keyset on
+  # (name_key(name), id), so every page is a bounded range scan of
+  # ix_Artist_name_key_id. ?letter=B jumps to the first name at or after b;
+  # ?letter=# lists the names letter_of() files under '#', which sort before
+  # 'a' (digits, punctuation) or after 'z' (non-ASCII).
+  key = name_key(Artist.name).label('name_key')
+  query = db.session.query(Artist.id, Artist.name, key).filter(Artist.name.isnot(None))
+  genre = request.args.get('genre')
+  if genre:
+    if genre not in GENRE_IDS:
+      return abort(404)
+    # answered from the Artist_Genre primary key index
+    query = query.join(ArtistGenre, ArtistGenre.artist_id == Artist.id).filter(ArtistGenre.genre_id == GENRE_IDS[genre])
+  letter = request.args.get('letter')
+  if letter:
+    if letter not in LETTERS:
+      return abort(404)
+    if letter == '#':
+      query = query.filter(or_(key < 'a', key >= chr(ord('z') + 1)))
+    else:
+      query = query.filter(key >= letter.lower())
+  try:
+    artists, next_cursor = keyset_page(query, [key, Artist.id], request.args.get('after'),
+                                       (str, int), current_app.config['ARTISTS_PER_PAGE'])
+  except ValueError:
+    return abort(400)
+  # the jump bar counts all artists, so it is only shown without a genre
+  letters = None if genre else artist_letters.counts()
+  return render_template('pages/artists.html', artists=artists, genres=GENRES, genre=genre,
+                         letters=letters, letter=letter, next_cursor=next_cursor)
+
+@bp.route('/artists/search', methods=['POST'])
+@reads_from_replica
+def search_artists():
+  search_term = request.form['search_term']
+  # ranked, typo tolerant match on name, city, state and genres
+  search_result = artist_search.search(search_term, limit=current_app.config['SEARCH_RESULT_LIMIT'])
+
+  response={
+    "count": len(search_result),
+    "data": search_result
+  }
+
+  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+
+@bp.route('/artists/search.json')
+@reads_from_replica
+def search_artists_json():
+  # typeahead: /artists/search.json?q=<term>&limit=<n>
+  limit = min(request.args.get('limit', 10, type=int), current_app.config['SEARCH_RESULT_LIMIT'])
+  return jsonify(artist_search.search(request.args.get('q', ''), limit=max(limit, 1)))
+
+@bp.route('/artists/lookup.json')
+@reads_from_replica
+def lookup_artists_json():
+  # pickers: /artists/lookup.json?q=<name prefix>&limit=<n>, in name order
+  limit = min(request.args.get('limit', 10, type=int), current_app.config['SEARCH_RESULT_LIMIT'])
+  rows = prefix_lookup(Artist, [Artist.id, Artist.name], request.args.get('q', ''), max(limit, 1))
+  return jsonify([dict(row._mapping) for row in rows])
+
+@bp.route('/artists/<int:artist_id>')
+@page_cache.cached('artist:{artist_id}')
+@reads_from_replica
+def show_artist(artist_id):
+  artist = Artist.query.filter_by(id=artist_id).first()
+  if artist is None:
+    return abort(404)
+  # stored counters, or one conditional-aggregate query when they are stale
+  upcoming_shows_count, past_shows_count = current_counts(artist, Show.artist_id)
+  # first page of each timeline; the rest comes from artist_shows below
+  limit = current_app.config['TIMELINE_PAGE_SIZE']
+  upcoming_shows, upcoming_cursor = artist_timeline(artist_id, 'upcoming', limit=limit)
+  past_shows, past_cursor = artist_timeline(artist_id, 'past', limit=limit)
+  page_cache.tag(*{'venue:%d' % show.venue_id for show in upcoming_shows + past_shows})
+
+  return render_template('pages/show_artist.html', artist=artist,
+                         upcoming_shows_count=upcoming_shows_count, past_shows_count=past_shows_count,
+                         upcoming_shows=show_tiles(upcoming_shows), upcoming_cursor=upcoming_cursor,
+                         past_shows=show_tiles(past_shows), past_cursor=past_cursor)
+
+@bp.route('/artists/<int:artist_id>/shows')
+@page_cache.cached('artist:{artist_id}')
+@reads_from_replica
+def artist_shows(artist_id):
+  # "load more": /artists/<id>/shows?section=upcoming|past&after=<cursor>
+  try:
+    rows, next_cursor = artist_timeline(artist_id, request.args.get('section', 'upcoming'),
+                                        request.args.get('after'), timeline_limit())
+  except ValueError:
+    return abort(400)
+  page_cache.tag(*{'venue:%d' % show.venue_id for show in rows})
+  return jsonify({"shows": show_tiles(rows, display=True), "next": next_cursor})
+
+#  Update
+#  ----------------------------------------------------------------
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  artist = Artist.query.filter_by(id=artist_id).first()
+  if artist is None:
+    return abort(404)
+  form = ArtistForm(obj=artist) # populate form with query data
+  return render_template('forms/edit_artist.html', form=form, artist=artist, original=snapshot(form, EDIT_FIELDS))
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    # one conditional UPDATE of the changed columns, see edits.py
+    form = ArtistForm(request.form)
+    original = parse_snapshot(request.form.get('original'))
+    values = changes(form, EDIT_FIELDS, original)
+    if values:
+        try:
+            # the stats rollups need the seeking_venue and genres being
+            # replaced: from the snapshot, or read first for older forms
+            old = original if original is not None else {}
+            old_seeking = new_seeking = None
+            if 'seeking_venue' in values:
+                new_seeking = values['seeking_venue']
+                old_seeking = old['seeking_venue'] if 'seeking_venue' in old else \
+                    db.session.query(Artist.seeking_venue).filter(Artist.id == artist_id).scalar()
+            old_genres = new_genres = ()
+            if 'genres' in values:
+                new_genres = genre_ids(values['genres'])
+                old_genres = genre_ids(old['genres']) if 'genres' in old else \
+                    [genre_id for genre_id, in db.session.query(ArtistGenre.genre_id).filter(ArtistGenre.artist_id == artist_id)]
+            save_edit(Artist, artist_id, request.form.get('version', type=int), values,
+                      (ArtistGenre, ArtistGenre.artist_id), old.get('genres'))
+            artist_changed(artist_id, old_seeking, new_seeking, old_genres, new_genres)
+            if 'image_link' in values:
+                prefetch(values['image_link'])
+            db.session.commit()
+        except EditConflict:
+            db.session.rollback()
+            # keep what this editor typed, against the version now saved, so
+            # a second submit overwrites the other edit knowingly
+            artist = Artist.query.filter_by(id=artist_id).first()
+            if artist is None:
+                return abort(404)
+            flash('Someone else changed this artist while you were editing them. '
+                  'Check their page, then save again to replace their changes with yours.')
+            return render_template('forms/edit_artist.html', form=form, artist=artist,
+                                   original=snapshot(ArtistForm(obj=artist), EDIT_FIELDS)), 409
+        artist_search.upsert(artist_id, form.name.data, form.city.data, form.state.data, form.genres.data)
+        if original is not None and 'name' in original:
+            artist_letters.rename(original['name'], form.name.data)
+        else:
+            artist_letters.invalidate()
+        page_cache.invalidate('artists', 'shows', 'stats', 'artist:%d' % artist_id)
+    return redirect(url_for('.show_artist', artist_id=artist_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  try:
+    form = ArtistForm(request.form)
+    artist = Artist(
+        name=form.name.data,
+        city=form.city.data,
+        state=form.state.data,
+        phone=form.phone.data,
+        genres=form.genres.data,
+        facebook_link=form.facebook_link.data,
+        image_link=form.image_link.data,
+        website_link = form.website_link.data,
+        seeking_description = form.seeking_description.data
+      )
+    
+    db.session.add(artist)
+    record_artist(artist.seeking_venue)
+    prefetch(artist.image_link)
+    db.session.commit()
+    artist_search.upsert(artist.id, artist.name, artist.city, artist.state, artist.genres)
+    artist_letters.add(artist.name)
+    page_cache.invalidate('artists', 'stats')
+    flash('Artist: {0} created successfully'.format(artist.name))
+    return redirect(url_for('.show_artist', artist_id=artist.id))
+  except:
+    db.session.rollback()
+    flash('An error occurred creating the Artist: {0}. Error: {1}'.format(artist.name, errno))
+    return redirect(url_for('pages.index'))
+  finally:
+    db.session.close()
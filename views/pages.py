@@ -0,0 +1,16 @@
+from flask import Blueprint, render_template
+
+bp = Blueprint('pages', __name__)
+
+
+@bp.route('/')
+def index():
+  return render_template('pages/home.html')
+
+@bp.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+@bp.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
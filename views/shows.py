@@ -0,0 +1,132 @@
+from datetime import datetime
+
+from flask import Blueprint, abort, current_app, flash, render_template, request
+from sqlalchemy.exc import IntegrityError
+
+from bookings import BookingError, conflicts, end_time_for
+from database import db
+from datetime_format import parse_datetime
+from db_routing import reads_from_replica
+from forms import ShowForm
+from archive import reaches_archive
+from models.models import Venue, Artist, Show, ShowArchive
+from page_cache import page_cache
+from pagination import keyset_page, keyset_union_page
+from show_counts import record_new_show
+from stats import record_show
+
+bp = Blueprint('shows', __name__)
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@bp.route('/shows')
+@page_cache.cached('shows')
+@reads_from_replica
+def shows():
+  # displays list of shows at /shows
+  # One joined query fetches only the columns a show tile needs, paged by
+  # keyset on (start_time, id) so deep pages cost the same as the first one.
+  # Unless the filters start after archive.horizon(), Show_archive is read
+  # alongside Show and merged by keyset_union_page.
+  def query(model):
+    return db.session.query(
+        model.id,
+        model.start_time,
+        model.venue_id,
+        Venue.name.label('venue_name'),
+        model.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')
+      ).join(Venue, Venue.id == model.venue_id
+      ).join(Artist, Artist.id == model.artist_id
+      ).filter(model.start_time.isnot(None))
+
+  try:
+    upcoming = bool(request.args.get('upcoming'))
+    start = parse_datetime(request.args['from']) if request.args.get('from') else None
+    until = parse_datetime(request.args['to']) if request.args.get('to') else None
+    branches = []
+    for model in ((Show, ShowArchive) if not upcoming and reaches_archive(start) else (Show,)):
+      branch = query(model)
+      if upcoming:
+        branch = branch.filter(model.start_time > datetime.now())
+      if start is not None:
+        branch = branch.filter(model.start_time >= start)
+      if until is not None:
+        branch = branch.filter(model.start_time < until)
+      branches.append((branch, [model.start_time, model.id]))
+    if len(branches) == 1:
+      rows, next_cursor = keyset_page(branches[0][0], branches[0][1], request.args.get('after'),
+                                      (datetime, int), current_app.config['SHOWS_PER_PAGE'])
+    else:
+      rows, next_cursor = keyset_union_page(branches, request.args.get('after'),
+                                            (datetime, int), current_app.config['SHOWS_PER_PAGE'])
+  except (TypeError, ValueError, OverflowError):
+    return abort(400)
+
+  data = [{
+      "venue_id": row.venue_id,
+      "venue_name": row.venue_name,
+      "artist_id": row.artist_id,
+      "artist_name": row.artist_name,
+      "artist_image_link": row.artist_image_link,
+      "start_time": row.start_time
+    } for row in rows]
+
+  # keep the active filters on the "next page" link
+  filters = {key: request.args[key] for key in ('upcoming', 'from', 'to') if request.args.get(key)}
+  return render_template('pages/shows.html', shows=data, next_cursor=next_cursor, filters=filters)
+
+@bp.route('/shows/create')
+def create_shows():
+  # renders form. The artist and venue pickers look names up as they are
+  # typed (/artists/lookup.json, /venues/lookup.json), so the page does not
+  # list the catalog.
+    form = ShowForm(duration=current_app.config['SHOW_DEFAULT_MINUTES'])
+    return render_template('forms/new_show.html', form=form)
+  
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  try:
+    artist_id = int(request.form['artist_id'])
+    venue_id = int(request.form['venue_id'])
+    start_time = parse_datetime(request.form['start_time'])
+    duration = request.form.get('duration')
+    end_time = end_time_for(start_time, int(duration) if duration else None)
+
+    # ids come from the pickers or are typed in, so check they exist
+    missing = [kind for kind, model, item_id in (('artist', Artist, artist_id), ('venue', Venue, venue_id))
+               if db.session.query(model.id).filter(model.id == item_id).scalar() is None]
+    # checked before the insert so the message can say what is in the way;
+    # on PostgreSQL the exclusion constraints also catch concurrent bookings
+    clash = None if missing else conflicts(venue_id, artist_id, start_time, end_time)
+    if missing:
+      flash('There is no {0} with that id. Show could not be listed.'.format(' or '.join(missing)))
+    elif clash:
+      booked = 'venue' if clash[0].venue_id == venue_id else 'artist'
+      flash('The {0} is already booked from {1} until {2}. Show could not be listed.'.format(
+        booked, clash[0].start_time.strftime('%Y-%m-%d %H:%M'), clash[0].end_time.strftime('%Y-%m-%d %H:%M')))
+    else:
+      show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time, end_time=end_time)
+      db.session.add(show)
+      record_new_show(show)
+      record_show(show)
+      db.session.commit()
+      page_cache.invalidate('shows', 'stats', 'venue:%s' % venue_id, 'artist:%s' % artist_id)
+      flash('Show was successfully listed!')
+  except BookingError as error:
+    flash('{0}. Show could not be listed.'.format(error))
+  except IntegrityError as error:
+    db.session.rollback()
+    if '_no_overlap' in str(error.orig):
+      flash('The venue or the artist was just booked for that time. Show could not be listed.')
+    else:
+      flash('An error occurred. Show could not be listed.')
+  except:
+    db.session.rollback()
+    flash('An error occurred. Show could not be listed.')
+  finally:
+    db.session.close()
+    return render_template('pages/home.html')
@@ -0,0 +1,47 @@
+from datetime import date
+
+from flask import Blueprint, current_app, render_template
+
+from database import db
+from db_routing import reads_from_replica
+from genres import GENRES
+from models.models import Venue, StatsGenreMonth, StatsTotal, StatsVenueBookings
+from page_cache import page_cache
+
+bp = Blueprint('stats', __name__)
+
+TOP_VENUES = 10
+
+#  Stats
+#  ----------------------------------------------------------------
+@bp.route('/stats')
+@page_cache.cached('stats')
+@reads_from_replica
+def stats():
+  # reads only the rollups kept by stats.py: a range of the month index, the
+  # first TOP_VENUES entries of the show_count index and two named totals
+  today = date.today()
+  months = []
+  for back in range(current_app.config['STATS_MONTHS'] - 1, -1, -1):
+    year, month = divmod(today.year * 12 + today.month - 1 - back, 12)
+    months.append(date(year, month + 1, 1))
+  counts = {}
+  for genre_id, month, show_count in db.session.query(
+      StatsGenreMonth.genre_id, StatsGenreMonth.month, StatsGenreMonth.show_count).filter(
+      StatsGenreMonth.month >= months[0], StatsGenreMonth.month <= months[-1]):
+    counts.setdefault(genre_id, {})[month] = show_count
+  genres = [{"name": GENRES[genre_id - 1], "counts": [by_month.get(month, 0) for month in months]}
+            for genre_id, by_month in sorted(counts.items(), key=lambda item: -sum(item[1].values()))]
+
+  venues = db.session.query(Venue.id, Venue.name, StatsVenueBookings.show_count) \
+    .join(Venue, Venue.id == StatsVenueBookings.venue_id) \
+    .order_by(StatsVenueBookings.show_count.desc(), StatsVenueBookings.venue_id.desc()) \
+    .limit(TOP_VENUES).all()
+
+  # one primary key lookup per total
+  artists, seeking = db.session.query(*[
+    db.session.query(StatsTotal.value).filter(StatsTotal.name == name).scalar_subquery()
+    for name in ('artists', 'artists_seeking_venue')]).one()
+  artists, seeking = artists or 0, seeking or 0
+  return render_template('pages/stats.html', months=months, genres=genres, venues=venues,
+                         artists=artists, seeking=seeking, seeking_share=seeking / artists if artists else 0)
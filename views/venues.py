@@ -0,0 +1,202 @@
+from flask import Blueprint, abort, current_app, flash, jsonify, redirect, render_template, request, url_for
+
+from area_index import area_index, group_areas
+from database import db
+from db_routing import reads_from_replica
+from edits import EditConflict, changes, parse_snapshot, save_edit, snapshot
+from forms import VenueForm
+from genres import GENRES, GENRE_IDS
+from models.models import Venue, Show, VenueGenre, StatsVenueBookings
+from page_cache import page_cache
+from search import venue_search, prefix_lookup
+from show_counts import current_counts
+from thumbnails import prefetch
+from timelines import venue_timeline, show_tiles, timeline_limit
+
+bp = Blueprint('venues', __name__)
+
+# VenueForm fields the edit form writes back
+EDIT_FIELDS = ('name', 'city', 'state', 'address', 'phone', 'genres', 'facebook_link', 'image_link',
+               'website_link', 'seeking_talent', 'seeking_description')
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@bp.route('/venues')
+@page_cache.cached('venues')
+@reads_from_replica
+def venues():
+   genre = request.args.get('genre')
+   if genre:
+     if genre not in GENRE_IDS:
+       return abort(404)
+     # answered from the Venue_Genre primary key index
+     rows = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state) \
+       .join(VenueGenre, VenueGenre.venue_id == Venue.id) \
+       .filter(VenueGenre.genre_id == GENRE_IDS[genre]) \
+       .order_by(Venue.state, Venue.city, Venue.name, Venue.id).all()
+     areas = group_areas(rows)
+   else:
+     # areas come from the in-process index, grouped from a single ordered
+     # query and kept current by the venue create/edit/delete handlers
+     areas = area_index.areas()
+   return render_template('pages/venues.html', areas=areas, genres=GENRES, genre=genre)
+
+@bp.route('/venues/search', methods=['POST'])
+@reads_from_replica
+def search_venues():
+  search_term = request.form['search_term']
+  # ranked, typo tolerant match on name, city, state and genres
+  search_result = venue_search.search(search_term, limit=current_app.config['SEARCH_RESULT_LIMIT'])
+
+  response={
+    "count": len(search_result),
+    "data": search_result
+  }
+  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+
+@bp.route('/venues/search.json')
+@reads_from_replica
+def search_venues_json():
+  # typeahead: /venues/search.json?q=<term>&limit=<n>
+  limit = min(request.args.get('limit', 10, type=int), current_app.config['SEARCH_RESULT_LIMIT'])
+  return jsonify(venue_search.search(request.args.get('q', ''), limit=max(limit, 1)))
+
+@bp.route('/venues/lookup.json')
+@reads_from_replica
+def lookup_venues_json():
+  # pickers: /venues/lookup.json?q=<name prefix>&limit=<n>, in name order
+  limit = min(request.args.get('limit', 10, type=int), current_app.config['SEARCH_RESULT_LIMIT'])
+  rows = prefix_lookup(Venue, [Venue.id, Venue.name, Venue.city, Venue.state], request.args.get('q', ''), max(limit, 1))
+  return jsonify([dict(row._mapping) for row in rows])
+
+@bp.route('/venues/<int:venue_id>')
+@page_cache.cached('venue:{venue_id}')
+@reads_from_replica
+def show_venue(venue_id):
+  venue = Venue.query.get(venue_id)
+  if venue is None:
+    return abort(404)
+  # stored counters, or one conditional-aggregate query when they are stale
+  upcoming_shows_count, past_shows_count = current_counts(venue, Show.venue_id)
+  # first page of each timeline; the rest comes from venue_shows below
+  limit = current_app.config['TIMELINE_PAGE_SIZE']
+  upcoming_shows, upcoming_cursor = venue_timeline(venue_id, 'upcoming', limit=limit)
+  past_shows, past_cursor = venue_timeline(venue_id, 'past', limit=limit)
+  page_cache.tag(*{'artist:%d' % show.artist_id for show in upcoming_shows + past_shows})
+
+  return render_template('pages/show_venue.html', venue=venue,
+                         upcoming_shows_count=upcoming_shows_count, past_shows_count=past_shows_count,
+                         upcoming_shows=show_tiles(upcoming_shows), upcoming_cursor=upcoming_cursor,
+                         past_shows=show_tiles(past_shows), past_cursor=past_cursor)
+
+@bp.route('/venues/<int:venue_id>/shows')
+@page_cache.cached('venue:{venue_id}')
+@reads_from_replica
+def venue_shows(venue_id):
+  # "load more": /venues/<id>/shows?section=upcoming|past&after=<cursor>
+  try:
+    rows, next_cursor = venue_timeline(venue_id, request.args.get('section', 'upcoming'),
+                                       request.args.get('after'), timeline_limit())
+  except ValueError:
+    return abort(400)
+  page_cache.tag(*{'artist:%d' % show.artist_id for show in rows})
+  return jsonify({"shows": show_tiles(rows, display=True), "next": next_cursor})
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  try:
+      form = VenueForm(request.form)
+      venue = Venue(
+        name=form.name.data,
+        city=form.city.data,
+        state=form.state.data,
+        address=form.address.data,
+        phone=form.phone.data,
+        genres=form.genres.data,
+        facebook_link=form.facebook_link.data,
+        image_link=form.image_link.data
+      )
+      
+      db.session.add(venue)
+      prefetch(venue.image_link)
+      db.session.commit()
+      area_index.upsert(venue.id, venue.name, venue.city, venue.state)
+      venue_search.upsert(venue.id, venue.name, venue.city, venue.state, venue.genres)
+      page_cache.invalidate('venues')
+      flash('Venue: {0} created successfully'.format(venue.name))
+      return redirect(url_for('.show_venue', venue_id=venue.id))
+  except Exception as err:
+    flash('An error occurred creating the Venue: {0}. Error: {1}'.format(venue.name, err))
+    db.session.rollback()
+    return redirect(url_for('pages.index'))
+  finally:
+      db.session.close()
+
+@bp.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  venue = Venue.query.get(venue_id) # query first so that name can be used with flash
+  print(venue)
+  try:
+    db.session.delete(venue)
+    db.session.query(StatsVenueBookings).filter(StatsVenueBookings.venue_id == venue.id).delete()
+    db.session.commit()
+    area_index.remove(int(venue_id))
+    venue_search.remove(int(venue_id))
+    page_cache.invalidate('venues', 'shows', 'stats', 'venue:%d' % int(venue_id))
+    flash('Venue ' + venue.name + ' was successfully deleted!')
+    return redirect(url_for('pages.index'))
+  except:
+    db.session.rollback()
+    flash('An error occurred. Venue ' + venue.name + ' could not be deleted.')
+    return redirect(url_for('pages.index'))
+  finally:
+    db.session.close()
+
+#  Update
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  venue = Venue.query.filter_by(id=venue_id).first()
+  if venue is None:
+    return abort(404)
+  form = VenueForm(obj=venue)
+  return render_template('forms/edit_venue.html', form=form, venue=venue, original=snapshot(form, EDIT_FIELDS))
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  # one conditional UPDATE of the changed columns, see edits.py
+  form = VenueForm(request.form)
+  original = parse_snapshot(request.form.get('original'))
+  values = changes(form, EDIT_FIELDS, original)
+  if values:
+    try:
+      save_edit(Venue, venue_id, request.form.get('version', type=int), values,
+                (VenueGenre, VenueGenre.venue_id), (original or {}).get('genres'))
+      if 'image_link' in values:
+        prefetch(values['image_link'])
+      db.session.commit()
+    except EditConflict:
+      db.session.rollback()
+      # keep what this editor typed, against the version now saved, so a
+      # second submit overwrites the other edit knowingly
+      venue = Venue.query.filter_by(id=venue_id).first()
+      if venue is None:
+        return abort(404)
+      flash('Someone else changed this venue while you were editing it. '
+            'Check its page, then save again to replace their changes with yours.')
+      return render_template('forms/edit_venue.html', form=form, venue=venue,
+                             original=snapshot(VenueForm(obj=venue), EDIT_FIELDS)), 409
+    area_index.upsert(venue_id, form.name.data, form.city.data, form.state.data)
+    venue_search.upsert(venue_id, form.name.data, form.city.data, form.state.data, form.genres.data)
+    page_cache.invalidate('venues', 'shows', 'stats', 'venue:%d' % venue_id)
+  return redirect(url_for('.show_venue', venue_id=venue_id))